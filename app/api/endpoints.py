@@ -1,15 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
-from app.models.models import User, Transaction, BusinessRelationship
-from app.database.operations import GraphOperations
-from app.api.graph_data import GraphDataService
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse
+from app.models.models import User, Transaction, BusinessRelationship, ShortestPathsRequest, RiskScoresRequest
+from app.database.operations import GraphOperations, AsyncGraphOperations, DEFAULT_BATCH_SIZE
+from app.api.graph_data import GraphDataService, AsyncGraphDataService
 from app.services.analytics import GraphAnalyticsService
+from app.services.cache import graph_version, response_cache
+from app.services.change_log import change_log
+from app.services.projection import projection_manager
+from app.services.statistics import graph_statistics
+from app.services.velocity import velocity_tracker
 from app.utils.generate_data import generate_and_save_data
+from app.utils.serializers import convert_neo4j_types
+from app.utils.streaming import aiter_json_array, aiter_ndjson, dumps, iter_csv_zip
 from typing import List, Dict, Any, Optional
+from pydantic import ValidationError
+import hashlib
 
 router = APIRouter()
 
 @router.post("/users", response_model=Dict[str, Any])
-async def create_user(user: User):
+def create_user(user: User):
     """
     Create a new user in the graph database
     """
@@ -17,13 +27,13 @@ async def create_user(user: User):
     if not result:
         raise HTTPException(status_code=500, detail="Failed to create user")
 
-    # Detect and create relationships after adding a new user
-    GraphOperations.detect_and_create_relationships()
+    # Detect and create relationships for the new user only
+    GraphOperations.detect_relationships_for_users([user.id])
 
     return {"message": "User created successfully", "user_id": user.id}
 
 @router.post("/transactions", response_model=Dict[str, Any])
-async def create_transaction(transaction: Transaction):
+def create_transaction(transaction: Transaction):
     """
     Create a new transaction in the graph database
     """
@@ -31,33 +41,108 @@ async def create_transaction(transaction: Transaction):
     if not result:
         raise HTTPException(status_code=500, detail="Failed to create transaction")
 
-    # Detect and create relationships after adding a new transaction
-    GraphOperations.detect_and_create_relationships()
+    # Detect and create relationships for the new transaction only
+    GraphOperations.detect_relationships_for_transactions([transaction.id])
 
     return {"message": "Transaction created successfully", "transaction_id": transaction.id}
 
+@router.post("/users/bulk", response_model=Dict[str, Any])
+def create_users_bulk(
+    users: List[Dict[str, Any]],
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000),
+    detect_relationships: bool = Query(True)
+):
+    """
+    Create many users in batched writes
+
+    Args:
+        users: List of user records
+        batch_size: Number of users written per database transaction
+        detect_relationships: Whether to detect relationships once per batch (default: True)
+
+    Returns:
+        Number of created users and the records that failed, with the reason
+    """
+    valid_users, failures = _validate_records(users, User)
+    result = GraphOperations.create_users(valid_users, batch_size, detect_relationships)
+    failures.extend(result["failed"])
+
+    return {
+        "message": "Bulk user creation completed",
+        "created_count": len(result["created"]),
+        "failed_count": len(failures),
+        "failures": failures
+    }
+
+@router.post("/transactions/bulk", response_model=Dict[str, Any])
+def create_transactions_bulk(
+    transactions: List[Dict[str, Any]],
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000),
+    detect_relationships: bool = Query(True)
+):
+    """
+    Create many transactions in batched writes
+
+    Args:
+        transactions: List of transaction records
+        batch_size: Number of transactions written per database transaction
+        detect_relationships: Whether to detect relationships once per batch (default: True)
+
+    Returns:
+        Number of created transactions and the records that failed, with the reason
+    """
+    valid_transactions, failures = _validate_records(transactions, Transaction)
+    result = GraphOperations.create_transactions(valid_transactions, batch_size, detect_relationships)
+    failures.extend(result["failed"])
+
+    return {
+        "message": "Bulk transaction creation completed",
+        "created_count": len(result["created"]),
+        "failed_count": len(failures),
+        "failures": failures
+    }
+
+def _validate_records(records: List[Dict[str, Any]], model):
+    """Validate raw records against a model, collecting a failure for each invalid record"""
+    valid = []
+    failures = []
+    for index, record in enumerate(records):
+        try:
+            valid.append(model(**record))
+        except ValidationError as e:
+            failures.append({"index": index, "id": record.get("id"), "error": str(e)})
+    return valid, failures
+
 @router.get("/users", response_model=List[Dict[str, Any]])
 async def get_all_users():
     """
     Get all users from the graph database
+
+    The users are streamed as a JSON array straight from the database cursor
     """
-    users = GraphOperations.get_all_users()
-    return users
+    return StreamingResponse(
+        aiter_json_array(AsyncGraphOperations.iter_all_users()),
+        media_type="application/json"
+    )
 
 @router.get("/transactions", response_model=List[Dict[str, Any]])
 async def get_all_transactions():
     """
     Get all transactions from the graph database
+
+    The transactions are streamed as a JSON array straight from the database cursor
     """
-    transactions = GraphOperations.get_all_transactions()
-    return transactions
+    return StreamingResponse(
+        aiter_json_array(AsyncGraphOperations.iter_all_transactions()),
+        media_type="application/json"
+    )
 
 @router.get("/relationships/user/{user_id}", response_model=Dict[str, Any])
 async def get_user_relationships(user_id: str):
     """
     Get all relationships of a user
     """
-    relationships = GraphOperations.get_user_relationships(user_id)
+    relationships = await AsyncGraphOperations.get_user_relationships(user_id)
     if not relationships:
         raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
 
@@ -68,14 +153,14 @@ async def get_transaction_relationships(transaction_id: str):
     """
     Get all relationships of a transaction
     """
-    relationships = GraphOperations.get_transaction_relationships(transaction_id)
+    relationships = await AsyncGraphOperations.get_transaction_relationships(transaction_id)
     if not relationships:
         raise HTTPException(status_code=404, detail=f"Transaction with ID {transaction_id} not found")
 
     return relationships
 
 @router.post("/business-relationships", response_model=Dict[str, Any])
-async def create_business_relationship(relationship: BusinessRelationship):
+def create_business_relationship(relationship: BusinessRelationship):
     """
     Create a new business relationship between two users
     """
@@ -95,59 +180,185 @@ async def get_business_relationships(user_id: str):
     """
     Get all business relationships of a user
     """
-    relationships = GraphOperations.get_business_relationships(user_id)
+    relationships = await AsyncGraphOperations.get_business_relationships(user_id)
     if not relationships:
         raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
 
     return relationships
 
 @router.post("/detect-relationships", response_model=Dict[str, Any])
-async def detect_relationships():
+def detect_relationships():
     """
     Detect and create relationships between users and transactions
+
+    Runs every detector over the whole graph, rebuilding relationships that the
+    incremental detection on the create endpoints may have missed. With identifier
+    nodes, skipped_identifiers lists the nodes with too many owners to derive
+    COMPOSITE relationships from, with their owner counts.
     """
-    GraphOperations.detect_and_create_relationships()
-    return {"message": "Relationships detected and created successfully"}
+    result = GraphOperations.detect_and_create_relationships()
+    return {"message": "Relationships detected and created successfully", **result}
 
 @router.get("/graph-data")
-async def get_graph_data():
+async def get_graph_data(
+    request: Request,
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$")
+):
     """
     Get all nodes and edges from the graph database in a format suitable for visualization
+
+    Args:
+        stream: Optional streaming mode. "ndjson" emits one Cytoscape element per line
+                (nodes first, then edges); "json" emits the usual {"nodes", "edges"}
+                object as a chunked response. Both are written straight from the
+                database cursor.
+
+    The response carries an ETag for the current graph version and conditional
+    requests are answered with 304 until the graph changes. The X-Graph-Version
+    header is the token to pass to /graph-data/changes.
+    """
+    version = change_log.current_version()
+    etag = _graph_etag(f"graph-data-{stream or 'full'}")
+    headers = _cache_headers(etag, {"X-Graph-Version": str(version)})
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if stream:
+        return _stream_graph(stream, headers=headers)
+
+    converted_data = await response_cache.aget_or_compute("graph-data", _load_graph_data)
+    return JSONResponse(content=converted_data, headers=headers)
+
+@router.get("/graph-data/changes", response_model=Dict[str, Any])
+async def get_graph_changes(since: str = Query(..., min_length=1)):
+    """
+    Get the nodes and edges that changed since a graph version
+
+    Args:
+        since: Version token from a previous /graph-data (X-Graph-Version header)
+               or /graph-data/changes response
+
+    Returns:
+        {"version", "full": false, "nodes", "edges", "removed": {"nodes"}} where nodes
+        are the added or updated nodes and edges are all current edges of those nodes.
+        When the token is older than the change log retains, or from before a server
+        restart or from another worker, the whole graph is returned with "full": true
+        instead.
+    """
+    # Read the version first: writes landing during the queries are sent again next time
+    version = change_log.current_version()
+    node_ids = change_log.changes_since(since)
+    if node_ids is None:
+        data = await response_cache.aget_or_compute("graph-data", _load_graph_data)
+        return {"version": version, "full": True, **data}
+    if not node_ids:
+        return {"version": version, "full": False, "nodes": [], "edges": [], "removed": {"nodes": []}}
+
+    changes = await AsyncGraphDataService.get_changes(version, sorted(node_ids))
+    return convert_neo4j_types(changes)
+
+async def _load_graph_data() -> Dict[str, Any]:
+    """Get the whole graph and convert Neo4j types"""
+    data = await AsyncGraphDataService.get_graph_data()
+    return convert_neo4j_types(data)
+
+def _graph_etag(resource: str) -> str:
+    """Build a weak ETag for a resource derived from the current graph version and epoch"""
+    return f'W/"{resource}-{graph_version.token()}"'
+
+def _is_not_modified(request: Request, etag: str) -> bool:
+    """Check whether a conditional request already holds the current representation"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _cache_headers(etag: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Add validation headers so that clients revalidate with If-None-Match"""
+    return {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+
+def _stream_graph(stream: str, metadata: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None):
+    """
+    Build a streaming response of the whole graph as NDJSON or as a chunked JSON object
+    """
+    async def elements():
+        async for node in AsyncGraphDataService.iter_nodes():
+            yield {"group": "nodes", **convert_neo4j_types(node)}
+        async for edge in AsyncGraphDataService.iter_edges():
+            yield {"group": "edges", **convert_neo4j_types(edge)}
+
+    async def ndjson_body():
+        if metadata:
+            yield dumps({"metadata": metadata}) + "\n"
+        async for line in aiter_ndjson(elements()):
+            yield line
+
+    async def json_body():
+        yield "{"
+        if metadata:
+            yield f'"metadata":{dumps(metadata)},'
+        yield '"nodes":'
+        async for chunk in aiter_json_array(_converted(AsyncGraphDataService.iter_nodes())):
+            yield chunk
+        yield ',"edges":'
+        async for chunk in aiter_json_array(_converted(AsyncGraphDataService.iter_edges())):
+            yield chunk
+        yield "}"
+
+    if stream == "ndjson":
+        return StreamingResponse(ndjson_body(), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(json_body(), media_type="application/json", headers=headers)
+
+async def _converted(items):
+    """Convert Neo4j types in each item of an async iterable"""
+    async for item in items:
+        yield convert_neo4j_types(item)
+
+@router.get("/graph-data/neighborhood/{node_id}", response_model=Dict[str, Any])
+async def get_neighborhood(
+    request: Request,
+    node_id: str,
+    depth: int = Query(2, ge=0, le=6),
+    limit: int = Query(200, ge=1, le=5000),
+    types: Optional[List[str]] = Query(None)
+):
+    """
+    Get the subgraph around a user or transaction in a format suitable for visualization
+
+    Args:
+        node_id: ID of the user or transaction at the center
+        depth: Maximum number of hops from the center (default: 2)
+        limit: Maximum number of nodes returned, including the center (default: 200)
+        types: Optional relationship types to follow, e.g. ?types=COMPOSITE&types=SENT
+
+    Returns:
+        {"nodes", "edges", "truncated"} in the same format as /graph-data. When the
+        neighborhood exceeds the node budget, the nodes reached over the strongest
+        edges are kept and truncated is true.
     """
-    from fastapi.responses import JSONResponse
-
-    # Create a simple function to convert Neo4j DateTime objects to strings
-    def convert_neo4j_types(obj):
-        from neo4j.time import DateTime
-        from datetime import datetime
-
-        if isinstance(obj, DateTime):
-            # Convert Neo4j DateTime to string
-            return f"{obj.year}-{obj.month:02d}-{obj.day:02d}T{obj.hour:02d}:{obj.minute:02d}:{obj.second:02d}"
-        elif isinstance(obj, datetime):
-            # Convert Python datetime to string
-            return obj.isoformat()
-        elif isinstance(obj, dict):
-            # Recursively convert dictionary values
-            return {key: convert_neo4j_types(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            # Recursively convert list items
-            return [convert_neo4j_types(item) for item in obj]
-        else:
-            # Return other types as is
-            return obj
-
-    # Get the data and convert Neo4j types
-    data = GraphDataService.get_graph_data()
-    converted_data = convert_neo4j_types(data)
-
-    return JSONResponse(content=converted_data)
+    key = ("neighborhood", node_id, depth, limit, tuple(sorted(types)) if types else None)
+    # The ETag identifies the request parameters too, not just the graph version
+    etag = _graph_etag(f"neighborhood-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}")
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+
+    async def load():
+        return convert_neo4j_types(await AsyncGraphDataService.get_neighborhood(node_id, depth, limit, types))
+
+    result = await response_cache.aget_or_compute(key, load)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Node with ID {node_id} not found")
+    return JSONResponse(content=result, headers=_cache_headers(etag))
 
 @router.get("/analytics/shortest-path", response_model=Dict[str, Any])
-async def find_shortest_path(
+def find_shortest_path(
     source_id: str,
     target_id: str,
-    relationship_types: Optional[List[str]] = Query(None)
+    relationship_types: Optional[List[str]] = Query(None),
+    max_hops: Optional[int] = Query(None, ge=1),
+    weight: Optional[str] = Query(None, pattern="^(strength|amount|percentage)$"),
+    landmarks: bool = False
 ):
     """
     Find the shortest path between two nodes in the graph
@@ -156,18 +367,59 @@ async def find_shortest_path(
         source_id: ID of the source node
         target_id: ID of the target node
         relationship_types: Optional list of relationship types to consider
+        max_hops: Optional maximum path length (unweighted paths only); a hop through an
+                  identifier node counts as one, like the relationship it replaces
+        weight: Optional edge weight to find the strongest path instead of the one with
+                the fewest hops: "strength" (COMPOSITE edges), "percentage" (SHAREHOLDER_OF
+                edges) or "amount" (transaction edges). Each edge costs 1 / weight and edges
+                without the weight are not used.
+        landmarks: Use A* with precomputed landmark distances for weighted paths. The
+                   landmarks are computed on first use after each graph change, after which
+                   queries on large graphs are much faster.
 
     Returns:
-        Dictionary containing the path information
+        Dictionary containing the path information, with the total_cost of weighted paths
     """
+    if weight and max_hops:
+        raise HTTPException(status_code=400, detail="max_hops is only supported for unweighted paths")
     try:
-        result = GraphAnalyticsService.find_shortest_path(source_id, target_id, relationship_types)
-        return result
+        return GraphAnalyticsService.find_shortest_path(
+            source_id, target_id, relationship_types, max_hops, weight, landmarks
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding shortest path: {str(e)}")
 
+@router.post("/analytics/shortest-paths", response_model=Dict[str, Any])
+def find_shortest_paths(request: ShortestPathsRequest):
+    """
+    Find the shortest paths between many pairs of nodes in one request
+
+    All pairs are searched over the same graph snapshot; pairs sharing a source
+    are answered by a single traversal.
+
+    Returns:
+        {"results": [...]} with the source_id, target_id and path information of
+        each pair, in request order
+    """
+    if request.weight and request.max_hops:
+        raise HTTPException(status_code=400, detail="max_hops is only supported for unweighted paths")
+    pairs = [(pair.source_id, pair.target_id) for pair in request.pairs]
+    try:
+        paths = GraphAnalyticsService.find_shortest_paths(
+            pairs, request.relationship_types, request.max_hops, request.hydrate, request.weight, request.landmarks
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding shortest paths: {str(e)}")
+
+    return {
+        "results": [
+            {"source_id": source_id, "target_id": target_id, **path}
+            for (source_id, target_id), path in zip(pairs, paths)
+        ]
+    }
+
 @router.get("/analytics/transaction-clusters", response_model=List[Dict[str, Any]])
-async def cluster_transactions(
+def cluster_transactions(
     min_cluster_size: int = Query(2, ge=2),
     max_distance: int = Query(2, ge=1, le=5)
 ):
@@ -179,139 +431,464 @@ async def cluster_transactions(
         max_distance: Maximum distance between transactions to be considered in the same cluster (default: 2)
 
     Returns:
-        List of transaction clusters
+        List of transaction clusters, largest first, each with a stable cluster_id
+        (its smallest transaction ID), size, total_amount and distinct_senders
     """
     try:
-        result = GraphAnalyticsService.cluster_transactions(min_cluster_size, max_distance)
-        return result
+        return response_cache.get_or_compute(
+            ("transaction-clusters", min_cluster_size, max_distance),
+            lambda: GraphAnalyticsService.cluster_transactions(min_cluster_size, max_distance)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clustering transactions: {str(e)}")
 
+@router.get("/analytics/centrality", response_model=Dict[str, Any])
+def get_centrality(
+    algo: str = Query("pagerank", pattern="^(pagerank|weighted_pagerank|in_degree|out_degree)$"),
+    top: int = Query(10, ge=1, le=10000),
+    node_type: Optional[str] = Query(None, pattern="^(User|Transaction)$")
+):
+    """
+    Rank nodes by centrality
+
+    Args:
+        algo: "pagerank", "weighted_pagerank" (weighted by transaction amounts),
+              "in_degree" or "out_degree" (default: pagerank)
+        top: Number of nodes to return (default: 10)
+        node_type: Only rank nodes of this type ("User" or "Transaction")
+
+    Returns:
+        The best ranked nodes with their scores; scores are cached until the graph changes
+    """
+    try:
+        return GraphAnalyticsService.get_centrality(algo, top, node_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating centrality: {str(e)}")
+
+@router.get("/analytics/betweenness", response_model=Dict[str, Any])
+def get_betweenness(
+    samples: int = Query(100, ge=1, le=100000),
+    top: int = Query(10, ge=1, le=10000),
+    node_type: Optional[str] = Query(None, pattern="^(User|Transaction)$"),
+    directed: bool = False,
+    confidence: float = Query(0.95, gt=0, lt=1),
+    seed: int = Query(0, ge=0)
+):
+    """
+    Rank nodes by approximate betweenness centrality, e.g. to find brokers between groups of accounts
+
+    Args:
+        samples: Number of sampled source nodes (default: 100); more samples tighten the error bound
+        top: Number of nodes to return (default: 10)
+        node_type: Only rank nodes of this type ("User" or "Transaction")
+        directed: Follow relationship direction (default: false)
+        confidence: Probability with which error_bound holds (default: 0.95)
+        seed: Seed of the source sample (default: 0)
+
+    Returns:
+        The best ranked nodes with their normalized betweenness and the error bound
+        that holds for every node's score; results are cached until the graph changes
+    """
+    try:
+        return GraphAnalyticsService.get_betweenness(samples, top, node_type, directed, confidence, seed)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating betweenness: {str(e)}")
+
+@router.post("/analytics/centrality/write", response_model=Dict[str, Any])
+def write_centrality(
+    algo: str = Query("pagerank", pattern="^(pagerank|weighted_pagerank|in_degree|out_degree)$"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000)
+):
+    """
+    Write the centrality score of every node back as a node property
+    (pagerank, weighted_pagerank, in_degree_centrality or out_degree_centrality)
+
+    Args:
+        algo: Centrality algorithm, as for GET /analytics/centrality
+        batch_size: Number of nodes written per database transaction
+
+    Returns:
+        The property written and the number of nodes updated
+    """
+    try:
+        return GraphAnalyticsService.write_centrality(algo, batch_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error writing centrality: {str(e)}")
+
+@router.post("/analytics/risk-scores", response_model=Dict[str, Any])
+def get_risk_scores(request: RiskScoresRequest):
+    """
+    Spread risk from known bad users or transactions to the entities connected to them
+
+    Scores come from personalized PageRank restarting at the seeds, over shared
+    attributes, business relationships, transactions and linked transactions
+    weighted like COMPOSITE relationships. Each run starts from the scores of
+    the previous one, so re-scoring after the seeds change converges quickly.
+
+    Returns:
+        The riskiest entities, leaving out the seeds unless include_seeds is set,
+        with the seeds that were not found and how the scores were computed
+    """
+    try:
+        result = GraphAnalyticsService.get_risk_scores(
+            request.seed_ids, request.top, request.node_type, request.include_seeds
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating risk scores: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="None of the seed nodes were found")
+    return result
+
+@router.get("/analytics/communities", response_model=Dict[str, Any])
+def detect_communities(
+    algo: str = Query("louvain", pattern="^(louvain|label_propagation)$"),
+    min_size: int = Query(2, ge=1),
+    limit: int = Query(100, ge=1, le=10000),
+    resolution: float = Query(1.0, gt=0)
+):
+    """
+    Find communities of users and companies linked by shared attributes,
+    business relationships and transactions
+
+    Args:
+        algo: "louvain" (higher quality) or "label_propagation" (faster) (default: louvain)
+        min_size: Minimum number of members of a returned community (default: 2)
+        limit: Maximum number of communities returned, largest first (default: 100)
+        resolution: Louvain resolution; higher values give smaller communities (default: 1.0)
+
+    Returns:
+        The modularity of the partition and, for each community, its members,
+        company count, central member and internal transactions
+    """
+    try:
+        return GraphAnalyticsService.detect_communities(algo, min_size, limit, resolution)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error detecting communities: {str(e)}")
+
+@router.post("/analytics/communities/write", response_model=Dict[str, Any])
+def write_communities(
+    algo: str = Query("louvain", pattern="^(louvain|label_propagation)$"),
+    resolution: float = Query(1.0, gt=0),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000)
+):
+    """
+    Store the community of every user as its community_id property
+
+    Args:
+        algo: Community detection algorithm, as for GET /analytics/communities
+        resolution: Louvain resolution
+        batch_size: Number of users written per database transaction
+
+    Returns:
+        The number of communities and of users updated
+    """
+    try:
+        return GraphAnalyticsService.write_communities(algo, resolution, batch_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error writing communities: {str(e)}")
+
+@router.get("/analytics/trace", response_model=Dict[str, Any])
+def trace_funds(
+    start_id: str = Query(..., alias="from"),
+    direction: str = Query("forward", pattern="^(forward|backward)$"),
+    max_hops: int = Query(3, ge=1, le=20),
+    window: float = Query(7 * 24 * 3600, gt=0),
+    min_ratio: float = Query(0.1, ge=0),
+    max_ratio: Optional[float] = Query(1.1, gt=0),
+    limit: int = Query(1000, ge=1, le=100000)
+):
+    """
+    Follow funds forward or backward in time along time-respecting transaction paths
+
+    Args:
+        start_id: ID of the transaction or user to start from (?from=)
+        direction: "forward" (where the money went) or "backward" (where it came from) (default: forward)
+        max_hops: Number of hops to follow (default: 3)
+        window: Maximum number of seconds between consecutive transactions (default: 7 days)
+        min_ratio: Minimum amount of a transaction relative to the one before it (default: 0.1)
+        max_ratio: Maximum amount of a transaction relative to the one before it (default: 1.1)
+        limit: Maximum number of transactions returned (default: 1000)
+
+    Returns:
+        The transactions reached, with their hop and the transaction they were
+        reached from, and the accounts involved
+    """
+    if max_ratio is not None and max_ratio < min_ratio:
+        raise HTTPException(status_code=400, detail="max_ratio must not be smaller than min_ratio")
+    try:
+        result = GraphAnalyticsService.trace_funds(start_id, direction, max_hops, window, min_ratio, max_ratio, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error tracing funds: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Node with ID {start_id} not found")
+    return result
+
+@router.get("/analytics/cycles", response_model=Dict[str, Any])
+def find_cycles(
+    max_length: int = Query(4, ge=2, le=8),
+    max_span: float = Query(7 * 24 * 3600, gt=0),
+    limit: int = Query(100, ge=1, le=10000),
+    max_cycles: int = Query(100000, ge=1, le=1000000)
+):
+    """
+    Find round-tripping: chains of successive transactions that return money to the sender
+
+    Args:
+        max_length: Maximum number of transactions in a cycle (default: 4)
+        max_span: Maximum number of seconds from the first to the last transaction (default: 7 days)
+        limit: Maximum number of cycles returned, largest cycled amount first (default: 100)
+        max_cycles: Stop each worker's share of the search after finding this many cycles (default: 100000)
+
+    Returns:
+        The number of cycles found and the total amount they cycled, and the top
+        limit cycles with their users, transactions and the amount that made the
+        full round trip
+    """
+    try:
+        return response_cache.get_or_compute(
+            ("cycles", max_length, max_span, limit, max_cycles),
+            lambda: GraphAnalyticsService.find_cycles(max_length, max_span, limit, max_cycles)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding cycles: {str(e)}")
+
+@router.get("/analytics/beneficial-owners", response_model=Dict[str, Any])
+def get_beneficial_owner_report(
+    threshold: float = Query(25.0, ge=0, le=100),
+    limit: int = Query(1000, ge=1, le=100000),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Report the ultimate beneficial owners of every company with recorded owners
+
+    Args:
+        threshold: Minimum effective ownership of a returned owner, in percent (default: 25)
+        limit: Maximum number of companies returned, by company ID (default: 1000)
+        offset: Number of companies skipped, for paging through the report (default: 0)
+
+    Returns:
+        The number of companies with owners and the owners of each returned company
+    """
+    try:
+        return response_cache.get_or_compute(
+            ("beneficial-owners", threshold, limit, offset),
+            lambda: GraphAnalyticsService.get_beneficial_owner_report(threshold, limit, offset)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing beneficial owners: {str(e)}")
+
+@router.get("/analytics/beneficial-owners/{company_id}", response_model=Dict[str, Any])
+def get_beneficial_owners(company_id: str, threshold: float = Query(25.0, ge=0, le=100)):
+    """
+    Find the ultimate beneficial owners of a company
+
+    Ownership is followed through every chain of SHAREHOLDER_OF stakes and
+    parent companies, multiplying the stakes along each path, down to owners
+    that have no owners themselves.
+
+    Args:
+        company_id: ID of the company
+        threshold: Minimum effective ownership of a returned owner, in percent (default: 25)
+
+    Returns:
+        The owners with their effective and direct ownership in percent
+    """
+    try:
+        result = GraphAnalyticsService.get_beneficial_owners(company_id, threshold)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing beneficial owners: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Node with ID {company_id} not found")
+    return result
+
+@router.post("/analytics/entity-resolution", response_model=Dict[str, Any])
+def resolve_entities(
+    threshold: float = Query(0.6, gt=0, le=1),
+    write: bool = False,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000),
+    limit: int = Query(100, ge=1, le=10000)
+):
+    """
+    Find users that are probably the same person or company despite differently
+    formatted or misspelled names, addresses, emails and phone numbers
+
+    Args:
+        threshold: Minimum match score of a returned pair, from 0 to 1 (default: 0.6)
+        write: Whether to link the matched users with POSSIBLE_SAME_ENTITY relationships
+        batch_size: Number of relationships written per database transaction
+        limit: Maximum number of matches returned, best scores first (default: 100)
+
+    Returns:
+        The number of users, candidate pairs and matches, and the best matches
+        with their score and the identifiers they share
+    """
+    try:
+        return GraphAnalyticsService.resolve_entities(threshold, write, batch_size, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error resolving entities: {str(e)}")
+
+@router.get("/analytics/velocity", response_model=Dict[str, Any])
+async def get_flagged_velocity():
+    """
+    List the accounts currently over a velocity threshold
+
+    Returns:
+        The window and thresholds in use and the window stats of every flagged account
+    """
+    return {**velocity_tracker.stats(), "flagged": velocity_tracker.get_flagged()}
+
+@router.get("/analytics/velocity/{user_id}", response_model=Dict[str, Any])
+async def get_user_velocity(user_id: str):
+    """
+    Get the number of transactions, total amount and distinct counterparties an
+    account sent and received within the sliding velocity window
+
+    Stats are kept in memory by the write paths, so this does not query the
+    database; accounts without recent transactions get zeros.
+    """
+    return velocity_tracker.get_stats(user_id)
+
 @router.get("/analytics/graph-metrics", response_model=Dict[str, Any])
-async def get_graph_metrics():
+def get_graph_metrics(request: Request, reconcile: bool = False):
     """
-    Calculate various metrics for the graph
+    Get various metrics for the graph
+
+    Metrics are served from counters maintained by the write paths and
+    reconciled with a full recount in the background; "stale" is true while
+    updates are still being applied. Responses carry an ETag and conditional
+    requests are answered with 304 while the metrics are unchanged.
+
+    Args:
+        reconcile: Recount everything from the database before answering
 
     Returns:
         Dictionary containing graph metrics
     """
     try:
+        if reconcile:
+            graph_statistics.reconcile()
         result = GraphAnalyticsService.get_graph_metrics()
-        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating graph metrics: {str(e)}")
 
+    # The background worker updates the counters without a graph write, so the
+    # ETag is derived from the metrics themselves rather than the graph version
+    etag = _graph_etag(f"graph-metrics-{hashlib.sha1(dumps(result).encode()).hexdigest()[:16]}")
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+    return JSONResponse(content=result, headers=_cache_headers(etag))
+
+@router.get("/analytics/projection", response_model=Dict[str, Any])
+async def get_projection_stats():
+    """
+    Get the size, memory use and freshness of the in-memory graph projection
+    used by the in-process analytics
+    """
+    return projection_manager.stats()
+
+@router.post("/analytics/projection/refresh", response_model=Dict[str, Any])
+def refresh_projection():
+    """
+    Reload the in-memory graph projection from the database
+
+    The projection reloads by itself after writes made through this API; this is
+    for picking up changes made to the database directly.
+    """
+    try:
+        projection_manager.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading graph projection: {str(e)}")
+    return projection_manager.stats()
+
 @router.get("/export/json")
-async def export_graph_json():
+async def export_graph_json(
+    request: Request,
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$")
+):
     """
     Export the graph data as JSON
 
+    Args:
+        stream: Optional streaming mode ("ndjson" or "json"), see /graph-data
+
     Returns:
         JSON file with all graph data
     """
-    from fastapi.responses import JSONResponse
+    etag = _graph_etag(f"export-json-{stream or 'full'}")
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+
+    metadata = {
+        "exported_at": GraphOperations.get_current_timestamp(),
+        "format": stream or "json",
+        "version": "1.0"
+    }
+
+    if stream:
+        extension = "ndjson" if stream == "ndjson" else "json"
+        return _stream_graph(
+            stream,
+            metadata=metadata,
+            headers=_cache_headers(etag, {"Content-Disposition": f"attachment; filename=graph_export.{extension}"})
+        )
 
     try:
-        # Get the data and convert Neo4j types
-        data = GraphDataService.get_graph_data()
-        converted_data = convert_neo4j_types(data)
-
-        # Add metadata
-        converted_data["metadata"] = {
-            "exported_at": GraphOperations.get_current_timestamp(),
-            "format": "json",
-            "version": "1.0"
-        }
+        # Get the data (shared with /graph-data) and add metadata
+        converted_data = await response_cache.aget_or_compute("graph-data", _load_graph_data)
 
         return JSONResponse(
-            content=converted_data,
-            headers={
+            content={**converted_data, "metadata": metadata},
+            headers=_cache_headers(etag, {
                 "Content-Disposition": "attachment; filename=graph_export.json"
-            }
+            })
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exporting graph data: {str(e)}")
 
 @router.get("/export/csv")
-async def export_graph_csv():
+def export_graph_csv(request: Request):
     """
     Export the graph data as CSV files (nodes.csv and edges.csv)
 
+    Rows are read from a database cursor, CSV-encoded and compressed as they are
+    streamed, so the export runs in constant memory. Every property is written
+    as its own column.
+
     Returns:
         ZIP file containing nodes.csv and edges.csv
     """
-    import io
-    import csv
-    import zipfile
-    from fastapi.responses import StreamingResponse
+    etag = _graph_etag("export-csv")
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
 
     try:
-        # Get the graph data
-        data = GraphDataService.get_graph_data()
-
-        # Create in-memory file-like objects for CSV files
-        nodes_buffer = io.StringIO()
-        edges_buffer = io.StringIO()
-
-        # Create CSV writers
-        nodes_writer = csv.writer(nodes_buffer)
-        edges_writer = csv.writer(edges_buffer)
-
-        # Write nodes CSV header
-        nodes_writer.writerow(["id", "type", "label", "properties"])
-
-        # Write nodes data
-        for node in data["nodes"]:
-            node_data = node["data"]
-            # Convert properties to a string representation
-            properties = ",".join([f"{k}:{v}" for k, v in node_data.items()
-                                  if k not in ["id", "type", "label"]])
-            nodes_writer.writerow([
-                node_data["id"],
-                node_data["type"],
-                node_data.get("label", ""),
-                properties
-            ])
-
-        # Write edges CSV header
-        edges_writer.writerow(["id", "source", "target", "relationship", "properties"])
-
-        # Write edges data
-        for edge in data["edges"]:
-            edge_data = edge["data"]
-            # Convert properties to a string representation
-            properties = ",".join([f"{k}:{v}" for k, v in edge_data.get("properties", {}).items()])
-            edges_writer.writerow([
-                edge_data["id"],
-                edge_data["source"],
-                edge_data["target"],
-                edge_data["relationship"],
-                properties
-            ])
-
-        # Create a ZIP file in memory
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w") as zip_file:
-            # Add CSV files to the ZIP
-            zip_file.writestr("nodes.csv", nodes_buffer.getvalue())
-            zip_file.writestr("edges.csv", edges_buffer.getvalue())
-
-        # Reset buffer position
-        zip_buffer.seek(0)
-
-        # Return the ZIP file as a streaming response
-        return StreamingResponse(
-            zip_buffer,
-            media_type="application/zip",
-            headers={
-                "Content-Disposition": "attachment; filename=graph_export.zip"
-            }
-        )
+        node_keys = GraphDataService.get_node_property_keys()
+        edge_keys = GraphDataService.get_edge_property_keys()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exporting graph data as CSV: {str(e)}")
 
+    files = [
+        ("nodes.csv", ["id", "type", "label"] + node_keys, GraphDataService.iter_node_rows(node_keys)),
+        ("edges.csv", ["id", "source", "target", "relationship"] + edge_keys, GraphDataService.iter_edge_rows(edge_keys))
+    ]
+
+    return StreamingResponse(
+        iter_csv_zip(files),
+        media_type="application/zip",
+        headers=_cache_headers(etag, {
+            "Content-Disposition": "attachment; filename=graph_export.zip"
+        })
+    )
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_cache_stats():
+    """
+    Get hit/miss counters of the graph response cache
+    """
+    return response_cache.stats()
+
 @router.post("/generate-data", response_model=Dict[str, Any])
-async def generate_data(
+def generate_data(
     background_tasks: BackgroundTasks,
     num_users: int = Query(10, ge=1, le=100),
     num_companies: int = Query(5, ge=1, le=50),
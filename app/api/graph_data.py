@@ -1,15 +1,148 @@
-from app.database.connection import db
+from app.database.connection import db, async_db
 from app.utils.serializers import serialize_neo4j_object
-from typing import Dict, List, Any
+from app.utils.streaming import csv_value
+from typing import Dict, List, Any, Optional, Iterator, AsyncIterator
 from datetime import datetime
 
+# Queries shared by GraphDataService and AsyncGraphDataService. Besides users
+# and transactions, they return the identifier nodes (email, phone, payment
+# method, IP, device) that owners link to when IDENTIFIER_NODES is set.
+ALL_NODES_QUERY = """
+MATCH (n)
+WHERE n:User OR n:Transaction OR n:Identifier
+RETURN n
+"""
+
+ALL_EDGES_QUERY = """
+MATCH (source)-[r]->(target)
+RETURN source.id AS source_id, target.id AS target_id, type(r) AS relationship_type, properties(r) AS properties
+"""
+
+NODE_PROPERTY_KEYS_QUERY = """
+MATCH (n)
+WHERE n:User OR n:Transaction OR n:Identifier
+UNWIND keys(n) AS key
+RETURN DISTINCT key
+ORDER BY key
+"""
+
+NODES_BY_ID_QUERY = """
+UNWIND $ids AS node_id
+CALL {
+    WITH node_id
+    MATCH (n:User {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Transaction {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Identifier {id: node_id})
+    RETURN n
+}
+RETURN n
+"""
+
+INCIDENT_EDGES_QUERY = """
+UNWIND $ids AS node_id
+CALL {
+    WITH node_id
+    MATCH (n:User {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Transaction {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Identifier {id: node_id})
+    RETURN n
+}
+MATCH (n)-[r]-()
+WITH DISTINCT r
+RETURN startNode(r).id AS source_id, endNode(r).id AS target_id, type(r) AS relationship_type, properties(r) AS properties
+"""
+
+NEIGHBORHOOD_ROOT_QUERY = """
+CALL {
+    MATCH (n:User {id: $id})
+    RETURN n
+    UNION
+    MATCH (n:Transaction {id: $id})
+    RETURN n
+    UNION
+    MATCH (n:Identifier {id: $id})
+    RETURN n
+}
+RETURN n
+LIMIT 1
+"""
+
+# One BFS level: the strongest unvisited neighbors of the frontier, up to the
+# remaining node budget. Edges carrying a strength (COMPOSITE) or an ownership
+# percentage rank first, then edges to or from larger transactions.
+NEIGHBORHOOD_LEVEL_QUERY = """
+UNWIND $frontier AS node_id
+CALL {
+    WITH node_id
+    MATCH (n:User {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Transaction {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Identifier {id: node_id})
+    RETURN n
+}
+MATCH (n)-[r]-(m)
+WHERE (m:User OR m:Transaction OR m:Identifier)
+  AND NOT m.id IN $visited
+  AND ($types IS NULL OR type(r) IN $types)
+WITH m,
+     max(coalesce(r.strength, r.percentage / 100.0, 0)) AS strength,
+     max(coalesce(m.amount, n.amount, 0)) AS amount
+ORDER BY strength DESC, amount DESC, m.id
+LIMIT $budget
+RETURN m AS n
+"""
+
+SUBGRAPH_EDGES_QUERY = """
+UNWIND $ids AS node_id
+CALL {
+    WITH node_id
+    MATCH (n:User {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Transaction {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Identifier {id: node_id})
+    RETURN n
+}
+MATCH (n)-[r]->(m)
+WHERE m.id IN $ids AND ($types IS NULL OR type(r) IN $types)
+RETURN n.id AS source_id, m.id AS target_id, type(r) AS relationship_type, properties(r) AS properties
+"""
+
+EDGE_PROPERTY_KEYS_QUERY = """
+MATCH ()-[r]->()
+UNWIND keys(r) AS key
+RETURN DISTINCT key
+ORDER BY key
+"""
+
 class GraphDataService:
     @staticmethod
     def get_graph_data() -> Dict[str, List[Dict[str, Any]]]:
         """
         Get all nodes and edges from the graph database in a format suitable for Cytoscape.js
         """
-        # Get all nodes (users and transactions)
+        # Get all nodes (users, transactions and identifiers)
         nodes = GraphDataService._get_all_nodes()
 
         # Get all edges (relationships)
@@ -23,93 +156,276 @@ class GraphDataService:
     @staticmethod
     def _get_all_nodes() -> List[Dict[str, Any]]:
         """
-        Get all nodes (users and transactions) from the graph database
+        Get all nodes (users, transactions and identifiers) from the graph database
+        """
+        return list(GraphDataService.iter_nodes())
+
+    @staticmethod
+    def iter_nodes() -> Iterator[Dict[str, Any]]:
+        """
+        Stream all nodes (users, transactions and identifiers) in Cytoscape.js format
+        """
+        for record in db.stream_query(ALL_NODES_QUERY):
+            yield GraphDataService._format_node(record["n"])
+
+    @staticmethod
+    def _format_node(node) -> Dict[str, Any]:
         """
-        query = """
-        MATCH (n)
-        WHERE n:User OR n:Transaction
-        RETURN n
+        Convert a Neo4j node into the Cytoscape.js node format
         """
+        node_data = serialize_neo4j_object(node)
 
-        result = db.execute_query(query)
+        # Convert datetime objects to strings
+        for key, value in node_data.items():
+            if isinstance(value, datetime):
+                node_data[key] = value.isoformat()
 
-        nodes = []
-        for record in result:
-            node = record["n"]
-            node_data = serialize_neo4j_object(node)
-
-            # Convert datetime objects to strings
-            for key, value in node_data.items():
-                if isinstance(value, datetime):
-                    node_data[key] = value.isoformat()
-
-            # Create Cytoscape.js node format
-            cytoscape_node = {
-                "data": {
-                    "id": node_data["id"],
-                    "type": list(node.labels)[0] if node.labels else "Unknown",  # First label (User or Transaction)
-                }
-            }
+        # Identifier nodes also carry the Identifier label; their type is the kind of identifier
+        labels = [label for label in node.labels if label != "Identifier"]
 
-            # Add label based on node type
-            if "User" in node.labels:
-                cytoscape_node["data"]["label"] = node_data.get("name", "Unknown User")
-                # Add user-specific properties
-                for key in ["email", "phone", "address", "entity_type", "company_name"]:
-                    if key in node_data:
-                        cytoscape_node["data"][key] = node_data[key]
-            elif "Transaction" in node.labels:
-                # Format transaction label
-                amount = node_data.get("amount", 0)
-                currency = node_data.get("currency", "USD")
-                cytoscape_node["data"]["label"] = f"Transaction: {amount} {currency}"
+        # Create Cytoscape.js node format
+        cytoscape_node = {
+            "data": {
+                "id": node_data["id"],
+                "type": labels[0] if labels else "Unknown",  # First label (User, Transaction, Email, Device...)
+            }
+        }
 
-                # Add transaction-specific properties
-                for key in ["amount", "currency", "timestamp", "status", "ip_address", "device_id"]:
-                    if key in node_data:
-                        if key == "timestamp" and isinstance(node_data[key], datetime):
-                            cytoscape_node["data"][key] = node_data[key].isoformat()
-                        else:
-                            cytoscape_node["data"][key] = node_data[key]
+        # Add label based on node type
+        if "User" in node.labels:
+            cytoscape_node["data"]["label"] = node_data.get("name", "Unknown User")
+            # Add user-specific properties
+            for key in ["email", "phone", "address", "entity_type", "company_name"]:
+                if key in node_data:
+                    cytoscape_node["data"][key] = node_data[key]
+        elif "Transaction" in node.labels:
+            # Format transaction label
+            amount = node_data.get("amount", 0)
+            currency = node_data.get("currency", "USD")
+            cytoscape_node["data"]["label"] = f"Transaction: {amount} {currency}"
 
-            nodes.append(cytoscape_node)
+            # Add transaction-specific properties
+            for key in ["amount", "currency", "timestamp", "status", "ip_address", "device_id"]:
+                if key in node_data:
+                    if key == "timestamp" and isinstance(node_data[key], datetime):
+                        cytoscape_node["data"][key] = node_data[key].isoformat()
+                    else:
+                        cytoscape_node["data"][key] = node_data[key]
+        elif "Identifier" in node.labels:
+            # Shared email, phone, payment method, IP or device (see IDENTIFIER_NODES)
+            cytoscape_node["data"]["label"] = str(node_data.get("value", node_data["id"]))
+            cytoscape_node["data"]["value"] = node_data.get("value")
 
-        return nodes
+        return cytoscape_node
 
     @staticmethod
     def _get_all_edges() -> List[Dict[str, Any]]:
         """
         Get all edges (relationships) from the graph database
         """
-        query = """
-        MATCH (source)-[r]->(target)
-        RETURN source.id AS source_id, target.id AS target_id, type(r) AS relationship_type, properties(r) AS properties
-        """
-
-        result = db.execute_query(query)
-
-        edges = []
-        for record in result:
-            # Create Cytoscape.js edge format
-            edge_id = f"{record['source_id']}-{record['relationship_type']}-{record['target_id']}"
-
-            # Process properties to handle datetime objects
-            properties = record["properties"]
-            for key, value in properties.items():
-                if isinstance(value, datetime):
-                    properties[key] = value.isoformat()
-
-            cytoscape_edge = {
-                "data": {
-                    "id": edge_id,
-                    "source": record["source_id"],
-                    "target": record["target_id"],
-                    "relationship": record["relationship_type"],
-                    "label": record["relationship_type"].replace("_", " "),
-                    "properties": properties
-                }
+        return list(GraphDataService.iter_edges())
+
+    @staticmethod
+    def iter_edges() -> Iterator[Dict[str, Any]]:
+        """
+        Stream all edges (relationships) in Cytoscape.js format
+        """
+        for record in db.stream_query(ALL_EDGES_QUERY):
+            yield GraphDataService._format_edge(record)
+
+    @staticmethod
+    def _format_edge(record) -> Dict[str, Any]:
+        """
+        Convert an edge record (source_id, target_id, relationship_type, properties)
+        into the Cytoscape.js edge format
+        """
+        # Create Cytoscape.js edge format
+        edge_id = f"{record['source_id']}-{record['relationship_type']}-{record['target_id']}"
+
+        # Process properties to handle datetime objects
+        properties = record["properties"]
+        for key, value in properties.items():
+            if isinstance(value, datetime):
+                properties[key] = value.isoformat()
+
+        return {
+            "data": {
+                "id": edge_id,
+                "source": record["source_id"],
+                "target": record["target_id"],
+                "relationship": record["relationship_type"],
+                "label": record["relationship_type"].replace("_", " "),
+                "properties": properties
             }
+        }
 
-            edges.append(cytoscape_edge)
+    @staticmethod
+    def get_node_property_keys() -> List[str]:
+        """
+        Get the distinct property keys used by user, transaction and identifier nodes
+        """
+        return [record["key"] for record in db.stream_query(NODE_PROPERTY_KEYS_QUERY) if record["key"] != "id"]
+
+    @staticmethod
+    def get_edge_property_keys() -> List[str]:
+        """
+        Get the distinct property keys used by relationships
+        """
+        return [record["key"] for record in db.stream_query(EDGE_PROPERTY_KEYS_QUERY)]
 
-        return edges
+    @staticmethod
+    def iter_node_rows(property_keys: List[str]) -> Iterator[List[Any]]:
+        """
+        Stream nodes as CSV rows: id, type, label, then one column per property key
+        """
+        for record in db.stream_query(ALL_NODES_QUERY):
+            node = record["n"]
+            data = GraphDataService._format_node(node)["data"]
+            properties = serialize_neo4j_object(node)
+            yield [data["id"], data["type"], data.get("label", "")] + [
+                csv_value(properties.get(key)) for key in property_keys
+            ]
+
+    @staticmethod
+    def iter_edge_rows(property_keys: List[str]) -> Iterator[List[Any]]:
+        """
+        Stream edges as CSV rows: id, source, target, relationship, then one column per property key
+        """
+        for record in db.stream_query(ALL_EDGES_QUERY):
+            data = GraphDataService._format_edge(record)["data"]
+            properties = data["properties"]
+            yield [data["id"], data["source"], data["target"], data["relationship"]] + [
+                csv_value(properties.get(key)) for key in property_keys
+            ]
+
+    @staticmethod
+    def _format_changes(version: str, node_ids: List[str], nodes: List[Dict[str, Any]],
+                        edges: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build a delta payload for the given changed node IDs
+
+        Nodes that no longer exist are listed under removed. Edges holds every
+        current edge incident to a changed node, so a client replaces the
+        edges of those nodes with it.
+        """
+        present = {node["data"]["id"] for node in nodes}
+        return {
+            "version": version,
+            "full": False,
+            "nodes": nodes,
+            "edges": edges,
+            "removed": {"nodes": sorted(node_id for node_id in node_ids if node_id not in present)}
+        }
+
+class AsyncGraphDataService:
+    """Async variant of GraphDataService, built on the async driver"""
+
+    @staticmethod
+    async def get_graph_data() -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get all nodes and edges from the graph database in a format suitable for Cytoscape.js
+        """
+        return {
+            "nodes": [node async for node in AsyncGraphDataService.iter_nodes()],
+            "edges": [edge async for edge in AsyncGraphDataService.iter_edges()]
+        }
+
+    @staticmethod
+    async def iter_nodes() -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream all nodes (users, transactions and identifiers) in Cytoscape.js format
+        """
+        async for record in async_db.stream_query(ALL_NODES_QUERY):
+            yield GraphDataService._format_node(record["n"])
+
+    @staticmethod
+    async def iter_edges() -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream all edges (relationships) in Cytoscape.js format
+        """
+        async for record in async_db.stream_query(ALL_EDGES_QUERY):
+            yield GraphDataService._format_edge(record)
+
+    @staticmethod
+    async def get_changes(version: str, node_ids: List[str]) -> Dict[str, Any]:
+        """
+        Get the changed nodes and their incident edges in Cytoscape.js format
+
+        Args:
+            version: Version token the changes bring the client up to
+            node_ids: IDs of the nodes touched since the client's version
+        """
+        nodes = [
+            GraphDataService._format_node(record["n"])
+            async for record in async_db.stream_query(NODES_BY_ID_QUERY, {"ids": node_ids})
+        ]
+        edges = [
+            GraphDataService._format_edge(record)
+            async for record in async_db.stream_query(INCIDENT_EDGES_QUERY, {"ids": node_ids})
+        ]
+        return GraphDataService._format_changes(version, node_ids, nodes, edges)
+
+    @staticmethod
+    async def get_neighborhood(node_id: str, depth: int = 1, limit: int = 200,
+                               relationship_types: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the subgraph within depth hops of a user or transaction in Cytoscape.js format
+
+        The neighborhood is expanded one level at a time. When a level has more
+        neighbors than the node budget allows, the ones reached over the strongest
+        edges are kept (COMPOSITE strength or ownership percentage, then
+        transaction amount) and the response is marked as truncated.
+
+        Args:
+            node_id: ID of the user or transaction at the center
+            depth: Maximum number of hops from the center
+            limit: Maximum number of nodes, including the center
+            relationship_types: Optional list of relationship types to follow and return
+
+        Returns:
+            {"nodes", "edges", "truncated"}, or None if the node does not exist
+        """
+        roots = await async_db.execute_query(NEIGHBORHOOD_ROOT_QUERY, {"id": node_id})
+        if not roots:
+            return None
+
+        nodes = [GraphDataService._format_node(roots[0]["n"])]
+        visited = [node_id]
+        frontier = [node_id]
+        truncated = False
+
+        for _ in range(depth):
+            if not frontier:
+                break
+            # Ask for one extra neighbor to tell whether the level had to be cut,
+            # even once the budget is spent
+            budget = limit - len(visited)
+            records = await async_db.execute_query(NEIGHBORHOOD_LEVEL_QUERY, {
+                "frontier": frontier,
+                "visited": visited,
+                "types": relationship_types,
+                "budget": budget + 1
+            })
+            if len(records) > budget:
+                truncated = True
+                records = records[:budget]
+
+            frontier = []
+            for record in records:
+                node = GraphDataService._format_node(record["n"])
+                nodes.append(node)
+                frontier.append(node["data"]["id"])
+            visited.extend(frontier)
+
+        edges = [
+            GraphDataService._format_edge(record)
+            async for record in async_db.stream_query(
+                SUBGRAPH_EDGES_QUERY, {"ids": visited, "types": relationship_types}
+            )
+        ]
+
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "truncated": truncated
+        }
@@ -1,10 +1,15 @@
 import os
-from neo4j import GraphDatabase
+import asyncio
+from contextlib import asynccontextmanager
+from neo4j import GraphDatabase, AsyncGraphDatabase
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Number of records the driver fetches per round trip when streaming results
+DEFAULT_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+
 class Neo4jConnection:
     def __init__(self):
         self.uri = os.getenv("NEO4J_URI")
@@ -40,5 +45,116 @@ class Neo4jConnection:
             result = session.run(query, parameters or {})
             return [record for record in result]
 
-# Create a singleton instance
+    def stream_query(self, query, parameters=None, fetch_size=DEFAULT_FETCH_SIZE):
+        """
+        Execute a Cypher query and yield records as the driver fetches them
+
+        Only about fetch_size records are buffered at a time, so the full result
+        is never held in memory. The session stays open until the generator is
+        exhausted or closed.
+        """
+        if not self.driver:
+            self.connect()
+
+        with self.driver.session(fetch_size=fetch_size) as session:
+            result = session.run(query, parameters or {})
+            for record in result:
+                yield record
+
+    def stream_query_batches(self, query, parameters=None, batch_size=DEFAULT_FETCH_SIZE):
+        """Execute a Cypher query and yield its records in lists of at most batch_size"""
+        batch = []
+        for record in self.stream_query(query, parameters, fetch_size=batch_size):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def execute_write(self, query, parameters=None):
+        """Execute a Cypher write query inside a managed transaction"""
+        if not self.driver:
+            self.connect()
+
+        with self.driver.session() as session:
+            return session.execute_write(
+                lambda tx: [record for record in tx.run(query, parameters or {})]
+            )
+
+class AsyncNeo4jConnection:
+    def __init__(self):
+        self.uri = os.getenv("NEO4J_URI")
+        self.user = os.getenv("NEO4J_USER")
+        self.password = os.getenv("NEO4J_PASSWORD")
+        self.driver = None
+        self._loop = None
+
+    def connect(self):
+        """Connect to the Neo4j database with the async driver"""
+        try:
+            self.driver = AsyncGraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self.password)
+            )
+            # Bind to the app's loop when connecting from the lifespan, else to the first loop that uses it
+            try:
+                self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._loop = None
+            print("Connected to Neo4j database (async)")
+            return self.driver
+        except Exception as e:
+            print(f"Failed to connect to Neo4j database (async): {e}")
+            raise
+
+    async def close(self):
+        """Close the connection to the Neo4j database"""
+        if self.driver:
+            await self.driver.close()
+            self.driver = None
+            print("Async connection to Neo4j database closed")
+
+    @asynccontextmanager
+    async def _session_driver(self):
+        """
+        Yield a driver usable on the running event loop
+
+        The async driver's connection pool belongs to the loop it is used on,
+        so the driver opened by connect() is bound to the first loop that uses
+        it (the app's loop under the lifespan). Calls from any other loop, such
+        as a test client running without the lifespan, get a driver of their
+        own that is closed on that loop once the call is done, instead of
+        replacing the shared driver and leaking its pool.
+        """
+        loop = asyncio.get_running_loop()
+        if self.driver and self._loop is None:
+            self._loop = loop
+        if self.driver and self._loop is loop:
+            yield self.driver
+            return
+
+        driver = AsyncGraphDatabase.driver(self.uri, auth=(self.user, self.password))
+        try:
+            yield driver
+        finally:
+            await driver.close()
+
+    async def execute_query(self, query, parameters=None):
+        """Execute a Cypher query without blocking the event loop"""
+        async with self._session_driver() as driver:
+            async with driver.session() as session:
+                result = await session.run(query, parameters or {})
+                return [record async for record in result]
+
+    async def stream_query(self, query, parameters=None, fetch_size=DEFAULT_FETCH_SIZE):
+        """Execute a Cypher query and asynchronously yield records as the driver fetches them"""
+        async with self._session_driver() as driver:
+            async with driver.session(fetch_size=fetch_size) as session:
+                result = await session.run(query, parameters or {})
+                async for record in result:
+                    yield record
+
+# Create singleton instances
 db = Neo4jConnection()
+async_db = AsyncNeo4jConnection()
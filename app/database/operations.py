@@ -1,8 +1,134 @@
-from app.database.connection import db
+from app.database.connection import db, async_db
 from app.models.models import User, Transaction, BusinessRelationship
 from app.utils.serializers import serialize_neo4j_object
-from typing import List, Dict, Any, Optional
+from app.services.change_log import change_log
+from app.services.statistics import graph_statistics
+from app.services.velocity import velocity_tracker
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, AsyncIterator, Tuple
 from datetime import datetime
+import ast
+import os
+import re
+
+# Number of records written per UNWIND batch by the bulk create methods
+DEFAULT_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+# Cypher expression for a Lucene query that matches {value} exactly in a
+# keyword-analyzed full-text index: the value is quoted with \ and " escaped
+LUCENE_EXACT = r"""'"' + replace(replace({value}, '\\', '\\\\'), '"', '\\"') + '"'"""
+
+# Strength of the relationship between two users, as stored on COMPOSITE
+# relationships: each distinct relationship type between them adds
+# COMPOSITE_BASE_STRENGTH, and each group of types present adds its bonus once
+COMPOSITE_BASE_STRENGTH = 0.2
+COMPOSITE_TYPE_BONUSES = [
+    (("PARENT_OF", "SUBSIDIARY_OF"), 0.3),
+    (("DIRECTOR_OF",), 0.2),
+    (("SHAREHOLDER_OF",), 0.2),
+    (("SHARED_EMAIL",), 0.1),
+    (("SHARED_PHONE",), 0.1),
+    (("SHARED_ADDRESS",), 0.1),
+    (("SHARED_PAYMENT_METHOD",), 0.1)
+]
+
+# Whether shared identifiers are stored as identifier nodes (:Identifier plus
+# :Email, :Phone, :PaymentMethod, :IP or :Device) that every owner links to
+# once, instead of a relationship between every pair of owners sharing them.
+# k owners of one identifier then take k relationships instead of about k^2.
+IDENTIFIER_NODES = os.getenv("IDENTIFIER_NODES", "false").lower() == "true"
+
+# Identifier nodes: (owner label, owner property, node label, relationship
+# type from the owner, pairwise relationship type it replaces)
+IDENTIFIER_TYPES = [
+    ("User", "email", "Email", "HAS_EMAIL", "SHARED_EMAIL"),
+    ("User", "phone", "Phone", "HAS_PHONE", "SHARED_PHONE"),
+    ("User", "payment_methods", "PaymentMethod", "HAS_PAYMENT_METHOD", "SHARED_PAYMENT_METHOD"),
+    ("Transaction", "ip_address", "IP", "USED_IP", "LINKED_TO"),
+    ("Transaction", "device_id", "Device", "USED_DEVICE", "LINKED_TO")
+]
+
+# COMPOSITE candidates are also the pairs of users sharing an identifier node,
+# but listing the pairs of a node with k owners takes about k^2 rows, so nodes
+# with more user owners than this are not listed. Users linked only through
+# such nodes get no COMPOSITE; the composite detection reports the nodes skipped
+COMPOSITE_IDENTIFIER_LIMIT = int(os.getenv("COMPOSITE_IDENTIFIER_LIMIT", "1000"))
+
+# Owner properties holding a list of identifiers rather than one
+LIST_IDENTIFIER_PROPERTIES = {"payment_methods"}
+
+USER_IDENTIFIER_RELATIONSHIPS = "|".join(
+    relationship_type for owner, _, _, relationship_type, _ in IDENTIFIER_TYPES if owner == "User"
+)
+TRANSACTION_IDENTIFIER_RELATIONSHIPS = "|".join(
+    relationship_type for owner, _, _, relationship_type, _ in IDENTIFIER_TYPES if owner == "Transaction"
+)
+
+def _composite_strength_cypher(types: str, count: str) -> str:
+    """Cypher expression for the composite strength of the type list types with count distinct types"""
+    terms = [f"({count} * {COMPOSITE_BASE_STRENGTH})"]
+    for group, bonus in COMPOSITE_TYPE_BONUSES:
+        condition = " OR ".join(f'"{relationship_type}" IN {types}' for relationship_type in group)
+        terms.append(f"CASE WHEN {condition} THEN {bonus} ELSE 0 END")
+    return " +\n             ".join(terms)
+
+# Read queries shared by GraphOperations and AsyncGraphOperations
+ALL_USERS_QUERY = "MATCH (u:User) RETURN u"
+
+ALL_TRANSACTIONS_QUERY = "MATCH (t:Transaction) RETURN t"
+
+# Owners sharing an identifier node are also reported as linked by the pairwise
+# relationship it replaces (SHARED_EMAIL for HAS_EMAIL, and so on), so the
+# results have the same shape whether or not IDENTIFIER_NODES is set
+USER_RELATIONSHIPS_QUERY = f"""
+    MATCH (u:User {{id: $user_id}})
+    OPTIONAL MATCH (u)-[r1]->(n)
+    OPTIONAL MATCH (n)-[r2]->(u)
+    WITH u,
+         collect(DISTINCT {{type: type(r1), node: n, direction: 'outgoing'}}) AS outgoing,
+         collect(DISTINCT {{type: type(r2), node: n, direction: 'incoming'}}) AS incoming
+    OPTIONAL MATCH (u)-[r3:{USER_IDENTIFIER_RELATIONSHIPS}]->(:Identifier)<-[r4]-(other:User)
+    WHERE other <> u AND type(r4) = type(r3)
+    WITH u, outgoing, incoming,
+         [link IN collect(DISTINCT {{type: 'SHARED_' + substring(type(r3), 4), node: other}})
+          WHERE link.node IS NOT NULL] AS shared
+    RETURN u,
+           outgoing + [link IN shared | {{type: link.type, node: link.node, direction: 'outgoing'}}] AS outgoing,
+           incoming + [link IN shared | {{type: link.type, node: link.node, direction: 'incoming'}}] AS incoming
+    """
+
+TRANSACTION_RELATIONSHIPS_QUERY = f"""
+    MATCH (t:Transaction {{id: $transaction_id}})
+    OPTIONAL MATCH (u1)-[r1]->(t)
+    OPTIONAL MATCH (t)-[r2]->(u2)
+    OPTIONAL MATCH (t)-[r3:LINKED_TO]-(t2:Transaction)
+    WITH t,
+         collect(DISTINCT {{type: type(r1), node: u1, direction: 'incoming'}}) AS incoming_users,
+         collect(DISTINCT {{type: type(r2), node: u2, direction: 'outgoing'}}) AS outgoing_users,
+         collect(DISTINCT {{type: type(r3), node: t2, direction: 'both'}}) AS linked_transactions
+    OPTIONAL MATCH (t)-[r4:{TRANSACTION_IDENTIFIER_RELATIONSHIPS}]->(:Identifier)<-[r5]-(t3:Transaction)
+    WHERE t3 <> t AND type(r5) = type(r4)
+    WITH t, incoming_users, outgoing_users, linked_transactions, collect(DISTINCT t3) AS shared
+    RETURN t, incoming_users, outgoing_users,
+           linked_transactions + [t3 IN shared | {{type: 'LINKED_TO', node: t3, direction: 'both'}}] AS linked_transactions
+    """
+
+BUSINESS_RELATIONSHIPS_QUERY = """
+    MATCH (u:User {id: $user_id})
+
+    // Get outgoing business relationships
+    OPTIONAL MATCH (u)-[r1:PARENT_OF|DIRECTOR_OF|SHAREHOLDER_OF|COMPOSITE]->(target1:User)
+
+    // Get incoming business relationships
+    OPTIONAL MATCH (source2:User)-[r2:PARENT_OF|DIRECTOR_OF|SHAREHOLDER_OF|COMPOSITE]->(u)
+
+    // Get subsidiary relationships
+    OPTIONAL MATCH (u)-[r3:SUBSIDIARY_OF]->(parent:User)
+
+    RETURN u,
+           collect(DISTINCT {type: type(r1), node: target1, properties: properties(r1), direction: 'outgoing'}) AS outgoing_business,
+           collect(DISTINCT {type: type(r2), node: source2, properties: properties(r2), direction: 'incoming'}) AS incoming_business,
+           collect(DISTINCT {type: type(r3), node: parent, properties: properties(r3), direction: 'outgoing'}) AS parent_entities
+    """
 
 class GraphOperations:
     @staticmethod
@@ -32,31 +158,11 @@ class GraphOperations:
         RETURN u
         """
 
-        # Convert incorporation_date to ISO format if it exists
-        incorporation_date_iso = user.incorporation_date.isoformat() if user.incorporation_date else None
-
-        parameters = {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "phone": user.phone,
-            "address": user.address,
-            "payment_methods": user.payment_methods,
-            "entity_type": user.entity_type,
-            "company_name": user.company_name,
-            "company_id": user.company_id,
-            "tax_id": user.tax_id,
-            "incorporation_date": incorporation_date_iso,
-            "industry": user.industry,
-            "directors": user.directors,
-            "shareholders": str(user.shareholders) if user.shareholders else None,
-            "parent_entity_id": user.parent_entity_id,
-            "subsidiaries": user.subsidiaries,
-            "created_at": user.created_at.isoformat(),
-            "updated_at": user.updated_at.isoformat()
-        }
+        parameters = GraphOperations._user_parameters(user)
 
         result = db.execute_query(query, parameters)
+        if result:
+            GraphOperations._record_write([user.id], *GraphOperations._created_counts([parameters]))
         return result[0]["u"] if result else None
 
     @staticmethod
@@ -80,7 +186,79 @@ class GraphOperations:
         RETURN t
         """
 
-        parameters = {
+        parameters = GraphOperations._transaction_parameters(transaction)
+
+        result = db.execute_query(query, parameters)
+        if result:
+            GraphOperations._record_write([transaction.id, transaction.sender_id, transaction.receiver_id],
+                                          *GraphOperations._created_counts([parameters]))
+            GraphOperations._record_transactions([parameters])
+        return result[0]["t"] if result else None
+
+    @staticmethod
+    def _record_write(node_ids: Iterable[str] = (), nodes: Optional[Dict[str, int]] = None,
+                      relationships: Optional[Dict[str, int]] = None, reset: bool = False) -> None:
+        """
+        Record that the graph changed so that results computed from it are invalidated
+
+        Args:
+            node_ids: IDs of the nodes that were created or whose relationships changed
+            nodes: Number of nodes created per label, for the graph statistics
+            relationships: Number of relationships created per type, or None if unknown
+            reset: Whether the write may have touched any part of the graph
+        """
+        node_ids = list(node_ids)
+        change_log.record(node_ids, reset)
+        graph_statistics.record_write(node_ids, nodes, relationships, reset)
+
+    @staticmethod
+    def _record_transactions(rows: List[Dict[str, Any]]) -> None:
+        """Report created transaction rows to the velocity tracker"""
+        velocity_tracker.record(
+            (row["sender_id"], row["receiver_id"], row["amount"], datetime.fromisoformat(row["timestamp"]).timestamp())
+            for row in rows if "sender_id" in row
+        )
+
+    @staticmethod
+    def _created_counts(rows: List[Dict[str, Any]]) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Nodes per label and relationships per type created by writing user or transaction rows"""
+        transactions = sum(1 for row in rows if "sender_id" in row)
+        companies = sum(1 for row in rows if "sender_id" not in row and row.get("entity_type") == "company")
+        nodes = {"User": len(rows) - transactions, "Transaction": transactions, "company": companies}
+        relationships = {"SENT": transactions, "RECEIVED_BY": transactions}
+        return nodes, relationships
+
+    @staticmethod
+    def _user_parameters(user: User) -> Dict[str, Any]:
+        """Convert a user model into query parameters"""
+        # Convert incorporation_date to ISO format if it exists
+        incorporation_date_iso = user.incorporation_date.isoformat() if user.incorporation_date else None
+
+        return {
+            "id": user.id,
+            "name": user.name,
+            "email": user.email,
+            "phone": user.phone,
+            "address": user.address,
+            "payment_methods": user.payment_methods,
+            "entity_type": user.entity_type,
+            "company_name": user.company_name,
+            "company_id": user.company_id,
+            "tax_id": user.tax_id,
+            "incorporation_date": incorporation_date_iso,
+            "industry": user.industry,
+            "directors": user.directors,
+            "shareholders": str(user.shareholders) if user.shareholders else None,
+            "parent_entity_id": user.parent_entity_id,
+            "subsidiaries": user.subsidiaries,
+            "created_at": user.created_at.isoformat(),
+            "updated_at": user.updated_at.isoformat()
+        }
+
+    @staticmethod
+    def _transaction_parameters(transaction: Transaction) -> Dict[str, Any]:
+        """Convert a transaction model into query parameters"""
+        return {
             "id": transaction.id,
             "sender_id": transaction.sender_id,
             "receiver_id": transaction.receiver_id,
@@ -93,38 +271,262 @@ class GraphOperations:
             "metadata": str(transaction.metadata) if transaction.metadata else None
         }
 
-        result = db.execute_query(query, parameters)
-        return result[0]["t"] if result else None
+    @staticmethod
+    def create_users(users: List[User], batch_size: int = DEFAULT_BATCH_SIZE,
+                     detect_relationships: bool = True) -> Dict[str, Any]:
+        """
+        Create many user nodes with batched UNWIND writes
+
+        Args:
+            users: Users to create
+            batch_size: Number of users written per transaction
+            detect_relationships: Whether to run incremental detection once per batch
+
+        Returns:
+            Dictionary with the created user IDs and the per-record failures
+        """
+        query = """
+        UNWIND $rows AS row
+        CREATE (u:User {
+            id: row.id,
+            name: row.name,
+            email: row.email,
+            phone: row.phone,
+            address: row.address,
+            payment_methods: row.payment_methods,
+            entity_type: row.entity_type,
+            company_name: row.company_name,
+            company_id: row.company_id,
+            tax_id: row.tax_id,
+            incorporation_date: CASE WHEN row.incorporation_date IS NOT NULL THEN datetime(row.incorporation_date) ELSE null END,
+            industry: row.industry,
+            directors: row.directors,
+            shareholders: row.shareholders,
+            parent_entity_id: row.parent_entity_id,
+            subsidiaries: row.subsidiaries,
+            created_at: datetime(row.created_at),
+            updated_at: datetime(row.updated_at)
+        })
+        RETURN u.id AS id
+        """
+
+        rows = [GraphOperations._user_parameters(user) for user in users]
+        return GraphOperations._write_in_batches(
+            query,
+            rows,
+            batch_size,
+            GraphOperations.detect_relationships_for_users if detect_relationships else None,
+            "User was not created"
+        )
+
+    @staticmethod
+    def create_transactions(transactions: List[Transaction], batch_size: int = DEFAULT_BATCH_SIZE,
+                            detect_relationships: bool = True) -> Dict[str, Any]:
+        """
+        Create many transaction nodes with batched UNWIND writes
+
+        Args:
+            transactions: Transactions to create
+            batch_size: Number of transactions written per transaction
+            detect_relationships: Whether to run incremental detection once per batch
+
+        Returns:
+            Dictionary with the created transaction IDs and the per-record failures
+        """
+        query = """
+        UNWIND $rows AS row
+        MATCH (sender:User {id: row.sender_id})
+        MATCH (receiver:User {id: row.receiver_id})
+        CREATE (t:Transaction {
+            id: row.id,
+            amount: row.amount,
+            currency: row.currency,
+            timestamp: datetime(row.timestamp),
+            ip_address: row.ip_address,
+            device_id: row.device_id,
+            status: row.status,
+            metadata: row.metadata
+        })
+        CREATE (sender)-[:SENT]->(t)
+        CREATE (t)-[:RECEIVED_BY]->(receiver)
+        RETURN t.id AS id
+        """
+
+        rows = [GraphOperations._transaction_parameters(transaction) for transaction in transactions]
+        return GraphOperations._write_in_batches(
+            query,
+            rows,
+            batch_size,
+            GraphOperations.detect_relationships_for_transactions if detect_relationships else None,
+            "Sender or receiver not found"
+        )
+
+    @staticmethod
+    def _write_in_batches(query: str, rows: List[Dict[str, Any]], batch_size: int,
+                          detect: Optional[Callable[[List[str]], Dict[str, int]]],
+                          missing_error: str) -> Dict[str, Any]:
+        """
+        Run an UNWIND write query over rows in batches, each in its own managed transaction
+
+        The query must return the id of every row it wrote. Rows that are not returned
+        are reported with missing_error. When a whole batch fails (for example on a
+        uniqueness constraint), its rows are retried one by one so that only the
+        offending records are reported as failed.
+        """
+        created = []
+        failed = []
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+
+            try:
+                result = db.execute_write(query, {"rows": batch})
+                written = [record["id"] for record in result]
+            except Exception:
+                written = []
+                for row in batch:
+                    try:
+                        result = db.execute_write(query, {"rows": [row]})
+                        written.extend(record["id"] for record in result)
+                    except Exception as e:
+                        failed.append({"id": row["id"], "error": str(e)})
+
+            written_ids = set(written)
+            failed_ids = {failure["id"] for failure in failed}
+            for row in batch:
+                if row["id"] not in written_ids and row["id"] not in failed_ids:
+                    failed.append({"id": row["id"], "error": missing_error})
+
+            if written:
+                # Transactions also change the edges of their sender and receiver
+                written_rows = [row for row in batch if row["id"] in written_ids]
+                GraphOperations._record_write(written + [
+                    row[key] for row in written_rows
+                    for key in ("sender_id", "receiver_id") if row.get(key)
+                ], *GraphOperations._created_counts(written_rows))
+                GraphOperations._record_transactions(written_rows)
+
+            # Detect relationships once for the whole batch
+            if detect and written:
+                detect(written)
+
+            created.extend(written)
+
+        return {
+            "created": created,
+            "failed": failed
+        }
+
+    @staticmethod
+    def set_node_properties(property_name: str, rows_by_label: Dict[str, List[Dict[str, Any]]],
+                            batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Set one property on many nodes in batched writes
+
+        Args:
+            property_name: Name of the property to set
+            rows_by_label: {"id": ..., "value": ...} rows for each label ("User" or "Transaction"),
+                           so that every batch is matched through the label's id index
+            batch_size: Number of nodes written per database transaction
+
+        Returns:
+            Number of nodes updated
+        """
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", property_name):
+            raise ValueError(f"Invalid property name: {property_name}")
+        updated = 0
+        try:
+            for label, rows in rows_by_label.items():
+                if label not in ("User", "Transaction"):
+                    raise ValueError(f"Invalid label: {label}")
+                query = f"""
+                UNWIND $rows AS row
+                MATCH (n:{label} {{id: row.id}})
+                SET n.{property_name} = row.value
+                RETURN count(n) AS count
+                """
+                for start in range(0, len(rows), batch_size):
+                    result = db.execute_write(query, {"rows": rows[start:start + batch_size]})
+                    updated += result[0]["count"] if result else 0
+        finally:
+            if updated:
+                # Any node may have changed, but counts and degrees did not, so the
+                # graph statistics are left alone
+                change_log.record(reset=True)
+        return updated
+
+    @staticmethod
+    def create_possible_same_entity_relationships(matches: List[Dict[str, Any]],
+                                                  batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Link users found by entity resolution with POSSIBLE_SAME_ENTITY relationships in batched writes
+
+        Each pair is merged from source_id to target_id, so running the resolution
+        again updates the score of a pair instead of linking it twice.
+
+        Args:
+            matches: Matches with source_id, target_id, score, name_similarity,
+                     address_similarity and shared_identifiers
+            batch_size: Number of relationships written per database transaction
+
+        Returns:
+            Number of relationships written
+        """
+        query = """
+        UNWIND $rows AS row
+        MATCH (a:User {id: row.source_id})
+        MATCH (b:User {id: row.target_id})
+        MERGE (a)-[r:POSSIBLE_SAME_ENTITY]->(b)
+        SET r.score = row.score,
+            r.name_similarity = row.name_similarity,
+            r.address_similarity = row.address_similarity,
+            r.shared_identifiers = row.shared_identifiers,
+            r.detected_at = datetime()
+        RETURN a.id AS source_id, b.id AS target_id
+        """
+        written_ids = []
+        try:
+            for start in range(0, len(matches), batch_size):
+                result = db.execute_write(query, {"rows": matches[start:start + batch_size]})
+                written_ids.extend(node_id for record in result for node_id in (record["source_id"], record["target_id"]))
+        finally:
+            if written_ids:
+                # MERGE may only have updated existing relationships, so the count is unknown
+                GraphOperations._record_write(written_ids)
+        return len(written_ids) // 2
 
     @staticmethod
     def get_all_users() -> List[Dict[str, Any]]:
         """Get all users from the graph database"""
-        query = "MATCH (u:User) RETURN u"
-        result = db.execute_query(query)
-        return [serialize_neo4j_object(record["u"]) for record in result]
+        return list(GraphOperations.iter_all_users())
+
+    @staticmethod
+    def iter_all_users() -> Iterator[Dict[str, Any]]:
+        """Stream all users from the graph database"""
+        for record in db.stream_query(ALL_USERS_QUERY):
+            yield serialize_neo4j_object(record["u"])
 
     @staticmethod
     def get_all_transactions() -> List[Dict[str, Any]]:
         """Get all transactions from the graph database"""
-        query = "MATCH (t:Transaction) RETURN t"
-        result = db.execute_query(query)
-        return [serialize_neo4j_object(record["t"]) for record in result]
+        return list(GraphOperations.iter_all_transactions())
+
+    @staticmethod
+    def iter_all_transactions() -> Iterator[Dict[str, Any]]:
+        """Stream all transactions from the graph database"""
+        for record in db.stream_query(ALL_TRANSACTIONS_QUERY):
+            yield serialize_neo4j_object(record["t"])
 
     @staticmethod
     def get_user_relationships(user_id: str) -> Dict[str, Any]:
         """Get all relationships of a user"""
-        query = """
-        MATCH (u:User {id: $user_id})
-        OPTIONAL MATCH (u)-[r1]->(n)
-        OPTIONAL MATCH (n)-[r2]->(u)
-        RETURN u,
-               collect(DISTINCT {type: type(r1), node: n, direction: 'outgoing'}) AS outgoing,
-               collect(DISTINCT {type: type(r2), node: n, direction: 'incoming'}) AS incoming
-        """
-
         parameters = {"user_id": user_id}
-        result = db.execute_query(query, parameters)
+        result = db.execute_query(USER_RELATIONSHIPS_QUERY, parameters)
+        return GraphOperations._format_user_relationships(result)
 
+    @staticmethod
+    def _format_user_relationships(result) -> Optional[Dict[str, Any]]:
+        """Format the result of USER_RELATIONSHIPS_QUERY"""
         if not result:
             return None
 
@@ -140,20 +542,13 @@ class GraphOperations:
     @staticmethod
     def get_transaction_relationships(transaction_id: str) -> Dict[str, Any]:
         """Get all relationships of a transaction"""
-        query = """
-        MATCH (t:Transaction {id: $transaction_id})
-        OPTIONAL MATCH (u1)-[r1]->(t)
-        OPTIONAL MATCH (t)-[r2]->(u2)
-        OPTIONAL MATCH (t)-[r3:LINKED_TO]-(t2:Transaction)
-        RETURN t,
-               collect(DISTINCT {type: type(r1), node: u1, direction: 'incoming'}) AS incoming_users,
-               collect(DISTINCT {type: type(r2), node: u2, direction: 'outgoing'}) AS outgoing_users,
-               collect(DISTINCT {type: type(r3), node: t2, direction: 'both'}) AS linked_transactions
-        """
-
         parameters = {"transaction_id": transaction_id}
-        result = db.execute_query(query, parameters)
+        result = db.execute_query(TRANSACTION_RELATIONSHIPS_QUERY, parameters)
+        return GraphOperations._format_transaction_relationships(result)
 
+    @staticmethod
+    def _format_transaction_relationships(result) -> Optional[Dict[str, Any]]:
+        """Format the result of TRANSACTION_RELATIONSHIPS_QUERY"""
         if not result:
             return None
 
@@ -168,72 +563,390 @@ class GraphOperations:
         })
 
     @staticmethod
-    def detect_and_create_relationships():
-        """Detect and create relationships between users and transactions"""
-        # Create relationships based on shared email
-        GraphOperations._create_shared_email_relationships()
+    def detect_and_create_relationships() -> Dict[str, Any]:
+        """
+        Detect and create relationships between users and transactions
 
-        # Create relationships based on shared phone
-        GraphOperations._create_shared_phone_relationships()
+        This is a full rebuild over the whole graph; use detect_relationships_for_users
+        and detect_relationships_for_transactions after writing individual nodes
 
-        # Create relationships based on shared address
-        GraphOperations._create_shared_address_relationships()
+        Returns:
+            {"skipped_identifiers"}: the owner count of each identifier node too
+            large to list COMPOSITE candidates from (see COMPOSITE_IDENTIFIER_LIMIT)
+        """
+        if IDENTIFIER_NODES:
+            # Link users and transactions to their email, phone, payment method, IP and device nodes
+            GraphOperations._create_identifier_relationships("User")
+            GraphOperations._create_identifier_relationships("Transaction")
+        else:
+            # Create relationships based on shared email
+            GraphOperations._create_shared_email_relationships()
+
+            # Create relationships based on shared phone
+            GraphOperations._create_shared_phone_relationships()
 
-        # Create relationships based on shared payment methods
-        GraphOperations._create_shared_payment_method_relationships()
+            # Create relationships based on shared payment methods
+            GraphOperations._create_shared_payment_method_relationships()
 
-        # Create relationships between transactions with shared IP or device ID
-        GraphOperations._create_linked_transaction_relationships()
+            # Create relationships between transactions with shared IP or device ID
+            GraphOperations._create_linked_transaction_relationships()
+
+        # Create relationships based on shared address
+        GraphOperations._create_shared_address_relationships()
 
         # Create business relationships
         GraphOperations._create_parent_child_relationships()
         GraphOperations._create_director_relationships()
         GraphOperations._create_shareholder_relationships()
-        GraphOperations._create_composite_relationships()
+        _, skipped = GraphOperations._create_composite_relationships()
+
+        GraphOperations._record_write(reset=True)
+        return {"skipped_identifiers": skipped}
 
     @staticmethod
-    def _create_shared_email_relationships():
-        """Create relationships between users with shared email addresses"""
+    def migrate_to_identifier_nodes(batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Dict[str, int]]:
+        """
+        Convert the shared-identifier relationships of an existing graph to identifier nodes
+
+        Links every user and transaction to its identifier nodes, then deletes
+        the pairwise relationships they replace (SHARED_EMAIL, SHARED_PHONE,
+        SHARED_PAYMENT_METHOD and LINKED_TO) batch_size at a time, so that no
+        single transaction holds the quadratic number of them. COMPOSITE
+        relationships are kept, since shared identifiers count as the same
+        relationship types either way. Set IDENTIFIER_NODES=true afterwards so
+        that new writes keep to the new model.
+
+        Returns:
+            Dictionary with the number of relationships created and deleted per type
+        """
+        created = {}
+        deleted = {}
+        try:
+            for owner_label in ("User", "Transaction"):
+                counts, _ = GraphOperations._create_identifier_relationships(owner_label)
+                created.update(counts)
+
+            for rel_type in sorted({pairwise_type for *_, pairwise_type in IDENTIFIER_TYPES}):
+                query = f"""
+                MATCH ()-[r:{rel_type}]->()
+                WITH r LIMIT $batch_size
+                DELETE r
+                RETURN count(r) AS count
+                """
+                deleted[rel_type] = 0
+                while True:
+                    result = db.execute_write(query, {"batch_size": batch_size})
+                    count = result[0]["count"] if result else 0
+                    deleted[rel_type] += count
+                    if count < batch_size:
+                        break
+        finally:
+            GraphOperations._record_write(reset=True)
+        return {"created": created, "deleted": deleted}
+
+    @staticmethod
+    def detect_relationships_for_users(user_ids: List[str]) -> Dict[str, int]:
+        """
+        Detect relationships for newly written users only
+
+        Each query is anchored on the given users and matches them against the
+        existing graph through indexes (id/email/phone/address range indexes, the
+        keyword full-text indexes on payment methods and directors, and the text
+        index on shareholders), so the cost depends on the users' neighbourhood
+        instead of the size of the graph. The full
+        detect_and_create_relationships pass remains the explicit rebuild.
+
+        Args:
+            user_ids: IDs of the users that were just created
+
+        Returns:
+            Dictionary with the number of relationships matched per detector
+        """
+        if not user_ids:
+            return {}
+
+        parameters = {"user_ids": list(user_ids)}
+        counts = {}
+        identifier_ids = []
+
+        if IDENTIFIER_NODES:
+            # One relationship per identifier of each new user, whoever else shares it
+            identifier_counts, identifier_ids = GraphOperations._create_identifier_relationships("User", user_ids)
+            counts.update(identifier_counts)
+            shared_properties = [("SHARED_ADDRESS", "address")]
+        else:
+            shared_properties = [("SHARED_EMAIL", "email"), ("SHARED_PHONE", "phone"), ("SHARED_ADDRESS", "address")]
+
+        # Shared email, phone and address: index lookups on the new users' values
+        for rel_type, prop in shared_properties:
+            query = f"""
+            UNWIND $user_ids AS user_id
+            MATCH (u:User {{id: user_id}})
+            WHERE u.{prop} IS NOT NULL
+            MATCH (other:User {{{prop}: u.{prop}}})
+            WHERE other.id <> u.id
+            MERGE (u)-[r1:{rel_type} {{{prop}: u.{prop}}}]->(other)
+            MERGE (other)-[r2:{rel_type} {{{prop}: u.{prop}}}]->(u)
+            RETURN count(r1) + count(r2) AS relationship_count
+            """
+            result = db.execute_query(query, parameters)
+            counts[rel_type.lower()] = result[0]["relationship_count"] if result else 0
+
+        # Shared payment methods: one keyword full-text lookup per method of the new users
+        if not IDENTIFIER_NODES:
+            query = f"""
+            UNWIND $user_ids AS user_id
+            MATCH (u:User {{id: user_id}})
+            WHERE u.payment_methods IS NOT NULL
+            CALL {{
+                WITH u
+                UNWIND u.payment_methods AS pm
+                CALL db.index.fulltext.queryNodes('user_payment_methods', {LUCENE_EXACT.format(value="pm")}) YIELD node AS other
+                WITH u, pm, other
+                WHERE other.id <> u.id AND pm IN other.payment_methods
+                RETURN DISTINCT other
+            }}
+            WITH u, other,
+                 [pm IN u.payment_methods WHERE pm IN other.payment_methods] AS outgoing_methods,
+                 [pm IN other.payment_methods WHERE pm IN u.payment_methods] AS incoming_methods
+            MERGE (u)-[r1:SHARED_PAYMENT_METHOD {{methods: outgoing_methods}}]->(other)
+            MERGE (other)-[r2:SHARED_PAYMENT_METHOD {{methods: incoming_methods}}]->(u)
+            RETURN count(r1) + count(r2) AS relationship_count
+            """
+            result = db.execute_query(query, parameters)
+            counts["shared_payment_method"] = result[0]["relationship_count"] if result else 0
+
+        # Parent/subsidiary, in both roles the new users can play
         query = """
-        MATCH (u1:User), (u2:User)
-        WHERE u1.email IS NOT NULL AND u1.email = u2.email AND u1.id <> u2.id
-        MERGE (u1)-[r:SHARED_EMAIL {email: u1.email}]->(u2)
-        RETURN count(r) as relationship_count
+        UNWIND $user_ids AS user_id
+        MATCH (u:User {id: user_id})
+        CALL {
+            WITH u
+            MATCH (parent:User {id: u.parent_entity_id})
+            WHERE parent.id <> u.id
+            RETURN parent, u AS child
+            UNION
+            WITH u
+            MATCH (child:User {parent_entity_id: u.id})
+            WHERE child.id <> u.id
+            RETURN u AS parent, child
+        }
+        MERGE (parent)-[r:PARENT_OF]->(child)
+        ON CREATE SET r.created_at = datetime()
+        MERGE (child)-[r2:SUBSIDIARY_OF]->(parent)
+        ON CREATE SET r2.created_at = datetime()
+        RETURN count(r) AS relationship_count
         """
-        result = db.execute_query(query)
-        return result[0]["relationship_count"] if result else 0
+        result = db.execute_query(query, parameters)
+        counts["parent_of"] = result[0]["relationship_count"] if result else 0
+
+        # Directors, in both roles the new users can play; companies listing a new
+        # user are found through the keyword full-text index on directors
+        query = f"""
+        UNWIND $user_ids AS user_id
+        MATCH (u:User {{id: user_id}})
+        CALL {{
+            WITH u
+            UNWIND coalesce(u.directors, []) AS director_id
+            MATCH (director:User {{id: director_id}})
+            WHERE director.id <> u.id
+            RETURN director, u AS company
+            UNION
+            WITH u
+            CALL db.index.fulltext.queryNodes('user_directors', {LUCENE_EXACT.format(value="u.id")}) YIELD node AS company
+            WITH u, company
+            WHERE company.id <> u.id AND u.id IN company.directors
+            RETURN u AS director, company
+        }}
+        MERGE (director)-[r:DIRECTOR_OF]->(company)
+        ON CREATE SET r.created_at = datetime()
+        RETURN count(r) AS relationship_count
+        """
+        result = db.execute_query(query, parameters)
+        counts["director_of"] = result[0]["relationship_count"] if result else 0
+
+        # Shareholders: the new users' own shareholder lists, and companies that list
+        # them. The stored list is the str() of the shareholder dicts, so the exact
+        # "'id': <repr of the id>" needle can be looked up in the shareholders text
+        # index without matching IDs that merely contain the new one (user1 in user10)
+        query = """
+        UNWIND $users AS user
+        CALL {
+            WITH user
+            MATCH (company:User {id: user.id})
+            WHERE company.shareholders IS NOT NULL
+            RETURN company
+            UNION
+            WITH user
+            MATCH (company:User)
+            WHERE company.shareholders CONTAINS user.needle
+            RETURN company
+        }
+        RETURN DISTINCT company.id as company_id, company.shareholders as shareholders_str
+        """
+        users = [{"id": user_id, "needle": f"'id': {user_id!r}"} for user_id in user_ids]
+        new_ids = set(user_ids)
+        shareholder_count = 0
+        for record in db.execute_query(query, {"users": users}):
+            company_id = record["company_id"]
+            for shareholder_id, percentage in GraphOperations._parse_shareholders(record["shareholders_str"]):
+                if company_id in new_ids or shareholder_id in new_ids:
+                    shareholder_count += GraphOperations._merge_shareholder_relationship(
+                        company_id, shareholder_id, percentage
+                    )
+        counts["shareholder_of"] = shareholder_count
+
+        # Recompute composite relationships touching the new users
+        counts["composite"], skipped = GraphOperations._create_composite_relationships(user_ids)
+        if skipped:
+            counts["composite_skipped_identifiers"] = len(skipped)
+
+        GraphOperations._record_write(list(user_ids) + identifier_ids)
+        return counts
+
+    @staticmethod
+    def detect_relationships_for_transactions(transaction_ids: List[str]) -> Dict[str, int]:
+        """
+        Detect relationships for newly written transactions only
+
+        Transactions only take part in LINKED_TO relationships, which are matched
+        against existing transactions through the ip_address/device_id indexes.
+        With IDENTIFIER_NODES set, they are linked to their IP and device nodes
+        instead, at one relationship each however many transactions share them.
+
+        Args:
+            transaction_ids: IDs of the transactions that were just created
+
+        Returns:
+            Dictionary with the number of relationships matched per detector
+        """
+        if not transaction_ids:
+            return {}
+
+        if IDENTIFIER_NODES:
+            # One relationship per IP and device, however many transactions share them
+            counts, identifier_ids = GraphOperations._create_identifier_relationships("Transaction", transaction_ids)
+            GraphOperations._record_write(list(transaction_ids) + identifier_ids)
+            return counts
+
+        parameters = {"transaction_ids": list(transaction_ids)}
+        counts = {}
+
+        for reason, prop in [("shared_ip", "ip_address"), ("shared_device", "device_id")]:
+            query = f"""
+            UNWIND $transaction_ids AS transaction_id
+            MATCH (t:Transaction {{id: transaction_id}})
+            WHERE t.{prop} IS NOT NULL
+            MATCH (other:Transaction {{{prop}: t.{prop}}})
+            WHERE other.id <> t.id
+            MERGE (t)-[r:LINKED_TO {{reason: '{reason}', {prop}: t.{prop}}}]-(other)
+            RETURN count(r) AS relationship_count
+            """
+            result = db.execute_query(query, parameters)
+            counts[f"{prop.split('_')[0]}_relationships"] = result[0]["relationship_count"] if result else 0
+
+        GraphOperations._record_write(transaction_ids)
+        return counts
+
+    @staticmethod
+    def _create_shared_email_relationships():
+        """Create relationships between users with shared email addresses"""
+        return GraphOperations._create_shared_property_relationships("SHARED_EMAIL", "email")
 
     @staticmethod
     def _create_shared_phone_relationships():
         """Create relationships between users with shared phone numbers"""
-        query = """
-        MATCH (u1:User), (u2:User)
-        WHERE u1.phone IS NOT NULL AND u1.phone = u2.phone AND u1.id <> u2.id
-        MERGE (u1)-[r:SHARED_PHONE {phone: u1.phone}]->(u2)
-        RETURN count(r) as relationship_count
-        """
-        result = db.execute_query(query)
-        return result[0]["relationship_count"] if result else 0
+        return GraphOperations._create_shared_property_relationships("SHARED_PHONE", "phone")
 
     @staticmethod
     def _create_shared_address_relationships():
         """Create relationships between users with shared addresses"""
-        query = """
-        MATCH (u1:User), (u2:User)
-        WHERE u1.address IS NOT NULL AND u1.address = u2.address AND u1.id <> u2.id
-        MERGE (u1)-[r:SHARED_ADDRESS {address: u1.address}]->(u2)
+        return GraphOperations._create_shared_property_relationships("SHARED_ADDRESS", "address")
+
+    @staticmethod
+    def _create_shared_property_relationships(relationship_type: str, property_name: str) -> int:
+        """
+        Create relationships between users sharing the same value of a property
+
+        Users are first grouped by the (indexed) property value and only users within
+        the same group are linked, instead of filtering a cartesian product of all users.
+        """
+        query = f"""
+        MATCH (u:User)
+        WHERE u.{property_name} IS NOT NULL
+        WITH u.{property_name} AS value, collect(u) AS users
+        WHERE size(users) > 1
+        UNWIND users AS u1
+        UNWIND users AS u2
+        WITH value, u1, u2
+        WHERE u1.id <> u2.id
+        MERGE (u1)-[r:{relationship_type} {{{property_name}: value}}]->(u2)
         RETURN count(r) as relationship_count
         """
         result = db.execute_query(query)
         return result[0]["relationship_count"] if result else 0
 
+    @staticmethod
+    def _create_identifier_relationships(owner_label: str,
+                                         owner_ids: Optional[List[str]] = None) -> Tuple[Dict[str, int], List[str]]:
+        """
+        Link users or transactions to the identifier nodes of their identifiers (see IDENTIFIER_NODES)
+
+        Identifier nodes are merged on their id, the identifier kind and value
+        (e.g. "device:device_1"), which is unique for the Identifier label, so
+        each owner costs one index lookup and one relationship per identifier.
+
+        Args:
+            owner_label: "User" or "Transaction"
+            owner_ids: IDs of the owners to link, or None for all of them
+
+        Returns:
+            (counts, identifier_ids): the number of relationships matched per
+            relationship type, and the IDs of the identifier nodes linked
+        """
+        # The IDs are only collected when linking given owners; a full pass touches every identifier
+        if owner_ids is None:
+            match_clause = f"MATCH (n:{owner_label})"
+            collected = "[]"
+        else:
+            match_clause = f"""UNWIND $owner_ids AS owner_id
+            MATCH (n:{owner_label} {{id: owner_id}})"""
+            collected = "collect(DISTINCT i.id)"
+        counts = {}
+        identifier_ids = set()
+        for owner, prop, label, rel_type, _ in IDENTIFIER_TYPES:
+            if owner != owner_label:
+                continue
+            values = f"n.{prop}" if prop in LIST_IDENTIFIER_PROPERTIES else f"[n.{prop}]"
+            query = f"""
+            {match_clause}
+            WHERE n.{prop} IS NOT NULL
+            UNWIND {values} AS value
+            MERGE (i:Identifier:{label} {{id: '{label.lower()}:' + toString(value)}})
+            ON CREATE SET i.value = value
+            MERGE (n)-[r:{rel_type}]->(i)
+            RETURN count(r) AS relationship_count, {collected} AS identifier_ids
+            """
+            result = db.execute_query(query, {"owner_ids": list(owner_ids)} if owner_ids is not None else None)
+            counts[rel_type.lower()] = result[0]["relationship_count"] if result else 0
+            if result:
+                identifier_ids.update(result[0]["identifier_ids"])
+        return counts, sorted(identifier_ids)
+
     @staticmethod
     def _create_shared_payment_method_relationships():
         """Create relationships between users with shared payment methods"""
+        # Group users by each payment method they hold, then link within the groups
         query = """
-        MATCH (u1:User), (u2:User)
+        MATCH (u:User)
+        WHERE u.payment_methods IS NOT NULL
+        UNWIND u.payment_methods AS pm
+        WITH pm, collect(DISTINCT u) AS users
+        WHERE size(users) > 1
+        UNWIND users AS u1
+        UNWIND users AS u2
+        WITH DISTINCT u1, u2
         WHERE u1.id <> u2.id
-        AND any(pm IN u1.payment_methods WHERE pm IN u2.payment_methods)
         WITH u1, u2, [pm IN u1.payment_methods WHERE pm IN u2.payment_methods] AS shared_methods
         MERGE (u1)-[r:SHARED_PAYMENT_METHOD {methods: shared_methods}]->(u2)
         RETURN count(r) as relationship_count
@@ -246,22 +959,30 @@ class GraphOperations:
         """Create relationships between transactions with shared IP or device ID"""
         # Link by IP address
         ip_query = """
-        MATCH (t1:Transaction), (t2:Transaction)
-        WHERE t1.ip_address IS NOT NULL
-        AND t1.ip_address = t2.ip_address
-        AND t1.id <> t2.id
-        MERGE (t1)-[r:LINKED_TO {reason: 'shared_ip', ip_address: t1.ip_address}]-(t2)
+        MATCH (t:Transaction)
+        WHERE t.ip_address IS NOT NULL
+        WITH t.ip_address AS ip_address, collect(t) AS transactions
+        WHERE size(transactions) > 1
+        UNWIND transactions AS t1
+        UNWIND transactions AS t2
+        WITH ip_address, t1, t2
+        WHERE t1.id < t2.id
+        MERGE (t1)-[r:LINKED_TO {reason: 'shared_ip', ip_address: ip_address}]-(t2)
         RETURN count(r) as relationship_count
         """
         ip_result = db.execute_query(ip_query)
 
         # Link by device ID
         device_query = """
-        MATCH (t1:Transaction), (t2:Transaction)
-        WHERE t1.device_id IS NOT NULL
-        AND t1.device_id = t2.device_id
-        AND t1.id <> t2.id
-        MERGE (t1)-[r:LINKED_TO {reason: 'shared_device', device_id: t1.device_id}]-(t2)
+        MATCH (t:Transaction)
+        WHERE t.device_id IS NOT NULL
+        WITH t.device_id AS device_id, collect(t) AS transactions
+        WHERE size(transactions) > 1
+        UNWIND transactions AS t1
+        UNWIND transactions AS t2
+        WITH device_id, t1, t2
+        WHERE t1.id < t2.id
+        MERGE (t1)-[r:LINKED_TO {reason: 'shared_device', device_id: device_id}]-(t2)
         RETURN count(r) as relationship_count
         """
         device_result = db.execute_query(device_query)
@@ -298,18 +1019,23 @@ class GraphOperations:
         }
 
         result = db.execute_query(query, parameters)
+        if result:
+            GraphOperations._record_write([relationship.source_id, relationship.target_id],
+                                          relationships={relationship.relationship_type: 1})
         return serialize_neo4j_object(result[0]["r"]) if result else None
 
     @staticmethod
     def _create_parent_child_relationships():
         """Create parent-child relationships between users based on parent_entity_id field"""
         query = """
-        MATCH (child:User), (parent:User)
+        MATCH (child:User)
         WHERE child.parent_entity_id IS NOT NULL
-        AND child.parent_entity_id = parent.id
-        AND child.id <> parent.id
-        MERGE (parent)-[r:PARENT_OF {created_at: datetime()}]->(child)
-        MERGE (child)-[r2:SUBSIDIARY_OF {created_at: datetime()}]->(parent)
+        MATCH (parent:User {id: child.parent_entity_id})
+        WHERE child.id <> parent.id
+        MERGE (parent)-[r:PARENT_OF]->(child)
+        ON CREATE SET r.created_at = datetime()
+        MERGE (child)-[r2:SUBSIDIARY_OF]->(parent)
+        ON CREATE SET r2.created_at = datetime()
         RETURN count(r) as relationship_count
         """
         result = db.execute_query(query)
@@ -319,13 +1045,13 @@ class GraphOperations:
     def _create_director_relationships():
         """Create director relationships between users based on directors field"""
         query = """
-        MATCH (company:User), (director:User)
+        MATCH (company:User)
         WHERE company.directors IS NOT NULL
-        AND director.id IN company.directors
-        AND company.id <> director.id
-        MERGE (director)-[r:DIRECTOR_OF {
-            created_at: datetime()
-        }]->(company)
+        UNWIND company.directors AS director_id
+        MATCH (director:User {id: director_id})
+        WHERE company.id <> director.id
+        MERGE (director)-[r:DIRECTOR_OF]->(company)
+        ON CREATE SET r.created_at = datetime()
         RETURN count(r) as relationship_count
         """
         result = db.execute_query(query)
@@ -348,101 +1074,186 @@ class GraphOperations:
         # Process each company manually
         for record in companies:
             company_id = record["company_id"]
-            shareholders_str = record["shareholders_str"]
-
-            # Skip if the format is not as expected
-            if not shareholders_str.startswith("[{") or not shareholders_str.endswith("}]"):
-                continue
+            for shareholder_id, percentage in GraphOperations._parse_shareholders(record["shareholders_str"]):
+                relationship_count += GraphOperations._merge_shareholder_relationship(
+                    company_id, shareholder_id, percentage
+                )
 
-            # Extract shareholder IDs from the string - this is a simple approach
-            # A more robust approach would use a proper parser
-            import re
-            shareholder_matches = re.findall(r"'id': '([^']+)'", shareholders_str)
-            percentage_matches = re.findall(r"'percentage': ([0-9.]+)", shareholders_str)
-
-            # Create relationships for each shareholder
-            for i, shareholder_id in enumerate(shareholder_matches):
-                percentage = float(percentage_matches[i]) if i < len(percentage_matches) else 0.0
-
-                query2 = """
-                MATCH (company:User {id: $company_id}), (shareholder:User {id: $shareholder_id})
-                WHERE company.id <> shareholder.id
-                MERGE (shareholder)-[r:SHAREHOLDER_OF {
-                    percentage: $percentage,
-                    created_at: datetime()
-                }]->(company)
-                RETURN count(r) as rel_count
-                """
+        return relationship_count
 
-                params = {
-                    "company_id": company_id,
-                    "shareholder_id": shareholder_id,
-                    "percentage": percentage
-                }
+    @staticmethod
+    def _parse_shareholders(shareholders_str: Optional[str]) -> List[tuple]:
+        """Parse the stringified shareholders list into (shareholder_id, percentage) pairs"""
+        # Skip if the format is not as expected
+        if not shareholders_str or not shareholders_str.startswith("[{") or not shareholders_str.endswith("}]"):
+            return []
 
-                result = db.execute_query(query2, params)
-                if result:
-                    relationship_count += result[0]["rel_count"]
+        # The string is the str() of a list of dicts, so it parses back as a Python literal
+        try:
+            shareholders = ast.literal_eval(shareholders_str)
+        except (ValueError, SyntaxError):
+            return []
 
-        return relationship_count
+        return [
+            (str(shareholder["id"]), float(shareholder.get("percentage") or 0.0))
+            for shareholder in shareholders
+            if isinstance(shareholder, dict) and shareholder.get("id") is not None
+        ]
 
     @staticmethod
-    def _create_composite_relationships():
-        """Create composite relationships by combining multiple relationship types"""
+    def _merge_shareholder_relationship(company_id: str, shareholder_id: str, percentage: float) -> int:
+        """Create a single SHAREHOLDER_OF relationship if it does not exist yet"""
         query = """
+        MATCH (company:User {id: $company_id}), (shareholder:User {id: $shareholder_id})
+        WHERE company.id <> shareholder.id
+        MERGE (shareholder)-[r:SHAREHOLDER_OF {percentage: $percentage}]->(company)
+        ON CREATE SET r.created_at = datetime()
+        RETURN count(r) as rel_count
+        """
+
+        params = {
+            "company_id": company_id,
+            "shareholder_id": shareholder_id,
+            "percentage": percentage
+        }
+
+        result = db.execute_query(query, params)
+        return result[0]["rel_count"] if result else 0
+
+    @staticmethod
+    def _create_composite_relationships(user_ids: Optional[List[str]] = None) -> Tuple[int, Dict[str, int]]:
+        """
+        Create composite relationships by combining multiple relationship types
+
+        With IDENTIFIER_NODES set, identifier nodes both users link to count as
+        the pairwise type they replace. The candidate pairs are the users with a
+        direct relationship plus the owners of each identifier node with at most
+        COMPOSITE_IDENTIFIER_LIMIT users, so the pairs of larger nodes are not
+        listed and the nodes are reported as skipped.
+
+        Args:
+            user_ids: Optional list of user IDs; when given, only the composites
+                      between these users and their neighbours are recomputed
+
+        Returns:
+            (relationship_count, skipped_identifiers): the number of composite
+            relationships created or refreshed, and the owner count of each
+            identifier node whose pairs were not listed
+        """
+        parameters = {"limit": COMPOSITE_IDENTIFIER_LIMIT}
+        skipped = {}
+        if user_ids is not None:
+            parameters["user_ids"] = list(user_ids)
+
+        # Anchor on the given users when recomputing incrementally
+        if IDENTIFIER_NODES:
+            if user_ids is None:
+                identifiers_clause = "MATCH (i:Identifier)"
+                candidates_clause = f"""CALL {{
+            MATCH (u1:User)-[r1]->(u2:User)
+            WHERE type(r1) <> "COMPOSITE"
+            RETURN u1, u2
+            UNION
+            MATCH (i:Identifier)
+            WHERE COUNT {{ (i)<-[:{USER_IDENTIFIER_RELATIONSHIPS}]-(:User) }} <= $limit
+            MATCH (u1:User)-[:{USER_IDENTIFIER_RELATIONSHIPS}]->(i)<-[:{USER_IDENTIFIER_RELATIONSHIPS}]-(u2:User)
+            WHERE u1 <> u2
+            RETURN u1, u2
+        }}
+        WITH DISTINCT u1, u2"""
+            else:
+                identifiers_clause = f"""UNWIND $user_ids AS user_id
+            MATCH (:User {{id: user_id}})-[:{USER_IDENTIFIER_RELATIONSHIPS}]->(i:Identifier)
+            WITH DISTINCT i"""
+                candidates_clause = f"""CALL {{
+            UNWIND $user_ids AS user_id
+            MATCH (u:User {{id: user_id}})--(other:User)
+            RETURN u, other
+            UNION
+            UNWIND $user_ids AS user_id
+            MATCH (u:User {{id: user_id}})-[:{USER_IDENTIFIER_RELATIONSHIPS}]->(i:Identifier)
+            WHERE COUNT {{ (i)<-[:{USER_IDENTIFIER_RELATIONSHIPS}]-(:User) }} <= $limit
+            MATCH (i)<-[:{USER_IDENTIFIER_RELATIONSHIPS}]-(other:User)
+            WHERE other <> u
+            RETURN u, other
+        }}
+        WITH DISTINCT u, other
+        UNWIND [[u, other], [other, u]] AS pair
+        WITH DISTINCT pair[0] AS u1, pair[1] AS u2"""
+
+            query = f"""
+            {identifiers_clause}
+            WITH i, COUNT {{ (i)<-[:{USER_IDENTIFIER_RELATIONSHIPS}]-(:User) }} AS owner_count
+            WHERE owner_count > $limit
+            RETURN i.id AS identifier_id, owner_count
+            """
+            skipped = {
+                record["identifier_id"]: record["owner_count"]
+                for record in db.execute_query(query, parameters)
+            }
+
+            # Each candidate pair then looks for the identifier nodes both users
+            # link to, whatever their size, next to its direct relationships
+            match_clause = f"""{candidates_clause}
+        CALL {{
+            WITH u1, u2
+            OPTIONAL MATCH (u1)-[r1]->(u2)
+            WHERE type(r1) <> "COMPOSITE"
+            RETURN collect(DISTINCT type(r1)) AS direct_types
+        }}
+        CALL {{
+            WITH u1, u2
+            MATCH (u1)-[r1:{USER_IDENTIFIER_RELATIONSHIPS}]->(:Identifier)<-[r2]-(u2)
+            WHERE type(r2) = type(r1)
+            RETURN collect(DISTINCT 'SHARED_' + substring(type(r1), 4)) AS shared_types
+        }}
+        UNWIND direct_types + shared_types AS rel_type"""
+        elif user_ids is None:
+            match_clause = """MATCH (u1:User)-[r1]->(u2:User)
+        WITH u1, u2, type(r1) AS rel_type"""
+        else:
+            match_clause = """UNWIND $user_ids AS user_id
+        MATCH (u:User {id: user_id})--(other:User)
+        WITH DISTINCT u, other
+        UNWIND [[u, other], [other, u]] AS pair
+        WITH DISTINCT pair[0] AS u1, pair[1] AS u2
+        MATCH (u1)-[r1]->(u2)
+        WITH u1, u2, type(r1) AS rel_type"""
+
+        query = f"""
         // Find users that have multiple types of relationships
-        MATCH (u1:User)-[r1]->(u2:User)
-        WITH u1, u2, count(distinct type(r1)) as rel_count, collect(distinct type(r1)) as rel_types
+        {match_clause}
+        WITH u1, u2, rel_type
+        WHERE rel_type <> "COMPOSITE"
+        WITH u1, u2, count(distinct rel_type) as rel_count, collect(distinct rel_type) as rel_types
         WHERE rel_count >= 2
 
         // Calculate relationship strength based on number of relationships
         WITH u1, u2, rel_count, rel_types,
-             (rel_count * 0.2) +
-             CASE WHEN "PARENT_OF" IN rel_types OR "SUBSIDIARY_OF" IN rel_types THEN 0.3 ELSE 0 END +
-             CASE WHEN "DIRECTOR_OF" IN rel_types THEN 0.2 ELSE 0 END +
-             CASE WHEN "SHAREHOLDER_OF" IN rel_types THEN 0.2 ELSE 0 END +
-             CASE WHEN "SHARED_EMAIL" IN rel_types THEN 0.1 ELSE 0 END +
-             CASE WHEN "SHARED_PHONE" IN rel_types THEN 0.1 ELSE 0 END +
-             CASE WHEN "SHARED_ADDRESS" IN rel_types THEN 0.1 ELSE 0 END +
-             CASE WHEN "SHARED_PAYMENT_METHOD" IN rel_types THEN 0.1 ELSE 0 END
+             {_composite_strength_cypher("rel_types", "rel_count")}
              as strength
 
-        // Create composite relationship with calculated strength
-        MERGE (u1)-[r:COMPOSITE {
-            strength: strength,
-            relationship_types: rel_types,
-            created_at: datetime()
-        }]->(u2)
+        // Create or refresh the composite relationship with calculated strength
+        MERGE (u1)-[r:COMPOSITE]->(u2)
+        ON CREATE SET r.created_at = datetime()
+        SET r.strength = strength,
+            r.relationship_types = rel_types
 
         RETURN count(r) as relationship_count
         """
-        result = db.execute_query(query)
-        return result[0]["relationship_count"] if result else 0
+        result = db.execute_query(query, parameters)
+        return (result[0]["relationship_count"] if result else 0), skipped
 
     @staticmethod
     def get_business_relationships(user_id: str) -> Dict[str, Any]:
         """Get all business relationships of a user"""
-        query = """
-        MATCH (u:User {id: $user_id})
-
-        // Get outgoing business relationships
-        OPTIONAL MATCH (u)-[r1:PARENT_OF|DIRECTOR_OF|SHAREHOLDER_OF|COMPOSITE]->(target1:User)
-
-        // Get incoming business relationships
-        OPTIONAL MATCH (source2:User)-[r2:PARENT_OF|DIRECTOR_OF|SHAREHOLDER_OF|COMPOSITE]->(u)
-
-        // Get subsidiary relationships
-        OPTIONAL MATCH (u)-[r3:SUBSIDIARY_OF]->(parent:User)
-
-        RETURN u,
-               collect(DISTINCT {type: type(r1), node: target1, properties: properties(r1), direction: 'outgoing'}) AS outgoing_business,
-               collect(DISTINCT {type: type(r2), node: source2, properties: properties(r2), direction: 'incoming'}) AS incoming_business,
-               collect(DISTINCT {type: type(r3), node: parent, properties: properties(r3), direction: 'outgoing'}) AS parent_entities
-        """
-
         parameters = {"user_id": user_id}
-        result = db.execute_query(query, parameters)
+        result = db.execute_query(BUSINESS_RELATIONSHIPS_QUERY, parameters)
+        return GraphOperations._format_business_relationships(result)
 
+    @staticmethod
+    def _format_business_relationships(result) -> Optional[Dict[str, Any]]:
+        """Format the result of BUSINESS_RELATIONSHIPS_QUERY"""
         if not result:
             return None
 
@@ -459,4 +1270,47 @@ class GraphOperations:
     @staticmethod
     def get_current_timestamp() -> str:
         """Get the current timestamp in ISO format"""
-        return datetime.now().isoformat()
\ No newline at end of file
+        return datetime.now().isoformat()
+
+class AsyncGraphOperations:
+    """Async variants of the GraphOperations read methods, built on the async driver"""
+
+    @staticmethod
+    async def get_all_users() -> List[Dict[str, Any]]:
+        """Get all users from the graph database"""
+        return [user async for user in AsyncGraphOperations.iter_all_users()]
+
+    @staticmethod
+    async def iter_all_users() -> AsyncIterator[Dict[str, Any]]:
+        """Stream all users from the graph database"""
+        async for record in async_db.stream_query(ALL_USERS_QUERY):
+            yield serialize_neo4j_object(record["u"])
+
+    @staticmethod
+    async def get_all_transactions() -> List[Dict[str, Any]]:
+        """Get all transactions from the graph database"""
+        return [transaction async for transaction in AsyncGraphOperations.iter_all_transactions()]
+
+    @staticmethod
+    async def iter_all_transactions() -> AsyncIterator[Dict[str, Any]]:
+        """Stream all transactions from the graph database"""
+        async for record in async_db.stream_query(ALL_TRANSACTIONS_QUERY):
+            yield serialize_neo4j_object(record["t"])
+
+    @staticmethod
+    async def get_user_relationships(user_id: str) -> Dict[str, Any]:
+        """Get all relationships of a user"""
+        result = await async_db.execute_query(USER_RELATIONSHIPS_QUERY, {"user_id": user_id})
+        return GraphOperations._format_user_relationships(result)
+
+    @staticmethod
+    async def get_transaction_relationships(transaction_id: str) -> Dict[str, Any]:
+        """Get all relationships of a transaction"""
+        result = await async_db.execute_query(TRANSACTION_RELATIONSHIPS_QUERY, {"transaction_id": transaction_id})
+        return GraphOperations._format_transaction_relationships(result)
+
+    @staticmethod
+    async def get_business_relationships(user_id: str) -> Dict[str, Any]:
+        """Get all business relationships of a user"""
+        result = await async_db.execute_query(BUSINESS_RELATIONSHIPS_QUERY, {"user_id": user_id})
+        return GraphOperations._format_business_relationships(result)
@@ -4,7 +4,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api.endpoints import router
-from app.database.connection import db
+from app.database.connection import db, async_db
 import uvicorn
 
 # Define lifespan context manager
@@ -12,9 +12,11 @@ import uvicorn
 async def lifespan(app: FastAPI):
     # Connect to the database on startup
     db.connect()
+    async_db.connect()
     yield
-    # Close the database connection on shutdown
+    # Close the database connections on shutdown
     db.close()
+    await async_db.close()
 
 app = FastAPI(
     title="User & Transaction Graph API",
@@ -106,3 +106,43 @@ class BusinessRelationship(BaseModel):
                 "details": {"position": "CEO", "appointed_date": "2022-01-01"}
             }
         }
+
+class PathPair(BaseModel):
+    source_id: str
+    target_id: str
+
+class ShortestPathsRequest(BaseModel):
+    pairs: List[PathPair] = Field(..., min_length=1, max_length=10000)
+    relationship_types: Optional[List[str]] = None  # If None, all relationship types are considered
+    max_hops: Optional[int] = Field(None, ge=1)
+    hydrate: bool = True  # Include node and relationship properties in the paths
+    weight: Optional[str] = Field(None, pattern="^(strength|amount|percentage)$")  # Find the strongest paths instead
+    landmarks: bool = False  # Use landmark distances (A*) for weighted paths
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "pairs": [
+                    {"source_id": "user_id_1", "target_id": "user_id_2"},
+                    {"source_id": "user_id_1", "target_id": "user_id_3"}
+                ],
+                "relationship_types": ["SENT", "RECEIVED_BY", "COMPOSITE"],
+                "max_hops": 6,
+                "hydrate": False
+            }
+        }
+
+class RiskScoresRequest(BaseModel):
+    seed_ids: List[str] = Field(..., min_length=1, max_length=1000000)  # Known bad users or transactions
+    top: int = Field(100, ge=1, le=10000)
+    node_type: Optional[str] = Field(None, pattern="^(User|Transaction)$")
+    include_seeds: bool = False  # Rank the seeds themselves as well
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "seed_ids": ["user_id_1", "user_id_2"],
+                "top": 50,
+                "node_type": "User"
+            }
+        }
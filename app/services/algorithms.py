@@ -0,0 +1,786 @@
+"""
+Graph algorithms over the CSR arrays of a GraphProjection
+
+The functions here work on node indices and NumPy arrays only; translating to
+and from node IDs and formatting results is left to the analytics services.
+"""
+import heapq
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+def expand(offsets: np.ndarray, targets: np.ndarray, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gather the CSR entries of all frontier nodes at once
+
+    Returns:
+        (positions, origins): positions of the entries in targets, and for each
+        entry the frontier node it belongs to
+    """
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    # Position of each entry = start of its node's run + index within the run
+    run_starts = np.cumsum(counts) - counts
+    positions = np.repeat(starts - run_starts, counts) + np.arange(total, dtype=np.int64)
+    return positions, np.repeat(frontier, counts)
+
+def multi_source_bfs(offsets: np.ndarray, targets: np.ndarray, sources: np.ndarray,
+                     max_depth: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Breadth-first search from many sources at once, up to max_depth hops
+
+    Returns:
+        (dist, owner): hop distance from the nearest source and the index of that
+        source, both -1 for nodes not reached
+    """
+    num_nodes = len(offsets) - 1
+    dist = np.full(num_nodes, -1, dtype=np.int64)
+    owner = np.full(num_nodes, -1, dtype=np.int64)
+    dist[sources] = 0
+    owner[sources] = sources
+    frontier = np.asarray(sources, dtype=np.int64)
+
+    for depth in range(1, max_depth + 1):
+        if len(frontier) == 0:
+            break
+        positions, origins = expand(offsets, targets, frontier)
+        neighbors = targets[positions]
+        new = dist[neighbors] < 0
+        # A node reached from several frontier nodes takes the first one's owner
+        neighbors, first = np.unique(neighbors[new], return_index=True)
+        dist[neighbors] = depth
+        owner[neighbors] = owner[origins[new][first]]
+        frontier = neighbors
+
+    return dist, owner
+
+def multi_source_distances(offsets: np.ndarray, targets: np.ndarray, sources: np.ndarray, lengths: np.ndarray,
+                           max_distance: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Multi-source shortest distances over edges of small integer lengths, up to max_distance
+
+    A bucketed Dijkstra (Dial's algorithm): nodes are settled one distance at a
+    time, each bucket expanded at once like a BFS level.
+
+    Args:
+        lengths: Positive integer length of every CSR entry
+
+    Returns:
+        (dist, owner) as in multi_source_bfs, with dist the total length
+    """
+    num_nodes = len(offsets) - 1
+    dist = np.full(num_nodes, -1, dtype=np.int64)
+    owner = np.full(num_nodes, -1, dtype=np.int64)
+    # Tentative distances and owners, max_distance + 1 for nodes not reached yet
+    best = np.full(num_nodes, max_distance + 1, dtype=np.int64)
+    best_owner = np.full(num_nodes, -1, dtype=np.int64)
+    best[sources] = 0
+    best_owner[sources] = sources
+
+    for distance in range(max_distance + 1):
+        bucket = np.flatnonzero((best == distance) & (dist < 0))
+        if len(bucket) == 0:
+            continue
+        dist[bucket] = distance
+        owner[bucket] = best_owner[bucket]
+        positions, origins = expand(offsets, targets, bucket)
+        neighbors = targets[positions]
+        candidates = distance + lengths[positions].astype(np.int64)
+        better = (dist[neighbors] < 0) & (candidates < best[neighbors])
+        neighbors, candidates, origins = neighbors[better], candidates[better], origins[better]
+        # The shortest candidate of each neighbor, taking the first one's owner on ties
+        order = np.lexsort((candidates, neighbors))
+        neighbors, first = np.unique(neighbors[order], return_index=True)
+        best[neighbors] = candidates[order][first]
+        best_owner[neighbors] = owner[origins[order][first]]
+
+    return dist, owner
+
+def connected_components(num_nodes: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """
+    Disjoint-set union of the pairs (u[i], v[i]) over nodes 0..num_nodes-1
+
+    Unions are applied to all pairs at once: each round links the larger root of
+    every pair to the smaller one, then compresses paths by pointer jumping.
+
+    Returns:
+        Component label of every node: the smallest node index in its component
+    """
+    labels = np.arange(num_nodes, dtype=np.int64)
+    u = np.asarray(u, dtype=np.int64)
+    v = np.asarray(v, dtype=np.int64)
+
+    while True:
+        label_u = labels[u]
+        label_v = labels[v]
+        pending = label_u != label_v
+        if not pending.any():
+            return labels
+        u, v = u[pending], v[pending]
+        label_u, label_v = label_u[pending], label_v[pending]
+        np.minimum.at(labels, np.maximum(label_u, label_v), np.minimum(label_u, label_v))
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+def components_within_distance(offsets: np.ndarray, targets: np.ndarray, sources: np.ndarray,
+                               edge_u: np.ndarray, edge_v: np.ndarray, max_distance: int,
+                               lengths: Optional[np.ndarray] = None,
+                               edge_lengths: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Group sources that are connected by chains of paths of at most max_distance hops
+
+    A multi-source BFS assigns every node its nearest source. Two sources a, b
+    within max_distance of each other are linked by a shortest path in which
+    every edge (x, y) satisfies dist[x] + 1 + dist[y] <= max_distance, and the
+    owners of x and y are then themselves within max_distance. Uniting the
+    owners across such edges therefore gives exactly the connected components
+    of the "within max_distance" relation, in O(V + E). The same holds with
+    edge lengths in place of 1, using multi_source_distances.
+
+    Args:
+        offsets, targets: Undirected CSR adjacency
+        sources: Node indices to group
+        edge_u, edge_v: Endpoints of every edge, once per edge
+        max_distance: Maximum number of hops (or total length) between two sources in a group
+        lengths, edge_lengths: Optional positive integer lengths of every CSR
+                               entry and of every edge; 1 if not given
+
+    Returns:
+        Component label of every node (only meaningful for sources): the
+        smallest source index in its component
+    """
+    if lengths is None:
+        dist, owner = multi_source_bfs(offsets, targets, sources, max_distance - 1)
+        edge_lengths = 1
+    else:
+        dist, owner = multi_source_distances(offsets, targets, sources, lengths, max_distance - 1)
+    close = (dist[edge_u] >= 0) & (dist[edge_v] >= 0) & (dist[edge_u] + edge_lengths + dist[edge_v] <= max_distance)
+    return connected_components(len(offsets) - 1, owner[edge_u[close]], owner[edge_v[close]])
+
+def _entries(offsets: np.ndarray, targets: np.ndarray, allowed: Optional[np.ndarray],
+             node: int) -> Iterable[Tuple[int, int]]:
+    """(CSR position, neighbor) pairs of a node, restricted to the allowed entries"""
+    start, end = int(offsets[node]), int(offsets[node + 1])
+    if allowed is None:
+        return zip(range(start, end), targets[start:end].tolist())
+    positions = start + np.flatnonzero(allowed[start:end])
+    return zip(positions.tolist(), targets[positions].tolist())
+
+def _walk(parents: Dict[int, Tuple[int, int, int]], node: int) -> Tuple[List[int], List[int]]:
+    """Follow BFS parent links from node back to the root, returning (nodes, positions) from node"""
+    nodes = [node]
+    positions = []
+    parent, position, _ = parents[node]
+    while parent >= 0:
+        nodes.append(parent)
+        positions.append(position)
+        parent, position, _ = parents[parent]
+    return nodes, positions
+
+def bidirectional_bfs(offsets: np.ndarray, targets: np.ndarray, allowed: Optional[np.ndarray],
+                      source: int, target: int,
+                      max_hops: Optional[int] = None) -> Optional[Tuple[List[int], List[int]]]:
+    """
+    Unweighted shortest path between two nodes, searching from both ends
+
+    Each step expands a whole BFS level of the side with the smaller frontier,
+    so the search visits roughly two balls of half the path length instead of
+    one ball of the full length.
+
+    Args:
+        offsets, targets: CSR adjacency
+        allowed: Optional boolean mask over CSR entries of the edges that may be used
+        source, target: Node indices
+        max_hops: Optional maximum path length
+
+    Returns:
+        (nodes, positions): the path from source to target and the CSR position of
+        each edge on it, or None if there is no path within max_hops
+    """
+    if source == target:
+        return [source], []
+
+    # node -> (parent, CSR position of the edge to the parent, depth)
+    forward = {source: (-1, -1, 0)}
+    backward = {target: (-1, -1, 0)}
+    forward_frontier = [source]
+    backward_frontier = [target]
+    forward_depth = backward_depth = 0
+
+    while forward_frontier and backward_frontier:
+        if max_hops is not None and forward_depth + backward_depth >= max_hops:
+            return None
+
+        expand_forward = len(forward_frontier) <= len(backward_frontier)
+        if expand_forward:
+            visited, other, frontier = forward, backward, forward_frontier
+            forward_depth += 1
+            depth = forward_depth
+        else:
+            visited, other, frontier = backward, forward, backward_frontier
+            backward_depth += 1
+            depth = backward_depth
+
+        # Finish the level before choosing among the meeting points: the first one
+        # found is not necessarily on a shortest path
+        best = None
+        next_frontier = []
+        for node in frontier:
+            for position, neighbor in _entries(offsets, targets, allowed, node):
+                if neighbor in visited:
+                    continue
+                visited[neighbor] = (node, position, depth)
+                next_frontier.append(neighbor)
+                if neighbor in other:
+                    length = depth + other[neighbor][2]
+                    if best is None or length < best[0]:
+                        best = (length, neighbor)
+
+        if best is not None:
+            length, meeting = best
+            if max_hops is not None and length > max_hops:
+                return None
+            forward_nodes, forward_positions = _walk(forward, meeting)
+            backward_nodes, backward_positions = _walk(backward, meeting)
+            return forward_nodes[::-1] + backward_nodes[1:], forward_positions[::-1] + backward_positions
+
+        if expand_forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
+
+def bfs_paths(offsets: np.ndarray, targets: np.ndarray, allowed: Optional[np.ndarray], source: int,
+              destinations: Iterable[int], max_hops: Optional[int] = None) -> Dict[int, Tuple[List[int], List[int]]]:
+    """
+    Unweighted shortest paths from one source to several destinations with a single BFS
+
+    The search stops as soon as every destination has been reached.
+
+    Returns:
+        Dictionary from each reachable destination to (nodes, positions), as in
+        bidirectional_bfs
+    """
+    remaining = set(destinations)
+    parents = {source: (-1, -1, 0)}
+    remaining.discard(source)
+    frontier = [source]
+    depth = 0
+
+    while frontier and remaining and (max_hops is None or depth < max_hops):
+        depth += 1
+        next_frontier = []
+        for node in frontier:
+            for position, neighbor in _entries(offsets, targets, allowed, node):
+                if neighbor not in parents:
+                    parents[neighbor] = (node, position, depth)
+                    next_frontier.append(neighbor)
+                    remaining.discard(neighbor)
+        frontier = next_frontier
+
+    paths = {}
+    for destination in set(destinations):
+        if destination in parents:
+            nodes, positions = _walk(parents, destination)
+            paths[destination] = (nodes[::-1], positions[::-1])
+    return paths
+
+def dijkstra(offsets: np.ndarray, targets: np.ndarray, costs: np.ndarray, source: int) -> np.ndarray:
+    """
+    Heap-based Dijkstra from one source to every node
+
+    Args:
+        offsets, targets: CSR adjacency
+        costs: Non-negative cost of every CSR entry, inf for entries that may not be used
+
+    Returns:
+        Distance of every node from source, inf where unreachable
+    """
+    # Plain lists are much faster than NumPy arrays for element-wise access
+    offsets_list = offsets.tolist()
+    targets_list = targets.tolist()
+    costs_list = costs.tolist()
+    dist = [math.inf] * (len(offsets_list) - 1)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > dist[node]:
+            continue
+        for position in range(offsets_list[node], offsets_list[node + 1]):
+            neighbor = targets_list[position]
+            candidate = distance + costs_list[position]
+            if candidate < dist[neighbor]:
+                dist[neighbor] = candidate
+                heapq.heappush(heap, (candidate, neighbor))
+    return np.array(dist)
+
+def select_landmarks(offsets: np.ndarray, targets: np.ndarray, costs: np.ndarray,
+                     count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pick landmarks by farthest-point selection and compute their distances to every node
+
+    The first landmark is the node with the most usable edges; each next one is
+    the node farthest from the landmarks chosen so far.
+
+    Returns:
+        (landmarks, distances): landmark node indices and a (count, num_nodes)
+        array of their distances, inf where unreachable
+    """
+    num_nodes = len(offsets) - 1
+    usable = np.bincount(np.repeat(np.arange(num_nodes), np.diff(offsets)), weights=np.isfinite(costs),
+                         minlength=num_nodes)
+    landmarks = [int(np.argmax(usable))]
+    distances = [dijkstra(offsets, targets, costs, landmarks[0])]
+    closest = distances[0].copy()
+    while len(landmarks) < count:
+        reachable = np.where(np.isfinite(closest), closest, -1.0)
+        candidate = int(np.argmax(reachable))
+        if reachable[candidate] <= 0:
+            break
+        landmarks.append(candidate)
+        distances.append(dijkstra(offsets, targets, costs, candidate))
+        closest = np.minimum(closest, distances[-1])
+    return np.array(landmarks, dtype=np.int64), np.vstack(distances)
+
+def landmark_heuristic(landmark_distances: np.ndarray, target: int) -> np.ndarray:
+    """
+    ALT lower bound on the cost from every node to target
+
+    By the triangle inequality, max over landmarks L of |d(L, target) - d(L, node)|
+    never overestimates the remaining cost. Nodes that a landmark reaches while
+    it does not reach target (or the reverse) are in another component and get inf.
+    """
+    to_target = landmark_distances[:, target][:, None]
+    reached = np.isfinite(landmark_distances)
+    both = reached & np.isfinite(to_target)
+    with np.errstate(invalid="ignore"):
+        bounds = np.where(both, np.abs(landmark_distances - to_target), 0.0).max(axis=0)
+    bounds[np.any(reached != np.isfinite(to_target), axis=0)] = np.inf
+    return bounds
+
+def weighted_shortest_path(offsets: np.ndarray, targets: np.ndarray, costs: np.ndarray, source: int, target: int,
+                           landmark_distances: Optional[np.ndarray] = None,
+                           max_cost: float = math.inf) -> Optional[Tuple[List[int], List[int], float]]:
+    """
+    Cheapest path between two nodes with Dijkstra, or A* when landmark distances are given
+
+    With landmarks (ALT), landmark_heuristic steers the search towards the
+    target. Costs must be symmetric, as in the undirected CSR view.
+
+    Returns:
+        (nodes, positions, cost) as in bidirectional_bfs plus the total cost,
+        or None if target is unreachable within max_cost
+    """
+    bounds = None
+    if landmark_distances is not None:
+        heuristic = landmark_heuristic(landmark_distances, target)
+        if heuristic[source] == np.inf:
+            return None
+        bounds = heuristic.tolist()
+
+    dist = {source: 0.0}
+    parents = {source: (-1, -1, 0)}
+    closed = set()
+    heap = [(bounds[source] if bounds else 0.0, 0.0, source)]
+    while heap:
+        _, distance, node = heapq.heappop(heap)
+        if node in closed:
+            continue
+        if node == target:
+            nodes, positions = _walk(parents, target)
+            return nodes[::-1], positions[::-1], distance
+        closed.add(node)
+        start, end = int(offsets[node]), int(offsets[node + 1])
+        for position, neighbor, cost in zip(range(start, end), targets[start:end].tolist(), costs[start:end].tolist()):
+            if cost == math.inf or neighbor in closed:
+                continue
+            candidate = distance + cost
+            if candidate <= max_cost and candidate < dist.get(neighbor, math.inf):
+                estimate = bounds[neighbor] if bounds else 0.0
+                if estimate == math.inf:
+                    continue
+                dist[neighbor] = candidate
+                parents[neighbor] = (node, position, 0)
+                heapq.heappush(heap, (candidate + estimate, candidate, neighbor))
+    return None
+
+def pagerank(sources: np.ndarray, targets: np.ndarray, num_nodes: int, weights: Optional[np.ndarray] = None,
+             damping: float = 0.85, tolerance: float = 1e-6, max_iterations: int = 100,
+             personalization: Optional[np.ndarray] = None,
+             initial: Optional[np.ndarray] = None) -> Tuple[np.ndarray, int, bool]:
+    """
+    PageRank by power iteration over directed edges
+
+    Each iteration is one sparse matrix-vector product, computed as a gather of
+    the source scores and a np.bincount scatter onto the targets, so it costs
+    O(E) in NumPy. Random jumps, and the score of dangling nodes (no outgoing
+    weight), go to all nodes evenly or, for personalized PageRank (random walk
+    with restart), in proportion to the personalization vector.
+
+    Args:
+        sources, targets: Endpoints of every directed edge
+        num_nodes: Number of nodes
+        weights: Optional non-negative weight of every edge; a node passes its
+                 score on in proportion to the weights of its outgoing edges,
+                 and edges with a zero or NaN weight are ignored
+        damping: Probability of following an edge rather than jumping to a random node
+        tolerance: Stop once the L1 change between iterations drops below this
+        max_iterations: Maximum number of iterations
+        personalization: Optional non-negative restart weight of every node
+        initial: Optional scores to start iterating from, such as the result of
+                 an earlier run on a similar problem; the closer they are to the
+                 result, the fewer iterations are needed
+
+    Returns:
+        (scores, iterations, converged): scores sum to 1
+    """
+    if num_nodes == 0:
+        return np.empty(0), 0, True
+    if personalization is None:
+        restart = np.full(num_nodes, 1.0 / num_nodes)
+    else:
+        restart = np.asarray(personalization, dtype=np.float64) / np.sum(personalization)
+    if weights is None:
+        weights = np.ones(len(sources))
+    else:
+        weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))
+        usable = weights > 0
+        sources, targets, weights = sources[usable], targets[usable], weights[usable]
+
+    out_weights = np.bincount(sources, weights=weights, minlength=num_nodes)
+    shares = weights / out_weights[sources]
+    dangling = out_weights == 0
+
+    if initial is not None and np.sum(initial) > 0:
+        scores = np.asarray(initial, dtype=np.float64) / np.sum(initial)
+    else:
+        scores = restart.copy()
+    for iteration in range(1, max_iterations + 1):
+        flow = np.bincount(targets, weights=scores[sources] * shares, minlength=num_nodes)
+        teleport = (1.0 - damping + damping * scores[dangling].sum()) * restart
+        updated = damping * flow + teleport
+        change = np.abs(updated - scores).sum()
+        scores = updated
+        if change < tolerance:
+            return scores, iteration, True
+    return scores, max_iterations, False
+
+def build_simple_csr(sources: np.ndarray, targets: np.ndarray, num_nodes: int,
+                     directed: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    CSR adjacency without parallel edges or self loops
+
+    Args:
+        sources, targets: Endpoints of every directed edge
+        num_nodes: Number of nodes
+        directed: Keep edge direction; otherwise every edge is listed from both ends
+
+    Returns:
+        (offsets, targets) with the neighbors of each node sorted
+    """
+    if not directed:
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+    keep = sources != targets
+    codes = np.unique(sources[keep].astype(np.int64) * num_nodes + targets[keep])
+    unique_sources, unique_targets = codes // num_nodes, codes % num_nodes
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(unique_sources, minlength=num_nodes), out=offsets[1:])
+    return offsets, unique_targets
+
+def brandes_dependencies(offsets: np.ndarray, targets: np.ndarray, sources: Iterable[int]) -> np.ndarray:
+    """
+    Sum of the Brandes dependencies of every node on the given sources
+
+    For each source, a level-synchronous BFS counts the shortest paths (sigma)
+    to every node, recording the edges of the shortest-path DAG level by level;
+    the dependencies are then accumulated back up the levels. Each level is
+    handled with whole-array operations, so a source costs O(V + E) in NumPy.
+    Summed over all sources, this is the exact (unnormalized) betweenness.
+
+    Args:
+        offsets, targets: CSR adjacency of a graph without parallel edges
+        sources: Source node indices
+    """
+    num_nodes = len(offsets) - 1
+    total = np.zeros(num_nodes)
+    for source in sources:
+        dist = np.full(num_nodes, -1, dtype=np.int64)
+        sigma = np.zeros(num_nodes)
+        dist[source] = 0
+        sigma[source] = 1.0
+        frontier = np.array([source], dtype=np.int64)
+        levels = []
+        depth = 0
+        while len(frontier):
+            positions, origins = expand(offsets, targets, frontier)
+            neighbors = targets[positions]
+            dist[neighbors[dist[neighbors] < 0]] = depth + 1
+            on_dag = dist[neighbors] == depth + 1
+            origins, neighbors = origins[on_dag], neighbors[on_dag]
+            # Nodes of this level have all their paths counted by now
+            np.add.at(sigma, neighbors, sigma[origins])
+            levels.append((origins, neighbors))
+            frontier = np.unique(neighbors)
+            depth += 1
+
+        delta = np.zeros(num_nodes)
+        for origins, neighbors in reversed(levels):
+            np.add.at(delta, origins, sigma[origins] / sigma[neighbors] * (1.0 + delta[neighbors]))
+        delta[source] = 0.0
+        total += delta
+    return total
+
+# Arrays shared with the worker processes of map_shared
+shared_arrays: Dict[str, np.ndarray] = {}
+_shared_blocks: List[shared_memory.SharedMemory] = []
+
+def _attach_arrays(specs: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> None:
+    """Process pool initializer: map the shared arrays into the worker"""
+    for name, (block, shape, dtype) in specs.items():
+        memory = shared_memory.SharedMemory(name=block)
+        shared_arrays[name] = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        # Keep the mapping alive for as long as the worker
+        _shared_blocks.append(memory)
+
+def map_shared(function: Callable[[Any], Any], chunks: List[Any], arrays: Dict[str, np.ndarray],
+               workers: int) -> List[Any]:
+    """
+    Map function over chunks in worker processes that share read-only arrays
+
+    The arrays are placed in shared memory once and are available to function
+    as shared_arrays[name] in every worker, instead of being sent with each
+    chunk. function must be defined at module level. With a single worker or
+    chunk, everything runs in the calling process.
+    """
+    if workers <= 1 or len(chunks) <= 1:
+        shared_arrays.update(arrays)
+        try:
+            return [function(chunk) for chunk in chunks]
+        finally:
+            for name in arrays:
+                shared_arrays.pop(name, None)
+
+    blocks = []
+    try:
+        specs = {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            specs[name] = (block.name, array.shape, array.dtype.str)
+        # Spawned workers avoid forking a process that runs other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_attach_arrays, initargs=(specs,)) as executor:
+            return list(executor.map(function, chunks))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+def _dependencies_chunk(sources: np.ndarray) -> np.ndarray:
+    return brandes_dependencies(shared_arrays["offsets"], shared_arrays["targets"], sources)
+
+def sampled_betweenness(offsets: np.ndarray, targets: np.ndarray, samples: np.ndarray,
+                        workers: int = 1) -> np.ndarray:
+    """
+    Sum of the Brandes dependencies on the sampled sources, computed in parallel
+
+    The samples are split into chunks that worker processes handle
+    independently (see map_shared).
+
+    Returns:
+        Summed dependencies of every node; scale by num_nodes / len(samples) to
+        estimate betweenness
+    """
+    if workers <= 1:
+        return brandes_dependencies(offsets, targets, samples)
+    chunks = [chunk for chunk in np.array_split(samples, min(len(samples), workers * 2)) if len(chunk)]
+    return sum(map_shared(_dependencies_chunk, chunks, {"offsets": offsets, "targets": targets}, workers))
+
+def betweenness_error_bound(num_nodes: int, samples: int, confidence: float) -> float:
+    """
+    Hoeffding bound on the error of sampled normalized betweenness
+
+    Each sampled source contributes a dependency in [0, num_nodes - 2] to a
+    node, so with probability at least confidence the estimate of every node is
+    within the returned value of its true normalized betweenness (a union
+    bound over all nodes).
+    """
+    if samples >= num_nodes or num_nodes < 3:
+        return 0.0
+    bound = math.sqrt(math.log(2 * num_nodes / (1 - confidence)) / (2 * samples))
+    return min(1.0, num_nodes / (num_nodes - 1) * bound)
+
+def build_weighted_csr(u: np.ndarray, v: np.ndarray, weights: np.ndarray,
+                       num_nodes: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Symmetric weighted CSR adjacency of the undirected edges (u[i], v[i])
+
+    Edges between the same pair of nodes are merged by summing their weights,
+    and every edge is listed from both ends. Self loops are listed once with
+    twice their weight, so that each row sums to the weighted degree.
+
+    Returns:
+        (offsets, targets, weights)
+    """
+    u = np.asarray(u, dtype=np.int64)
+    v = np.asarray(v, dtype=np.int64)
+    loops = u == v
+    sources = np.concatenate([u, v[~loops]])
+    targets = np.concatenate([v, u[~loops]])
+    entry_weights = np.concatenate([np.where(loops, 2.0 * weights, weights), weights[~loops]])
+    codes, inverse = np.unique(sources * num_nodes + targets, return_inverse=True)
+    merged = np.bincount(inverse.ravel(), weights=entry_weights, minlength=len(codes))
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes // num_nodes, minlength=num_nodes), out=offsets[1:])
+    return offsets, codes % num_nodes, merged
+
+def modularity(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray, labels: np.ndarray,
+               resolution: float = 1.0) -> float:
+    """Modularity of a partition of a graph given as symmetric weighted CSR"""
+    total = weights.sum()
+    if total == 0:
+        return 0.0
+    sources = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    internal = np.bincount(labels[sources], weights=np.where(labels[sources] == labels[targets], weights, 0.0))
+    degrees = np.bincount(labels[sources], weights=weights)
+    return float(internal.sum() / total - resolution * np.square(degrees / total).sum())
+
+def label_propagation(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray, max_iterations: int = 100,
+                      seed: int = 0) -> Tuple[np.ndarray, int, bool]:
+    """
+    Communities by weighted label propagation
+
+    Every node starts in its own community and repeatedly adopts the label with
+    the highest total edge weight among its neighbors, keeping its own label on
+    ties. The best labels are found for many nodes at once by aggregating the
+    (node, neighbor label) weights; only a random half of the nodes that would
+    change adopt their new label in each round, which keeps fully synchronous
+    updates from oscillating. After the first round, only nodes next to a label
+    change (or still waiting to change) are re-examined.
+
+    Returns:
+        (labels, iterations, converged): labels are node indices
+    """
+    num_nodes = len(offsets) - 1
+    labels = np.arange(num_nodes, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    active = np.flatnonzero(np.diff(offsets) > 0)
+
+    for iteration in range(1, max_iterations + 1):
+        if len(active) == 0:
+            return labels, iteration - 1, True
+        positions, origins = expand(offsets, targets, active)
+        keys, inverse = np.unique(origins * num_nodes + labels[targets[positions]], return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=weights[positions], minlength=len(keys))
+        nodes, candidates = keys // num_nodes, keys % num_nodes
+
+        # Keys are sorted by node, then label: take each node's first label with the highest total
+        starts = np.flatnonzero(np.concatenate([[True], nodes[1:] != nodes[:-1]]))
+        group_max = np.maximum.reduceat(totals, starts)
+        group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(keys))))
+        best_index = np.flatnonzero(totals == group_max[group])
+        best_index = best_index[np.concatenate([[True], group[best_index][1:] != group[best_index][:-1]])]
+        best_nodes, best_labels = nodes[best_index], candidates[best_index]
+
+        # Keep the current label when it is as good as the best one
+        own_keys = best_nodes * num_nodes + labels[best_nodes]
+        own = np.minimum(np.searchsorted(keys, own_keys), len(keys) - 1)
+        own_totals = np.where(keys[own] == own_keys, totals[own], 0.0)
+        changing = (best_labels != labels[best_nodes]) & (group_max > own_totals)
+        if not changing.any():
+            return labels, iteration, True
+
+        applied = changing & (rng.random(len(changing)) < 0.5)
+        labels[best_nodes[applied]] = best_labels[applied]
+        changed = best_nodes[applied]
+        neighbor_positions, _ = expand(offsets, targets, changed)
+        active = np.unique(np.concatenate([best_nodes[changing & ~applied], targets[neighbor_positions]]))
+    return labels, max_iterations, False
+
+def louvain(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray, resolution: float = 1.0,
+            max_levels: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Communities by the Louvain method
+
+    Each level moves nodes, one at a time in random order, to the neighboring
+    community with the largest modularity gain until no move improves it, then
+    collapses every community into a single node (build_weighted_csr) and
+    repeats on the smaller graph. The local moves are sequential by nature and
+    run over plain lists; the aggregation between levels is vectorized.
+
+    Args:
+        offsets, targets, weights: Symmetric weighted CSR, as from build_weighted_csr
+        resolution: Higher values favor smaller communities
+
+    Returns:
+        Community label of every node, numbered from 0
+    """
+    num_nodes = len(offsets) - 1
+    labels = np.arange(num_nodes, dtype=np.int64)
+    total = float(weights.sum())
+    if total == 0:
+        return labels
+    rng = np.random.default_rng(seed)
+
+    for _ in range(max_levels):
+        level_nodes = len(offsets) - 1
+        offsets_list = offsets.tolist()
+        targets_list = targets.tolist()
+        weights_list = weights.tolist()
+        sources = np.repeat(np.arange(level_nodes, dtype=np.int64), np.diff(offsets))
+        degrees = np.bincount(sources, weights=weights, minlength=level_nodes).tolist()
+        community = list(range(level_nodes))
+        community_degrees = list(degrees)
+        moved = False
+
+        improved = True
+        while improved:
+            improved = False
+            for node in rng.permutation(level_nodes).tolist():
+                degree = degrees[node]
+                if degree == 0:
+                    continue
+                links: Dict[int, float] = {}
+                for position in range(offsets_list[node], offsets_list[node + 1]):
+                    neighbor = targets_list[position]
+                    if neighbor != node:
+                        neighbor_community = community[neighbor]
+                        links[neighbor_community] = links.get(neighbor_community, 0.0) + weights_list[position]
+                current = community[node]
+                community_degrees[current] -= degree
+                scale = resolution * degree / total
+                best, best_gain = current, links.get(current, 0.0) - scale * community_degrees[current]
+                for candidate, weight in links.items():
+                    gain = weight - scale * community_degrees[candidate]
+                    if gain > best_gain + 1e-12:
+                        best, best_gain = candidate, gain
+                community_degrees[best] += degree
+                if best != current:
+                    community[node] = best
+                    improved = moved = True
+
+        if not moved:
+            break
+        _, level_labels = np.unique(np.array(community, dtype=np.int64), return_inverse=True)
+        level_labels = level_labels.ravel()
+        labels = level_labels[labels]
+        # Entries already list every edge from both ends, so halve them when rebuilding
+        offsets, targets, weights = build_weighted_csr(
+            level_labels[sources], level_labels[targets], weights / 2.0, int(level_labels.max()) + 1
+        )
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels.ravel()
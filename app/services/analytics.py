@@ -1,201 +1,1162 @@
 from app.database.connection import db
-from typing import List, Dict, Any, Optional
+from app.database.operations import (
+    GraphOperations, COMPOSITE_BASE_STRENGTH, COMPOSITE_TYPE_BONUSES, DEFAULT_BATCH_SIZE
+)
+from typing import List, Dict, Any, Optional, Tuple
 from app.utils.serializers import serialize_neo4j_object
+from app.services.algorithms import (
+    betweenness_error_bound, bfs_paths, bidirectional_bfs, build_simple_csr, build_weighted_csr,
+    components_within_distance, label_propagation, louvain, map_shared, modularity, pagerank, sampled_betweenness,
+    select_landmarks, weighted_shortest_path
+)
+from app.services.entity_resolution import EntityResolver
+from app.services.projection import (
+    GraphProjection, IDENTIFIER, IDENTIFIER_RELATIONSHIP_TYPES, TRANSACTION, USER, projection_manager
+)
+from app.services.ownership import ownership_cache
+from app.services.risk import risk_scores
+from app.services.statistics import graph_statistics
+from app.services.temporal import TemporalIndex, cycles_chunk, format_trace, trace
+from datetime import datetime, timezone
+import heapq
+import math
+import numpy as np
+import os
+
+# Number of nodes fetched per query when looking up projection results in the database
+HYDRATE_BATCH_SIZE = 1000
+
+# Number of landmarks used to speed up weighted shortest paths
+PATH_LANDMARKS = int(os.getenv("PATH_LANDMARKS", "8"))
+
+# Power iteration settings for PageRank
+PAGERANK_DAMPING = float(os.getenv("PAGERANK_DAMPING", "0.85"))
+PAGERANK_TOLERANCE = float(os.getenv("PAGERANK_TOLERANCE", "1e-6"))
+PAGERANK_MAX_ITERATIONS = int(os.getenv("PAGERANK_MAX_ITERATIONS", "100"))
+
+# Centrality algorithms and the node property each one is written back to
+CENTRALITY_PROPERTIES = {
+    "pagerank": "pagerank",
+    "weighted_pagerank": "weighted_pagerank",
+    "in_degree": "in_degree_centrality",
+    "out_degree": "out_degree_centrality"
+}
+
+NODE_TYPE_NAMES = {USER: "User", TRANSACTION: "Transaction", IDENTIFIER: "Identifier"}
+
+# Worker processes used for sampled betweenness
+BETWEENNESS_WORKERS = int(os.getenv("BETWEENNESS_WORKERS", str(os.cpu_count() or 1)))
+
+# Worker processes used for cycle detection
+CYCLE_WORKERS = int(os.getenv("CYCLE_WORKERS", str(os.cpu_count() or 1)))
+
+TRANSACTIONS_BY_ID_QUERY = """
+UNWIND $ids AS transaction_id
+MATCH (t:Transaction {id: transaction_id})
+RETURN t
+"""
+
+NODES_BY_ID_QUERY = """
+UNWIND $ids AS node_id
+CALL {
+    WITH node_id
+    MATCH (n:User {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Transaction {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Identifier {id: node_id})
+    RETURN n
+}
+RETURN n
+"""
+
+USER_IDENTIFIERS_QUERY = """
+MATCH (u:User)
+RETURN u.id AS id, u.name AS name, u.email AS email, u.phone AS phone, u.address AS address
+ORDER BY u.id
+"""
+
+PATH_EDGES_QUERY = """
+UNWIND $edges AS edge
+CALL {
+    WITH edge
+    MATCH (s:User {id: edge.source_id})
+    RETURN s
+    UNION
+    WITH edge
+    MATCH (s:Transaction {id: edge.source_id})
+    RETURN s
+    UNION
+    WITH edge
+    MATCH (s:Identifier {id: edge.source_id})
+    RETURN s
+}
+CALL {
+    WITH edge
+    MATCH (t:User {id: edge.target_id})
+    RETURN t
+    UNION
+    WITH edge
+    MATCH (t:Transaction {id: edge.target_id})
+    RETURN t
+    UNION
+    WITH edge
+    MATCH (t:Identifier {id: edge.target_id})
+    RETURN t
+}
+MATCH (s)-[r]->(t)
+WHERE type(r) = edge.type
+RETURN edge.source_id AS source_id, edge.target_id AS target_id, edge.type AS type, properties(r) AS properties
+"""
 
 class GraphAnalyticsService:
     """Service for performing graph analytics operations"""
 
     @staticmethod
-    def find_shortest_path(source_id: str, target_id: str, relationship_types: Optional[List[str]] = None) -> Dict[str, Any]:
+    def find_shortest_path(source_id: str, target_id: str, relationship_types: Optional[List[str]] = None,
+                           max_hops: Optional[int] = None, weight: Optional[str] = None,
+                           landmarks: bool = False) -> Dict[str, Any]:
         """
         Find the shortest path between two nodes in the graph
-        
+
         Args:
             source_id: ID of the source node
             target_id: ID of the target node
             relationship_types: Optional list of relationship types to consider
                                 If None, all relationship types are considered
-        
+            max_hops: Optional maximum path length (unweighted paths only)
+            weight: Optional edge weight ("strength", "amount" or "percentage") to
+                    find the strongest path instead of the one with the fewest hops
+            landmarks: Whether to speed up weighted searches with landmark distances
+
         Returns:
             Dictionary containing the path information
         """
-        # Build the relationship type filter if provided
-        rel_filter = ""
+        return GraphAnalyticsService.find_shortest_paths(
+            [(source_id, target_id)], relationship_types, max_hops, weight=weight, landmarks=landmarks
+        )[0]
+
+    @staticmethod
+    def find_shortest_paths(pairs: List[Tuple[str, str]], relationship_types: Optional[List[str]] = None,
+                            max_hops: Optional[int] = None, hydrate: bool = True, weight: Optional[str] = None,
+                            landmarks: bool = False) -> List[Dict[str, Any]]:
+        """
+        Find the shortest paths between many pairs of nodes
+
+        Paths are searched over the in-memory graph projection, ignoring edge
+        direction. Pairs sharing a source are answered by a single BFS from it;
+        other pairs use a bidirectional BFS. The nodes and relationships on all
+        paths are then looked up with one batch of queries. Owners sharing an
+        identifier node are one link apart, as with the pairwise relationship
+        it replaces, so when the projection has identifier nodes the paths are
+        searched by link length instead (see _link_paths).
+
+        With a weight, each edge costs 1 / weight, so the cheapest path is the one
+        through the strongest links, and only edges carrying that weight are used
+        (see _path_costs). Weighted paths are found with Dijkstra, or with A* over
+        precomputed landmark distances (ALT) when landmarks is set.
+
+        Args:
+            pairs: (source_id, target_id) pairs
+            relationship_types: Optional list of relationship types to consider
+            max_hops: Optional maximum path length (unweighted paths only)
+            hydrate: Whether to include node and relationship properties; when
+                     False, nodes only carry their id and relationships no properties
+            weight: Optional edge weight ("strength", "amount" or "percentage")
+            landmarks: Whether to use landmark distances for weighted paths
+
+        Returns:
+            Path information for each pair, in the order of pairs
+        """
+        projection = projection_manager.get()
+        if weight:
+            return GraphAnalyticsService._find_weighted_paths(projection, pairs, relationship_types, hydrate,
+                                                              weight, landmarks)
+        allowed = None
         if relationship_types:
-            rel_types = "|".join([f"`{rel}`" for rel in relationship_types])
-            rel_filter = f"[:{rel_types}]"
-        
-        # Query to find the shortest path
-        query = f"""
-        MATCH (source {{id: $source_id}}), (target {{id: $target_id}}),
-              p = shortestPath((source)-[{rel_filter}*]-(target))
-        RETURN p, length(p) as path_length
-        """
-        
-        parameters = {
-            "source_id": source_id,
-            "target_id": target_id
-        }
-        
-        result = db.execute_query(query, parameters)
-        
-        if not result:
-            return {
+            allowed = projection.type_mask(relationship_types)[projection.und_edges]
+        if projection.identifier_count:
+            paths = GraphAnalyticsService._link_paths(projection, pairs, allowed, max_hops)
+            return GraphAnalyticsService._format_paths(projection, pairs, paths, hydrate)
+
+        targets_by_source: Dict[str, List[str]] = {}
+        for source_id, target_id in pairs:
+            targets_by_source.setdefault(source_id, []).append(target_id)
+
+        paths = {}
+        for source_id, target_ids in targets_by_source.items():
+            source = projection.index.get(source_id)
+            targets = {projection.index[target_id] for target_id in target_ids if target_id in projection.index}
+            if source is None or not targets:
+                continue
+            if len(targets) == 1:
+                target = targets.pop()
+                path = bidirectional_bfs(projection.offsets, projection.targets, allowed, source, target, max_hops)
+                if path is not None:
+                    paths[(source_id, projection.node_ids[target])] = path
+            else:
+                found = bfs_paths(projection.offsets, projection.targets, allowed, source, targets, max_hops)
+                for target, path in found.items():
+                    paths[(source_id, projection.node_ids[target])] = path
+
+        return GraphAnalyticsService._format_paths(projection, pairs, paths, hydrate)
+
+    @staticmethod
+    def _link_paths(projection: GraphProjection, pairs: List[Tuple[str, str]], allowed: Optional[np.ndarray],
+                    max_hops: Optional[int]) -> Dict[Tuple[str, str], Tuple[List[int], List[int]]]:
+        """
+        Shortest paths by number of links, where a hop through an identifier node is one link
+
+        Every edge of an identifier node costs half a link (see
+        GraphProjection.link_lengths), and the paths are found with Dijkstra.
+        """
+        costs = projection.link_lengths / 2.0
+        if allowed is not None:
+            costs = np.where(allowed, costs, np.inf)
+        paths = {}
+        for source_id, target_id in pairs:
+            source = projection.index.get(source_id)
+            target = projection.index.get(target_id)
+            if source is None or target is None or (source_id, target_id) in paths:
+                continue
+            path = weighted_shortest_path(projection.offsets, projection.targets, costs, source, target,
+                                          max_cost=max_hops if max_hops is not None else math.inf)
+            if path is not None:
+                nodes, positions, _ = path
+                paths[(source_id, target_id)] = (nodes, positions)
+        return paths
+
+    @staticmethod
+    def _find_weighted_paths(projection: GraphProjection, pairs: List[Tuple[str, str]],
+                             relationship_types: Optional[List[str]], hydrate: bool, weight: str,
+                             landmarks: bool) -> List[Dict[str, Any]]:
+        """Find the cheapest paths for pairs, with edge costs of 1 / weight"""
+        types_key = tuple(sorted(relationship_types)) if relationship_types else None
+        costs = projection.derived(
+            ("path-costs", weight, types_key),
+            lambda: GraphAnalyticsService._path_costs(projection, weight, relationship_types)
+        )
+        landmark_distances = None
+        if landmarks:
+            landmark_distances = projection.derived(
+                ("path-landmarks", weight, types_key),
+                lambda: select_landmarks(projection.offsets, projection.targets, costs, PATH_LANDMARKS)[1]
+            )
+
+        paths = {}
+        costs_found = {}
+        for source_id, target_id in pairs:
+            source = projection.index.get(source_id)
+            target = projection.index.get(target_id)
+            if source is None or target is None or (source_id, target_id) in paths:
+                continue
+            path = weighted_shortest_path(projection.offsets, projection.targets, costs, source, target,
+                                          landmark_distances)
+            if path is not None:
+                nodes, positions, cost = path
+                paths[(source_id, target_id)] = (nodes, positions)
+                costs_found[(source_id, target_id)] = cost
+
+        results = GraphAnalyticsService._format_paths(projection, pairs, paths, hydrate)
+        for (source_id, target_id), result in zip(pairs, results):
+            if result["found"]:
+                result["weight"] = weight
+                result["total_cost"] = costs_found[(source_id, target_id)]
+        return results
+
+    @staticmethod
+    def _path_costs(projection: GraphProjection, weight: str, relationship_types: Optional[List[str]]) -> np.ndarray:
+        """
+        Cost of every undirected CSR entry for weighted paths: 1 / weight, inf for edges without a positive weight
+
+        "strength" uses COMPOSITE edges, "percentage" SHAREHOLDER_OF edges and
+        "amount" the edges of transactions, weighted by the transaction amount.
+        """
+        weights = projection.edge_weights(weight)[projection.und_edges]
+        usable = np.isfinite(weights) & (weights > 0)
+        if relationship_types:
+            usable &= projection.type_mask(relationship_types)[projection.und_edges]
+        return np.where(usable, 1.0 / np.where(usable, weights, 1.0), np.inf)
+
+    @staticmethod
+    def _format_paths(projection: GraphProjection, pairs: List[Tuple[str, str]],
+                      paths: Dict[Tuple[str, str], Tuple[List[int], List[int]]], hydrate: bool) -> List[Dict[str, Any]]:
+        """
+        Format the paths found over the projection, looking up their properties if hydrate is set
+
+        path_length counts links: the two edges through an identifier node count as one.
+        """
+        formatted = {}
+        for key, (nodes, positions) in paths.items():
+            edges = projection.und_edges[positions] if positions else []
+            formatted[key] = {
+                "found": True,
+                "path_length": len(positions) - int(np.count_nonzero(projection.node_types[nodes[1:-1]] == IDENTIFIER)),
+                "nodes": [{"id": projection.node_ids[node]} for node in nodes],
+                "relationships": [
+                    {
+                        "type": projection.type_names[projection.edge_types[edge]],
+                        "source_id": projection.node_ids[projection.sources[edge]],
+                        "target_id": projection.node_ids[projection.out_targets[edge]]
+                    }
+                    for edge in edges
+                ]
+            }
+
+        if hydrate and formatted:
+            GraphAnalyticsService._hydrate_paths(list(formatted.values()))
+
+        return [
+            dict(formatted[(source_id, target_id)]) if (source_id, target_id) in formatted else {
                 "found": False,
                 "message": f"No path found between {source_id} and {target_id}"
             }
-        
-        # Extract path information
-        path = result[0]["p"]
-        path_length = result[0]["path_length"]
-        
-        # Format the path for the response
-        nodes = []
-        relationships = []
-        
-        # Extract nodes from the path
-        for node in path.nodes:
-            nodes.append(serialize_neo4j_object(node))
-        
-        # Extract relationships from the path
-        for rel in path.relationships:
-            relationships.append({
-                "type": rel.type,
-                "source_id": rel.start_node["id"],
-                "target_id": rel.end_node["id"],
-                "properties": serialize_neo4j_object(rel)
-            })
-        
-        return {
-            "found": True,
-            "path_length": path_length,
-            "nodes": nodes,
-            "relationships": relationships
-        }
-    
+            for source_id, target_id in pairs
+        ]
+
+    @staticmethod
+    def _hydrate_paths(paths: List[Dict[str, Any]]) -> None:
+        """Replace the node and relationship stubs of formatted paths with their properties"""
+        node_ids = list({node["id"] for path in paths for node in path["nodes"]})
+        edges = list({
+            (rel["source_id"], rel["target_id"], rel["type"]): rel
+            for path in paths for rel in path["relationships"]
+        }.values())
+
+        nodes = {}
+        for start in range(0, len(node_ids), HYDRATE_BATCH_SIZE):
+            for record in db.stream_query(NODES_BY_ID_QUERY, {"ids": node_ids[start:start + HYDRATE_BATCH_SIZE]}):
+                node = serialize_neo4j_object(record["n"])
+                nodes[node["id"]] = node
+
+        properties = {}
+        for start in range(0, len(edges), HYDRATE_BATCH_SIZE):
+            for record in db.stream_query(PATH_EDGES_QUERY, {"edges": edges[start:start + HYDRATE_BATCH_SIZE]}):
+                key = (record["source_id"], record["target_id"], record["type"])
+                properties[key] = serialize_neo4j_object(record["properties"])
+
+        for path in paths:
+            path["nodes"] = [nodes.get(node["id"], node) for node in path["nodes"]]
+            for rel in path["relationships"]:
+                rel["properties"] = properties.get((rel["source_id"], rel["target_id"], rel["type"]), {})
+
     @staticmethod
     def cluster_transactions(min_cluster_size: int = 2, max_distance: int = 2) -> List[Dict[str, Any]]:
         """
         Cluster transactions based on their connections
-        
+
+        Two transactions are in the same cluster when they are linked by a chain
+        of transactions, each within max_distance hops of the next. Clusters are
+        the exact connected components of that relation, computed over the
+        in-memory graph projection, so the result does not depend on query order.
+        A hop through an IP or device node counts as one, like the LINKED_TO
+        relationship it replaces.
+
         Args:
             min_cluster_size: Minimum number of transactions in a cluster
             max_distance: Maximum distance between transactions to be considered in the same cluster
-        
-        Returns:
-            List of transaction clusters
-        """
-        # Query to find transaction clusters
-        query = f"""
-        MATCH (t1:Transaction)
-        CALL {{
-            WITH t1
-            MATCH (t1)-[*1..{max_distance}]-(t2:Transaction)
-            WHERE t1.id <> t2.id
-            RETURN t2
-        }}
-        WITH t1, collect(DISTINCT t2) AS connected_transactions
-        WHERE size(connected_transactions) >= {min_cluster_size - 1}
-        RETURN t1, connected_transactions
-        """
-        
-        result = db.execute_query(query)
-        
-        # Process results to form clusters
+
+        Returns:
+            List of transaction clusters, largest first
+        """
+        projection = projection_manager.get()
+        clusters = GraphAnalyticsService._transaction_components(projection, min_cluster_size, max_distance)
+        if not clusters:
+            return []
+
+        transaction_ids = [node_id for cluster in clusters for node_id in cluster["transaction_ids"]]
+        transactions = {}
+        for start in range(0, len(transaction_ids), HYDRATE_BATCH_SIZE):
+            for record in db.stream_query(TRANSACTIONS_BY_ID_QUERY, {"ids": transaction_ids[start:start + HYDRATE_BATCH_SIZE]}):
+                transaction = serialize_neo4j_object(record["t"])
+                transactions[transaction["id"]] = transaction
+        return GraphAnalyticsService._format_clusters(clusters, transactions)
+
+    @staticmethod
+    def _transaction_components(projection: GraphProjection, min_cluster_size: int,
+                                max_distance: int) -> List[Dict[str, Any]]:
+        """Compute the transaction clusters and their aggregates over the projection"""
+        transactions = np.flatnonzero(projection.node_types == TRANSACTION)
+        if len(transactions) == 0:
+            return []
+        if projection.identifier_count:
+            # Distances in half links, so that transaction-device-transaction is one hop
+            labels = components_within_distance(
+                projection.offsets, projection.targets, transactions, projection.sources, projection.out_targets,
+                2 * max_distance, projection.link_lengths, projection.edge_lengths
+            )[transactions]
+        else:
+            labels = components_within_distance(
+                projection.offsets, projection.targets, transactions,
+                projection.sources, projection.out_targets, max_distance
+            )[transactions]
+
+        # Sender of each transaction, from its incoming SENT edge
+        senders = np.full(projection.num_nodes, -1, dtype=np.int64)
+        sent = projection.type_mask(["SENT"])
+        senders[projection.out_targets[sent]] = projection.sources[sent]
+
+        # Order transactions by cluster, then by ID, and keep large enough clusters
+        id_ranks = np.empty(len(transactions), dtype=np.int64)
+        id_ranks[np.argsort(np.array([projection.node_ids[node] for node in transactions]), kind="stable")] = \
+            np.arange(len(transactions))
+        order = np.lexsort((id_ranks, labels))
+        labels, members = labels[order], transactions[order]
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(labels)) + 1])
+        sizes = np.diff(np.append(starts, len(labels)))
+        keep = sizes >= min_cluster_size
+        if not keep.any():
+            return []
+
+        cluster_of = np.repeat(np.arange(len(starts)), sizes)
+        total_amounts = np.bincount(cluster_of, weights=np.nan_to_num(projection.amounts[members]), minlength=len(starts))
+        member_senders = senders[members]
+        has_sender = member_senders >= 0
+        sender_pairs = np.unique(np.stack([cluster_of[has_sender], member_senders[has_sender]]), axis=1)
+        distinct_senders = np.bincount(sender_pairs[0], minlength=len(starts))
+
+        # The best connected transaction is the center; members are sorted by ID,
+        # so ties go to the smallest ID
+        degrees = np.diff(projection.offsets)[members]
+        center_order = np.lexsort((np.arange(len(members)), -degrees, cluster_of))
+        centers = members[center_order[starts]]
+
         clusters = []
-        processed_transactions = set()
-        
-        for record in result:
-            t1 = record["t1"]
-            t1_id = t1["id"]
-            
-            # Skip if this transaction is already in a cluster
-            if t1_id in processed_transactions:
-                continue
-            
-            # Create a new cluster
-            cluster = {
-                "center_transaction": serialize_neo4j_object(t1),
-                "transactions": [serialize_neo4j_object(t1)],
-                "size": 1 + len(record["connected_transactions"])
-            }
-            
-            # Add connected transactions to the cluster
-            for t2 in record["connected_transactions"]:
-                t2_id = t2["id"]
-                cluster["transactions"].append(serialize_neo4j_object(t2))
-                processed_transactions.add(t2_id)
-            
-            # Add the center transaction to processed set
-            processed_transactions.add(t1_id)
-            
-            # Add cluster to results
-            clusters.append(cluster)
-        
+        for cluster in np.flatnonzero(keep):
+            start, size = starts[cluster], sizes[cluster]
+            ids = [projection.node_ids[node] for node in members[start:start + size]]
+            clusters.append({
+                "cluster_id": ids[0],
+                "center_id": projection.node_ids[centers[cluster]],
+                "transaction_ids": ids,
+                "size": int(size),
+                "total_amount": float(total_amounts[cluster]),
+                "distinct_senders": int(distinct_senders[cluster])
+            })
+
+        clusters.sort(key=lambda cluster: (-cluster["size"], cluster["cluster_id"]))
         return clusters
-    
+
     @staticmethod
-    def get_graph_metrics() -> Dict[str, Any]:
+    def _format_clusters(clusters: List[Dict[str, Any]], transactions: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Replace the transaction IDs of each cluster with the transactions themselves"""
+        return [
+            {
+                "cluster_id": cluster["cluster_id"],
+                "center_transaction": transactions.get(cluster["center_id"], {"id": cluster["center_id"]}),
+                "transactions": [transactions.get(node_id, {"id": node_id}) for node_id in cluster["transaction_ids"]],
+                "size": cluster["size"],
+                "total_amount": cluster["total_amount"],
+                "distinct_senders": cluster["distinct_senders"]
+            }
+            for cluster in clusters
+        ]
+
+    @staticmethod
+    def get_centrality(algorithm: str = "pagerank", top: int = 10, node_type: Optional[str] = None) -> Dict[str, Any]:
         """
-        Calculate various metrics for the graph
-        
+        Rank nodes by centrality
+
+        Scores are computed for every node over the in-memory graph projection,
+        following relationship direction, and cached with the projection, so they
+        are only recomputed after the graph changes.
+
+        Args:
+            algorithm: "pagerank", "weighted_pagerank" (PageRank over the edges of
+                       transactions, weighted by the transaction amount),
+                       "in_degree" or "out_degree" (degree divided by num_nodes - 1)
+            top: Number of nodes to return
+            node_type: Optional node type ("User" or "Transaction") to rank
+
         Returns:
-            Dictionary containing graph metrics
+            Dictionary with the best ranked nodes and how the scores were computed
+        """
+        projection = projection_manager.get()
+        result = GraphAnalyticsService._centrality_scores(projection, algorithm)
+        return {
+            "algorithm": algorithm,
+            "graph_version": projection.version,
+            "node_count": projection.num_nodes,
+            "iterations": result["iterations"],
+            "converged": result["converged"],
+            "nodes": GraphAnalyticsService._rank_nodes(projection, result["scores"], top, node_type)
+        }
+
+    @staticmethod
+    def get_betweenness(samples: int = 100, top: int = 10, node_type: Optional[str] = None, directed: bool = False,
+                        confidence: float = 0.95, seed: int = 0) -> Dict[str, Any]:
+        """
+        Rank nodes by approximate betweenness centrality
+
+        Exact betweenness needs a shortest-path search from every node. Instead,
+        Brandes' dependency accumulation runs from a uniform sample of source
+        nodes, spread over BETWEENNESS_WORKERS processes, and the scaled sum
+        estimates the betweenness of every node. Scores are normalized to [0, 1]
+        and cached with the projection for each set of parameters.
+
+        Args:
+            samples: Number of sampled source nodes; all nodes (exact) if larger than the graph
+            top: Number of nodes to return
+            node_type: Optional node type ("User" or "Transaction") to rank
+            directed: Follow relationship direction instead of ignoring it
+            confidence: Probability with which the reported error bound holds
+            seed: Seed of the source sample
+
+        Returns:
+            Dictionary with the best ranked nodes and the error bound of their scores
         """
-        # Query to get basic graph metrics
-        query = """
-        MATCH (n)
-        OPTIONAL MATCH (u:User)
-        OPTIONAL MATCH (t:Transaction)
-        OPTIONAL MATCH (c:User {entity_type: 'company'})
-        OPTIONAL MATCH ()-[r]-()
-        RETURN 
-            count(DISTINCT n) AS total_nodes,
-            count(DISTINCT u) AS user_count,
-            count(DISTINCT t) AS transaction_count,
-            count(DISTINCT c) AS company_count,
-            count(DISTINCT r) AS relationship_count
-        """
-        
-        basic_metrics = db.execute_query(query)[0]
-        
-        # Query to get relationship type counts
-        rel_query = """
-        MATCH ()-[r]-()
-        RETURN type(r) AS relationship_type, count(r) AS count
-        ORDER BY count DESC
-        """
-        
-        rel_counts = db.execute_query(rel_query)
-        relationship_counts = {record["relationship_type"]: record["count"] for record in rel_counts}
-        
-        # Query to find most connected nodes
-        connected_query = """
-        MATCH (n)
-        OPTIONAL MATCH (n)-[r]-()
-        WITH n, count(r) AS connection_count
-        ORDER BY connection_count DESC
-        LIMIT 5
-        RETURN n.id AS node_id, n.name AS node_name, labels(n) AS node_type, connection_count
-        """
-        
-        connected_nodes = db.execute_query(connected_query)
-        most_connected = [
+        projection = projection_manager.get()
+        samples = min(samples, projection.num_nodes)
+        scores = projection.derived(
+            ("betweenness", samples, directed, seed),
+            lambda: GraphAnalyticsService._betweenness_scores(projection, samples, directed, seed)
+        )
+        return {
+            "algorithm": "betweenness",
+            "graph_version": projection.version,
+            "node_count": projection.num_nodes,
+            "samples": samples,
+            "exact": samples == projection.num_nodes,
+            "directed": directed,
+            "error_bound": betweenness_error_bound(projection.num_nodes, samples, confidence),
+            "confidence": confidence,
+            "nodes": GraphAnalyticsService._rank_nodes(projection, scores, top, node_type)
+        }
+
+    @staticmethod
+    def _betweenness_scores(projection: GraphProjection, samples: int, directed: bool, seed: int) -> np.ndarray:
+        """Normalized betweenness of every node estimated from samples source nodes"""
+        num_nodes = projection.num_nodes
+        if num_nodes < 3:
+            return np.zeros(num_nodes)
+        # Parallel edges would count as separate shortest paths, so drop them
+        offsets, targets = projection.derived(
+            ("simple-csr", directed),
+            lambda: build_simple_csr(projection.sources, projection.out_targets, num_nodes, directed)
+        )
+        sources = np.sort(np.random.default_rng(seed).choice(num_nodes, samples, replace=False))
+        dependencies = sampled_betweenness(offsets, targets, sources, BETWEENNESS_WORKERS)
+        return dependencies * num_nodes / (samples * (num_nodes - 1) * (num_nodes - 2))
+
+    @staticmethod
+    def _rank_nodes(projection: GraphProjection, scores: np.ndarray, top: int,
+                    node_type: Optional[str], exclude: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        The top nodes by score, optionally of one type and leaving out the exclude nodes, ties broken by ID
+
+        Identifier nodes take part in the scores but are not ranked.
+        """
+        candidates = np.arange(projection.num_nodes)
+        if node_type:
+            code = USER if node_type == "User" else TRANSACTION
+            candidates = candidates[projection.node_types == code]
+        else:
+            candidates = candidates[projection.node_types != IDENTIFIER]
+        if exclude is not None and len(exclude):
+            candidates = np.setdiff1d(candidates, exclude)
+        if top < len(candidates):
+            candidates = candidates[np.argpartition(-scores[candidates], top - 1)[:top]]
+        ranked = sorted(candidates.tolist(), key=lambda node: (-scores[node], projection.node_ids[node]))
+        return [
             {
-                "id": record["node_id"],
-                "name": record.get("node_name", record["node_id"]),
-                "type": record["node_type"][0] if record["node_type"] else "Unknown",
-                "connection_count": record["connection_count"]
+                "rank": rank,
+                "id": projection.node_ids[node],
+                "type": NODE_TYPE_NAMES[int(projection.node_types[node])],
+                "score": float(scores[node])
             }
-            for record in connected_nodes
+            for rank, node in enumerate(ranked, start=1)
         ]
-        
+
+    @staticmethod
+    def write_centrality(algorithm: str = "pagerank", batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Write the centrality score of every user and transaction back as a node property
+
+        Args:
+            algorithm: Centrality algorithm, as in get_centrality
+            batch_size: Number of nodes written per database transaction
+
+        Returns:
+            Dictionary with the property written and the number of nodes updated
+        """
+        projection = projection_manager.get()
+        scores = GraphAnalyticsService._centrality_scores(projection, algorithm)["scores"].tolist()
+        rows_by_label = {NODE_TYPE_NAMES[USER]: [], NODE_TYPE_NAMES[TRANSACTION]: []}
+        for node, (node_id, score) in enumerate(zip(projection.node_ids, scores)):
+            label = NODE_TYPE_NAMES[int(projection.node_types[node])]
+            if label in rows_by_label:
+                rows_by_label[label].append({"id": node_id, "value": score})
+
+        property_name = CENTRALITY_PROPERTIES[algorithm]
+        updated = GraphOperations.set_node_properties(property_name, rows_by_label, batch_size)
+        return {
+            "algorithm": algorithm,
+            "property": property_name,
+            "graph_version": projection.version,
+            "updated_count": updated
+        }
+
+    @staticmethod
+    def _centrality_scores(projection: GraphProjection, algorithm: str) -> Dict[str, Any]:
+        """Centrality scores of every node, computed once per projection"""
+        if algorithm not in CENTRALITY_PROPERTIES:
+            raise ValueError(f"Unknown centrality algorithm: {algorithm}")
+
+        def compute() -> Dict[str, Any]:
+            if algorithm in ("in_degree", "out_degree"):
+                ends = projection.out_targets if algorithm == "in_degree" else projection.sources
+                degrees = np.bincount(ends, minlength=projection.num_nodes)
+                return {
+                    "scores": degrees / max(projection.num_nodes - 1, 1),
+                    "iterations": None,
+                    "converged": None
+                }
+            weights = projection.edge_weights("amount") if algorithm == "weighted_pagerank" else None
+            scores, iterations, converged = pagerank(
+                projection.sources, projection.out_targets, projection.num_nodes, weights,
+                PAGERANK_DAMPING, PAGERANK_TOLERANCE, PAGERANK_MAX_ITERATIONS
+            )
+            return {"scores": scores, "iterations": iterations, "converged": converged}
+
+        return projection.derived(("centrality", algorithm), compute)
+
+    @staticmethod
+    def get_risk_scores(seed_ids: List[str], top: int = 100, node_type: Optional[str] = None,
+                        include_seeds: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Spread risk from known bad entities to the entities connected to them
+
+        Runs personalized PageRank (random walk with restart to the seeds) over
+        the risk graph (see _risk_graph). The run starts from the scores of the
+        previous one (see RiskScoreStore), so re-scoring after the seeds or the
+        graph changed a little takes a few iterations instead of a full run.
+
+        Args:
+            seed_ids: IDs of the users or transactions to spread risk from
+            top: Number of entities to return
+            node_type: Optional node type ("User" or "Transaction") to rank
+            include_seeds: Whether to rank the seeds themselves
+
+        Returns:
+            Dictionary with the riskiest entities and how the scores were computed,
+            or None if none of the seeds exist
+        """
+        projection = projection_manager.get()
+        seeds = sorted({projection.index[seed_id] for seed_id in seed_ids if seed_id in projection.index})
+        if not seeds:
+            return None
+        sources, targets, weights = GraphAnalyticsService._risk_graph(projection)
+        personalization = np.zeros(projection.num_nodes)
+        personalization[seeds] = 1.0
+
+        seed_set = frozenset(projection.node_ids[seed] for seed in seeds)
+        initial, previous_seeds = risk_scores.initial(projection)
+        scores, iterations, converged = pagerank(
+            sources, targets, projection.num_nodes, weights, PAGERANK_DAMPING, PAGERANK_TOLERANCE,
+            PAGERANK_MAX_ITERATIONS, personalization, initial
+        )
+        risk_scores.store(projection, seed_set, scores)
+
+        nodes = GraphAnalyticsService._rank_nodes(
+            projection, scores, top, node_type, None if include_seeds else np.array(seeds, dtype=np.int64)
+        )
+        for node in nodes:
+            node["is_seed"] = node["id"] in seed_set
+        return {
+            "graph_version": projection.version,
+            "seed_count": len(seeds),
+            "missing_seed_ids": sorted(set(seed_ids) - seed_set),
+            "warm_start": initial is not None,
+            "seeds_added": len(seed_set - previous_seeds) if initial is not None else len(seed_set),
+            "seeds_removed": len(previous_seeds - seed_set) if initial is not None else 0,
+            "iterations": iterations,
+            "converged": converged,
+            "nodes": nodes
+        }
+
+    @staticmethod
+    def _risk_graph(projection: GraphProjection) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Weighted undirected graph that risk spreads over, computed once per projection
+
+        Users are linked with the weights of the user graph (see _user_graph),
+        which combines shared attributes, business relationships and
+        transacting as COMPOSITE strengths. Transactions are linked to their
+        sender and receiver (SENT, RECEIVED_BY) and to linked transactions
+        (LINKED_TO, or their IP and device nodes), each with the strength of
+        one kind of link, COMPOSITE_BASE_STRENGTH, so that risk reaches
+        transactions as well.
+
+        Returns:
+            (sources, targets, weights) listing every link in both directions
+        """
+        def compute():
+            nodes, (offsets, targets, weights) = GraphAnalyticsService._user_graph(projection)
+            user_sources = nodes[np.repeat(np.arange(len(nodes)), np.diff(offsets))]
+            user_targets = nodes[targets]
+
+            linked = projection.type_mask(["SENT", "RECEIVED_BY", "LINKED_TO"])
+            link_sources = np.concatenate([projection.sources[linked], projection.out_targets[linked]])
+            link_targets = np.concatenate([projection.out_targets[linked], projection.sources[linked]])
+            return (
+                np.concatenate([user_sources, link_sources]),
+                np.concatenate([user_targets, link_targets]),
+                np.concatenate([weights, np.full(len(link_sources), COMPOSITE_BASE_STRENGTH)])
+            )
+
+        return projection.derived("risk-graph", compute)
+
+    @staticmethod
+    def detect_communities(algorithm: str = "louvain", min_size: int = 2, limit: int = 100,
+                           resolution: float = 1.0) -> Dict[str, Any]:
+        """
+        Find communities of users and companies
+
+        Communities are computed in-process over a weighted user graph derived
+        from the projection (see _user_graph). Label propagation is fast; Louvain
+        is slower but finds communities of higher modularity. Results are cached
+        with the projection.
+
+        Args:
+            algorithm: "louvain" or "label_propagation"
+            min_size: Minimum number of members of a returned community
+            limit: Maximum number of communities returned, largest first
+            resolution: Louvain resolution; higher values favor smaller communities
+
+        Returns:
+            Dictionary with the modularity of the partition and a summary of each community
+        """
+        projection = projection_manager.get()
+        nodes, (offsets, targets, weights) = GraphAnalyticsService._user_graph(projection)
+        result = GraphAnalyticsService._communities(projection, algorithm, resolution)
+        node_labels = result["labels"]
+
+        sources = np.repeat(np.arange(len(nodes)), np.diff(offsets))
+        internal = node_labels[sources] == node_labels[targets]
+        internal_weights = np.bincount(node_labels[sources], weights=np.where(internal, weights, 0.0),
+                                       minlength=result["community_count"]) / 2.0
+        degrees = np.bincount(sources, weights=weights, minlength=len(nodes))
+
+        # Identifier nodes follow the users and are not members of their community
+        user_count = int(np.count_nonzero(projection.node_types[nodes] == USER))
+        users, labels, degrees = nodes[:user_count], node_labels[:user_count], degrees[:user_count]
+        member_ids = np.array([projection.node_ids[node] for node in users], dtype=object)
+        sizes = np.bincount(labels, minlength=result["community_count"])
+        companies = np.bincount(labels, weights=projection.is_company[users], minlength=len(sizes))
+        transactions, amounts = GraphAnalyticsService._internal_transactions(projection, users, labels, len(sizes))
+
+        # Members of the large enough communities, grouped by community, best connected first
+        order = np.lexsort((-degrees, labels))
+        order = order[sizes[labels[order]] >= min_size]
+        groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1) if len(order) else []
+
+        summaries = []
+        for members in groups:
+            community = int(labels[members[0]])
+            ids = sorted(member_ids[members].tolist())
+            summaries.append({
+                "community_id": ids[0],
+                "size": len(ids),
+                "company_count": int(companies[community]),
+                "central_member_id": member_ids[members[0]],
+                "internal_weight": float(internal_weights[community]),
+                "internal_transaction_count": int(transactions[community]),
+                "internal_transaction_amount": float(amounts[community]),
+                "member_ids": ids
+            })
+        summaries.sort(key=lambda summary: (-summary["size"], summary["community_id"]))
+
+        return {
+            "algorithm": algorithm,
+            "graph_version": projection.version,
+            "user_count": len(users),
+            "modularity": result["modularity"],
+            "iterations": result["iterations"],
+            "converged": result["converged"],
+            "community_count": len(summaries),
+            "communities": summaries[:limit]
+        }
+
+    @staticmethod
+    def write_communities(algorithm: str = "louvain", resolution: float = 1.0,
+                          batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Write the community of every user back as its community_id property
+
+        The community_id of a community is the smallest ID among its members, as
+        returned by detect_communities; users without relationships form their own community.
+
+        Returns:
+            Dictionary with the number of users updated
+        """
+        projection = projection_manager.get()
+        nodes, _ = GraphAnalyticsService._user_graph(projection)
+        user_count = int(np.count_nonzero(projection.node_types[nodes] == USER))
+        labels = GraphAnalyticsService._communities(projection, algorithm, resolution)["labels"][:user_count]
+        ids = [projection.node_ids[node] for node in nodes[:user_count]]
+        community_ids: Dict[int, str] = {}
+        for label, node_id in zip(labels.tolist(), ids):
+            if label not in community_ids or node_id < community_ids[label]:
+                community_ids[label] = node_id
+        rows = [{"id": node_id, "value": community_ids[label]} for label, node_id in zip(labels.tolist(), ids)]
+        updated = GraphOperations.set_node_properties("community_id", {"User": rows}, batch_size)
+        return {
+            "algorithm": algorithm,
+            "property": "community_id",
+            "graph_version": projection.version,
+            "community_count": len(community_ids),
+            "updated_count": updated
+        }
+
+    @staticmethod
+    def _communities(projection: GraphProjection, algorithm: str, resolution: float) -> Dict[str, Any]:
+        """Community label of every node of the user graph (in _user_graph order), computed once per projection"""
+        if algorithm not in ("louvain", "label_propagation"):
+            raise ValueError(f"Unknown community detection algorithm: {algorithm}")
+
+        def compute() -> Dict[str, Any]:
+            _, (offsets, targets, weights) = GraphAnalyticsService._user_graph(projection)
+            iterations = converged = None
+            if algorithm == "louvain":
+                labels = louvain(offsets, targets, weights, resolution)
+            else:
+                labels, iterations, converged = label_propagation(offsets, targets, weights)
+                _, labels = np.unique(labels, return_inverse=True)
+                labels = labels.ravel()
+            return {
+                "labels": labels,
+                "community_count": int(labels.max()) + 1 if len(labels) else 0,
+                "modularity": modularity(offsets, targets, weights, labels, resolution),
+                "iterations": iterations,
+                "converged": converged
+            }
+
+        key = ("communities", algorithm, resolution if algorithm == "louvain" else None)
+        return projection.derived(key, compute)
+
+    @staticmethod
+    def _user_graph(projection: GraphProjection) -> Tuple[np.ndarray, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Weighted undirected graph between users, computed once per projection
+
+        Two users are linked when they share an attribute (SHARED_*), have a
+        business relationship or transacted with each other. The weight of the
+        link is the strength used for COMPOSITE relationships: every distinct kind
+        of link adds COMPOSITE_BASE_STRENGTH (transacting counts as one kind),
+        plus the bonus of every COMPOSITE_TYPE_BONUSES group present.
+
+        Identifier nodes of users are kept as nodes of the graph instead of
+        linking every pair of their owners: each owner is linked to the node
+        with the strength of the SHARED_* link it stands for.
+
+        Returns:
+            (nodes, (offsets, targets, weights)): projection indices of the users,
+            followed by those of their identifier nodes, and the symmetric
+            weighted CSR over positions in nodes
+        """
+        def compute():
+            users = np.flatnonzero(projection.node_types == USER)
+            owned = (projection.node_types[projection.sources] == USER) & \
+                (projection.node_types[projection.out_targets] == IDENTIFIER)
+            nodes = np.concatenate([users, np.unique(projection.out_targets[owned])])
+            local = np.full(projection.num_nodes, -1, dtype=np.int64)
+            local[nodes] = np.arange(len(nodes))
+
+            # Kind of every link: relationship type codes, and one more code for transacting
+            group_of_type = np.full(len(projection.type_names) + 1, -1, dtype=np.int64)
+            for group, (relationship_types, _) in enumerate(COMPOSITE_TYPE_BONUSES):
+                for relationship_type in relationship_types:
+                    for name in [relationship_type] + IDENTIFIER_RELATIONSHIP_TYPES.get(relationship_type, []):
+                        if name in projection.type_codes:
+                            group_of_type[projection.type_codes[name]] = group
+            bonuses = np.array([bonus for _, bonus in COMPOSITE_TYPE_BONUSES])
+
+            direct = (group_of_type[projection.edge_types] >= 0) & \
+                (local[projection.sources] >= 0) & (local[projection.out_targets] >= 0)
+            senders = np.full(projection.num_nodes, -1, dtype=np.int64)
+            receivers = np.full(projection.num_nodes, -1, dtype=np.int64)
+            sent = projection.type_mask(["SENT"])
+            received = projection.type_mask(["RECEIVED_BY"])
+            senders[projection.out_targets[sent]] = local[projection.sources[sent]]
+            receivers[projection.sources[received]] = local[projection.out_targets[received]]
+            transacted = (senders >= 0) & (receivers >= 0) & (senders != receivers)
+
+            u = np.concatenate([local[projection.sources[direct]], senders[transacted]])
+            v = np.concatenate([local[projection.out_targets[direct]], receivers[transacted]])
+            kinds = np.concatenate([projection.edge_types[direct].astype(np.int64),
+                                    np.full(int(transacted.sum()), len(projection.type_names), dtype=np.int64)])
+            keep = u != v
+            u, v, kinds = u[keep], v[keep], kinds[keep]
+            pairs = np.minimum(u, v) * len(nodes) + np.maximum(u, v)
+
+            # Distinct kinds of link per pair, then the bonus of each group present
+            num_kinds = len(group_of_type)
+            pair_kinds = np.unique(pairs * num_kinds + kinds)
+            unique_pairs, pair_index = np.unique(pair_kinds // num_kinds, return_inverse=True)
+            pair_index = pair_index.ravel()
+            strengths = COMPOSITE_BASE_STRENGTH * np.bincount(pair_index, minlength=len(unique_pairs))
+            groups = group_of_type[pair_kinds % num_kinds]
+            grouped = np.unique(np.stack([pair_index[groups >= 0], groups[groups >= 0]]), axis=1)
+            strengths += np.bincount(grouped[0], weights=bonuses[grouped[1]], minlength=len(unique_pairs))
+
+            csr = build_weighted_csr(unique_pairs // len(nodes), unique_pairs % len(nodes), strengths, len(nodes))
+            return nodes, csr
+
+        return projection.derived("user-graph", compute)
+
+    @staticmethod
+    def _internal_transactions(projection: GraphProjection, users: np.ndarray, labels: np.ndarray,
+                               num_communities: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Number and total amount of the transactions between members of each community"""
+        community = np.full(projection.num_nodes, -1, dtype=np.int64)
+        community[users] = labels
+        sender_community = np.full(projection.num_nodes, -1, dtype=np.int64)
+        receiver_community = np.full(projection.num_nodes, -1, dtype=np.int64)
+        sent = projection.type_mask(["SENT"])
+        received = projection.type_mask(["RECEIVED_BY"])
+        sender_community[projection.out_targets[sent]] = community[projection.sources[sent]]
+        receiver_community[projection.sources[received]] = community[projection.out_targets[received]]
+        internal = (sender_community >= 0) & (sender_community == receiver_community)
+        counts = np.bincount(sender_community[internal], minlength=num_communities)
+        amounts = np.bincount(sender_community[internal], weights=np.nan_to_num(projection.amounts[internal]),
+                              minlength=num_communities)
+        return counts, amounts
+
+    @staticmethod
+    def trace_funds(start_id: str, direction: str = "forward", max_hops: int = 3, window: float = 7 * 24 * 3600,
+                    min_ratio: float = 0.1, max_ratio: Optional[float] = 1.1, limit: int = 1000) -> Optional[Dict[str, Any]]:
+        """
+        Follow funds forward or backward in time from a transaction or a user
+
+        The trace runs over a time-sorted index of the transactions built from
+        the projection (see TemporalIndex and trace). Starting from a user, the
+        trace starts from all the transactions the user sent (forward) or
+        received (backward), at hop 0.
+
+        Args:
+            start_id: ID of the transaction or user to start from
+            direction: "forward" (where the money went) or "backward" (where it came from)
+            max_hops: Number of hops to follow
+            window: Maximum number of seconds between consecutive transactions
+            min_ratio, max_ratio: Bounds on the amount of each transaction relative
+                                  to the one before it; max_ratio None for no upper bound
+            limit: Maximum number of transactions returned
+
+        Returns:
+            The transactions and accounts reached, or None if start_id does not exist
+        """
+        projection = projection_manager.get()
+        node = projection.index.get(start_id)
+        if node is None:
+            return None
+        index = projection.derived("temporal-index", lambda: TemporalIndex(projection))
+        forward = direction == "forward"
+
+        if projection.node_types[node] == TRANSACTION:
+            roots = np.array([node] if index.senders[node] >= 0 and index.receivers[node] >= 0
+                             and np.isfinite(index.times[node]) else [], dtype=np.int64)
+        else:
+            roots, _ = index.ranges(np.array([node]), np.array([-np.inf]), np.array([np.inf]), outgoing=forward)
+
+        reached, truncated = trace(index, roots, forward, max_hops, window, min_ratio, max_ratio, limit)
+        transactions, accounts = format_trace(projection, index, reached)
+        return {
+            "start_id": start_id,
+            "start_type": NODE_TYPE_NAMES[int(projection.node_types[node])],
+            "direction": direction,
+            "graph_version": projection.version,
+            "transactions": transactions,
+            "accounts": accounts,
+            "truncated": truncated
+        }
+
+    @staticmethod
+    def find_cycles(max_length: int = 4, max_span: float = 7 * 24 * 3600, limit: int = 100,
+                    max_cycles: int = 100000) -> Dict[str, Any]:
+        """
+        Find round-tripping: chains of transactions that bring money back to where it started
+
+        Cycles are enumerated over the time-sorted transaction index (see
+        find_cycles in app.services.temporal), with the users sending the first
+        transaction of each cycle split between CYCLE_WORKERS processes.
+
+        Args:
+            max_length: Maximum number of transactions in a cycle
+            max_span: Maximum number of seconds between the first and last transaction
+            limit: Maximum number of cycles returned, largest cycled amount first
+            max_cycles: Stop enumerating each worker chunk of start users after this many cycles
+
+        Returns:
+            Dictionary with the number of cycles found and the total amount they cycled,
+            and the top limit cycles by cycled amount. truncated is true when the
+            enumeration stopped early, in which case the count and total cover only
+            the cycles found.
+        """
+        projection = projection_manager.get()
+        index = projection.derived("temporal-index", lambda: TemporalIndex(projection))
+        start_users = np.unique(index.senders[index.transactions])
+        chunk_count = max(1, min(len(start_users), CYCLE_WORKERS * 4))
+        # Interleave users so that busy and quiet users are spread over the chunks
+        chunks = [(start_users[offset::chunk_count].tolist(), max_length, max_span, max_cycles)
+                  for offset in range(chunk_count)]
+        results = map_shared(cycles_chunk, chunks, index.arrays(), CYCLE_WORKERS)
+
+        cycles = [cycle for found, _ in results for cycle in found]
+        truncated = any(chunk_truncated for _, chunk_truncated in results)
+        # Rank every cycle found before keeping the top limit, so the returned ones are the largest
+        cycled_amounts = [float(index.amounts[cycle].min()) for cycle in cycles]
+        top = heapq.nsmallest(limit, range(len(cycles)), key=lambda i: (
+            -cycled_amounts[i], float(index.times[cycles[i][0]]), [projection.node_ids[t] for t in cycles[i]]
+        ))
+        return {
+            "graph_version": projection.version,
+            "cycle_count": len(cycles),
+            "total_cycled_amount": sum(cycled_amounts),
+            "truncated": truncated,
+            "cycles": [GraphAnalyticsService._format_cycle(projection, index, cycles[i]) for i in top]
+        }
+
+    @staticmethod
+    def _format_cycle(projection: GraphProjection, index: TemporalIndex, cycle: List[int]) -> Dict[str, Any]:
+        """Describe a cycle; the cycled amount is the smallest amount along it, which made the full round trip"""
+        amounts = [float(index.amounts[transaction]) for transaction in cycle]
+        start, end = float(index.times[cycle[0]]), float(index.times[cycle[-1]])
+        return {
+            "length": len(cycle),
+            "user_ids": [projection.node_ids[index.senders[transaction]] for transaction in cycle],
+            "transaction_ids": [projection.node_ids[transaction] for transaction in cycle],
+            "amounts": amounts,
+            "total_amount": sum(amounts),
+            "cycled_amount": min(amounts),
+            "start_time": datetime.fromtimestamp(start, timezone.utc),
+            "span_seconds": end - start
+        }
+
+    @staticmethod
+    def get_beneficial_owners(company_id: str, threshold: float = 25.0) -> Optional[Dict[str, Any]]:
+        """
+        Find the ultimate beneficial owners of a company
+
+        Effective stakes multiply the shareholdings along every ownership path
+        and are memoized until the ownership relationships change (see
+        app.services.ownership).
+
+        Args:
+            company_id: ID of the company
+            threshold: Minimum effective stake of a returned owner, in percent
+
+        Returns:
+            The owners with their effective and direct stakes, or None if the company does not exist
+        """
+        projection = projection_manager.get()
+        if company_id not in projection.index:
+            return None
+        graph = ownership_cache.get(projection)
+        stakes, converged = graph.effective_stakes(company_id)
+        return {
+            "company_id": company_id,
+            "threshold": threshold,
+            "graph_version": projection.version,
+            "converged": converged,
+            "owners": GraphAnalyticsService._format_owners(projection, graph.stakes.get(company_id, {}),
+                                                           stakes, threshold)
+        }
+
+    @staticmethod
+    def get_beneficial_owner_report(threshold: float = 25.0, limit: int = 1000, offset: int = 0) -> Dict[str, Any]:
+        """
+        Resolve the beneficial owners of every company with recorded owners in one pass
+
+        Args:
+            threshold: Minimum effective stake of a returned owner, in percent
+            limit: Maximum number of companies returned, by company ID
+            offset: Number of companies skipped
+
+        Returns:
+            The number of companies with owners and, for each returned company,
+            the owners over the threshold
+        """
+        projection = projection_manager.get()
+        graph = ownership_cache.get(projection)
+        resolved = graph.all_effective_stakes()
+        companies = []
+        for company_id in list(resolved)[offset:offset + limit]:
+            stakes, converged = resolved[company_id]
+            companies.append({
+                "company_id": company_id,
+                "converged": converged,
+                "owners": GraphAnalyticsService._format_owners(projection, graph.stakes[company_id], stakes, threshold)
+            })
+        return {
+            "threshold": threshold,
+            "graph_version": projection.version,
+            "company_count": len(resolved),
+            "companies": companies
+        }
+
+    @staticmethod
+    def _format_owners(projection: GraphProjection, direct: Dict[str, float], stakes: Dict[str, float],
+                       threshold: float) -> List[Dict[str, Any]]:
+        """Owners with an effective stake of at least threshold percent, largest first"""
+        owners = []
+        for owner_id, stake in stakes.items():
+            if stake * 100 < threshold:
+                continue
+            node = projection.index.get(owner_id)
+            owners.append({
+                "owner_id": owner_id,
+                "is_company": bool(projection.is_company[node]) if node is not None else False,
+                "effective_percentage": stake * 100,
+                "direct_percentage": direct.get(owner_id, 0.0) * 100
+            })
+        owners.sort(key=lambda owner: (-owner["effective_percentage"], owner["owner_id"]))
+        return owners
+
+    @staticmethod
+    def resolve_entities(threshold: float = 0.6, write: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+                         limit: int = 100) -> Dict[str, Any]:
+        """
+        Find users that are probably the same person or company
+
+        Users are compared on their normalized name, address, email and phone,
+        with candidate pairs found by blocking and MinHash/LSH instead of
+        comparing every pair (see app.services.entity_resolution).
+
+        Args:
+            threshold: Minimum match score of a returned pair
+            write: Whether to link the matched pairs with POSSIBLE_SAME_ENTITY relationships
+            batch_size: Number of relationships written per database transaction
+            limit: Maximum number of matches returned, best scores first
+
+        Returns:
+            Dictionary with the number of users, candidate pairs and matches, and the best matches
+        """
+        records = list(db.stream_query(USER_IDENTIFIERS_QUERY))
+        matches, counts = EntityResolver(threshold=threshold).resolve(records)
+        written = GraphOperations.create_possible_same_entity_relationships(matches, batch_size) if write else 0
+        matches.sort(key=lambda match: (-match["score"], match["source_id"], match["target_id"]))
         return {
-            "total_nodes": basic_metrics["total_nodes"],
-            "user_count": basic_metrics["user_count"],
-            "transaction_count": basic_metrics["transaction_count"],
-            "company_count": basic_metrics["company_count"],
-            "relationship_count": basic_metrics["relationship_count"],
-            "relationship_type_counts": relationship_counts,
-            "most_connected_nodes": most_connected
+            "threshold": threshold,
+            "user_count": counts["records"],
+            "candidate_pair_count": counts["candidate_pairs"],
+            "match_count": len(matches),
+            "written_count": written,
+            "matches": matches[:limit]
         }
+
+    @staticmethod
+    def get_graph_metrics() -> Dict[str, Any]:
+        """
+        Get various metrics for the graph
+
+        The metrics are maintained as counters by the write paths (see
+        GraphStatistics), so this does not query the database once they are loaded.
+
+        Returns:
+            Dictionary containing graph metrics
+        """
+        return graph_statistics.get_metrics()
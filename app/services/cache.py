@@ -0,0 +1,117 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+class GraphVersion:
+    """
+    Counter that identifies the current state of the graph
+
+    Every write path in GraphOperations bumps the version, so anything computed
+    from the graph can be reused for as long as the version is unchanged. The
+    counter is per process: with several workers, each one tracks the writes it
+    served itself. The epoch is random per process, so tokens handed out by a
+    restarted server or another worker never match the current state.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self.epoch = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        """Current graph version"""
+        return self._value
+
+    def token(self, value: Optional[int] = None) -> str:
+        """Version token for clients: the epoch and the given (or current) version"""
+        return f"{self.epoch}-{self._value if value is None else value}"
+
+    def bump(self) -> int:
+        """Advance the graph version after a write and return the new value"""
+        with self._lock:
+            self._value += 1
+            return self._value
+
+class ResponseCache:
+    """
+    LRU cache of computed responses, valid for a single graph version
+
+    Each key holds at most one entry, tagged with the graph version it was
+    computed at. Entries from an older version count as misses and are replaced.
+    """
+
+    def __init__(self, version: GraphVersion, max_entries: int = 64):
+        self.version = version
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (True, value) if key is cached for the current version, else (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == self.version.value:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, version: int, value: Any) -> None:
+        """Store a value computed at the given graph version"""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and caching it on a miss"""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        # Tag the result with the version it was computed from, not the one after it
+        version = self.version.value
+        value = compute()
+        self.set(key, version, value)
+        return value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of get_or_compute for coroutine functions"""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        version = self.version.value
+        value = await compute()
+        self.set(key, version, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "graph_version": self.version.value,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+# Create singleton instances
+graph_version = GraphVersion()
+response_cache = ResponseCache(graph_version, int(os.getenv("RESPONSE_CACHE_SIZE", "64")))
@@ -0,0 +1,80 @@
+import os
+import threading
+from collections import deque
+from typing import Iterable, Optional, Set
+
+from app.services.cache import GraphVersion, graph_version
+
+class ChangeLog:
+    """
+    Bounded log of the nodes touched by each graph version
+
+    Every write path records the IDs of the nodes it created or whose
+    relationships it changed, so a client holding an older version token can
+    fetch just those nodes and their edges. Writes that may touch any part of
+    the graph (such as the full detection pass) are recorded as resets. Once the
+    log exceeds max_node_ids, the oldest entries are dropped and tokens older
+    than the retained window have to fall back to a full reload.
+    """
+
+    def __init__(self, version: GraphVersion, max_node_ids: int = 100000):
+        self.version = version
+        self.max_node_ids = max_node_ids
+        self._entries = deque()
+        self._size = 0
+        # Changes up to and including this version are no longer available
+        self._floor = version.value
+        self._lock = threading.Lock()
+
+    def record(self, node_ids: Iterable[str] = (), reset: bool = False) -> int:
+        """
+        Bump the graph version for a write and record the nodes it touched
+
+        The bump happens under the log's lock so that a reader never sees a
+        version whose changes are not in the log yet.
+
+        Returns:
+            The new graph version
+        """
+        ids = None if reset else frozenset(node_ids)
+        with self._lock:
+            version = self.version.bump()
+            self._entries.append((version, ids))
+            self._size += len(ids) if ids else 0
+            while self._entries and (self._size > self.max_node_ids or len(self._entries) > self.max_node_ids):
+                evicted_version, evicted_ids = self._entries.popleft()
+                self._size -= len(evicted_ids) if evicted_ids else 0
+                self._floor = evicted_version
+            return version
+
+    def current_version(self) -> str:
+        """Token of the graph version that is fully reflected in the log"""
+        with self._lock:
+            return self.version.token()
+
+    def changes_since(self, since: str) -> Optional[Set[str]]:
+        """
+        Return the IDs of the nodes touched after the version of token since
+
+        Returns None when the changes cannot be reconstructed from the log: the
+        token is malformed, older than the retained window, comes from another
+        process lifetime (its epoch differs), or a reset happened since.
+        """
+        epoch, _, value = since.rpartition("-")
+        if epoch != self.version.epoch or not value.isdigit():
+            return None
+        since = int(value)
+        with self._lock:
+            if since < self._floor or since > self.version.value:
+                return None
+            changed = set()
+            for version, ids in self._entries:
+                if version <= since:
+                    continue
+                if ids is None:
+                    return None
+                changed.update(ids)
+            return changed
+
+# Create a singleton instance
+change_log = ChangeLog(graph_version, int(os.getenv("CHANGE_LOG_SIZE", "100000")))
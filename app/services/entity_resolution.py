@@ -0,0 +1,258 @@
+"""
+Entity resolution: find users that are probably the same person or company
+
+Identifiers are normalized first, so that formatting differences such as
+"+1-555-123-4567" and "+15551234567" compare equal. Candidate pairs then come
+from blocking instead of comparing every pair of users:
+
+- exact blocking on the normalized email and phone
+- MinHash/LSH on the character shingles of the normalized name and address:
+  every user gets a MinHash signature, split into bands, and users whose
+  signatures agree on all rows of any band land in the same block. Two users
+  with shingle Jaccard similarity s share a block with probability
+  1 - (1 - s^rows)^bands, so similar users are found in near-linear time.
+
+Candidate pairs are scored on their exact name and address similarity and on
+matching identifiers, and the pairs scoring at least the threshold are matches.
+Similarity is the Dice coefficient of the shingle sets, which is more forgiving
+of typos in short strings than Jaccard similarity; addresses with different
+house or unit numbers do not count as similar at all.
+"""
+import re
+import zlib
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+# Words replaced by their usual abbreviation when normalizing addresses
+ADDRESS_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "lane": "ln", "boulevard": "blvd", "drive": "dr",
+    "court": "ct", "place": "pl", "square": "sq", "highway": "hwy", "parkway": "pkwy", "suite": "ste",
+    "apartment": "apt", "floor": "fl", "north": "n", "south": "s", "east": "e", "west": "w",
+    "newyork": "ny", "california": "ca", "illinois": "il", "texas": "tx", "arizona": "az"
+}
+
+# Email domains that ignore dots in the local part
+DOTLESS_EMAIL_DOMAINS = {"gmail.com", "googlemail.com"}
+
+# Weights of the evidence in a match score, which is capped at 1: with the
+# default threshold of 0.6, a similar name needs either a shared email or phone
+# or the same address to match
+NAME_WEIGHT = 0.5
+ADDRESS_WEIGHT = 0.3
+IDENTIFIER_WEIGHT = 0.4
+
+def normalize_phone(phone: Optional[str], default_country_code: str = "1") -> Optional[str]:
+    """Digits of a phone number with the country code, as +<digits>; None if too short to be a number"""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif len(digits) == 10 and not phone.strip().startswith("+"):
+        digits = default_country_code + digits
+    return f"+{digits}" if len(digits) >= 7 else None
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lowercase email without a +tag, and without dots in the local part for providers that ignore them"""
+    if not email or "@" not in email:
+        return None
+    local, domain = email.strip().lower().rsplit("@", 1)
+    local = local.split("+", 1)[0]
+    if domain in DOTLESS_EMAIL_DOMAINS:
+        local = local.replace(".", "")
+    return f"{local}@{domain}" if local and domain else None
+
+def normalize_address(address: Optional[str]) -> Optional[str]:
+    """Lowercase address words without punctuation, with common words abbreviated"""
+    if not address:
+        return None
+    words = re.sub(r"[^a-z0-9]+", " ", address.lower()).split()
+    # Two-word states such as "New York" are joined before abbreviating
+    text = " ".join(words).replace("new york", "newyork")
+    words = [ADDRESS_ABBREVIATIONS.get(word, word) for word in text.split()]
+    return " ".join(words) or None
+
+def normalize_name(name: Optional[str]) -> Optional[str]:
+    """Lowercase name words without punctuation"""
+    if not name:
+        return None
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name.lower()).split()) or None
+
+def shingles(text: Optional[str], size: int = 3) -> FrozenSet[int]:
+    """Hashes of the character shingles of a text, padded so that short texts have some"""
+    if not text:
+        return frozenset()
+    padded = f" {text} "
+    return frozenset(
+        zlib.crc32(padded[start:start + size].encode()) for start in range(max(1, len(padded) - size + 1))
+    )
+
+def dice(first: FrozenSet[int], second: FrozenSet[int]) -> float:
+    """Dice coefficient of two sets, 0 if either is empty"""
+    if not first or not second:
+        return 0.0
+    return 2 * len(first & second) / (len(first) + len(second))
+
+class EntityResolver:
+    """
+    Blocking and scoring of user records, as described in the module docstring
+
+    Args:
+        threshold: Minimum score of a match
+        bands, rows: LSH banding of the MinHash signatures (bands * rows hash
+                     functions); pairs with a shingle similarity around
+                     (1 / bands) ** (1 / rows) become candidates half of the time
+        shingle_size: Number of characters per shingle
+        max_block_size: Blocks larger than this are skipped, as they come from
+                        values shared by too many users to tell them apart
+        seed: Seed of the MinHash hash functions
+    """
+
+    def __init__(self, threshold: float = 0.6, bands: int = 20, rows: int = 5, shingle_size: int = 3,
+                 max_block_size: int = 100, seed: int = 1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        self.max_block_size = max_block_size
+        random = np.random.default_rng(seed)
+        # Odd multipliers, as multiply-shift hashing requires
+        self._a = random.integers(0, 2 ** 63, bands * rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = random.integers(0, 2 ** 63, bands * rows, dtype=np.uint64)
+
+    def resolve(self, records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Find the pairs of records that are probably the same entity
+
+        Args:
+            records: Dictionaries with id, name, email, phone and address
+
+        Returns:
+            (matches, counts): matches have source_id, target_id (in record order),
+            score, name_similarity, address_similarity and the identifiers they
+            share; counts has the number of records and candidate pairs
+        """
+        # Shingle every distinct text once; names and addresses repeat a lot
+        shingled: Dict[Optional[str], FrozenSet[int]] = {}
+        def shingle(text: Optional[str]) -> FrozenSet[int]:
+            if text not in shingled:
+                shingled[text] = shingles(text, self.shingle_size)
+            return shingled[text]
+
+        names = [shingle(normalize_name(record.get("name"))) for record in records]
+        normalized_addresses = [normalize_address(record.get("address")) for record in records]
+        addresses = [shingle(address) for address in normalized_addresses]
+        numbers = [frozenset(re.findall(r"\d+", address)) if address else frozenset()
+                   for address in normalized_addresses]
+        emails = [normalize_email(record.get("email")) for record in records]
+        phones = [normalize_phone(record.get("phone")) for record in records]
+
+        # Names and addresses are shingled together, with address shingles kept apart by a tag bit
+        combined = [name | {shingle ^ 0x80000000 for shingle in address} for name, address in zip(names, addresses)]
+        email_codes, phone_codes, number_codes = (_codes(values) for values in (emails, phones, numbers))
+        everyone = np.arange(len(records), dtype=np.int64)
+        candidates = _distinct(np.concatenate([
+            self._lsh_candidates(combined),
+            self._block_pairs(everyone[email_codes >= 0], email_codes[email_codes >= 0], len(records)),
+            self._block_pairs(everyone[phone_codes >= 0], phone_codes[phone_codes >= 0], len(records))
+        ]))
+        firsts, seconds = candidates // max(len(records), 1), candidates % max(len(records), 1)
+
+        # Skip the similarities of pairs that could not reach the threshold even with perfect ones
+        same_email = (email_codes[firsts] >= 0) & (email_codes[firsts] == email_codes[seconds])
+        same_phone = (phone_codes[firsts] >= 0) & (phone_codes[firsts] == phone_codes[seconds])
+        same_numbers = number_codes[firsts] == number_codes[seconds]
+        possible = NAME_WEIGHT + ADDRESS_WEIGHT * same_numbers + IDENTIFIER_WEIGHT * (same_email | same_phone) \
+            >= self.threshold
+
+        matches = []
+        for first, second, email, phone, numbers_match in zip(
+                firsts[possible].tolist(), seconds[possible].tolist(), same_email[possible].tolist(),
+                same_phone[possible].tolist(), same_numbers[possible].tolist()):
+            shared = [kind for kind, same in (("email", email), ("phone", phone)) if same]
+            name_similarity = dice(names[first], names[second])
+            address_similarity = dice(addresses[first], addresses[second]) if numbers_match else 0.0
+            score = min(1.0, NAME_WEIGHT * name_similarity + ADDRESS_WEIGHT * address_similarity +
+                        (IDENTIFIER_WEIGHT if shared else 0.0))
+            if score >= self.threshold:
+                matches.append({
+                    "source_id": records[first]["id"],
+                    "target_id": records[second]["id"],
+                    "score": round(score, 6),
+                    "name_similarity": round(name_similarity, 6),
+                    "address_similarity": round(address_similarity, 6),
+                    "shared_identifiers": shared
+                })
+        return matches, {"records": len(records), "candidate_pairs": len(candidates)}
+
+    def signatures(self, sets: List[FrozenSet[int]]) -> np.ndarray:
+        """
+        MinHash signatures of shingle sets, one row per set
+
+        The multiply-shift hash functions ((a * x + b) mod 2^64) >> 32 are
+        applied to all shingles at once and reduced to per-set minimums with
+        np.minimum.reduceat.
+        Empty sets get all-maximum signatures, which the LSH step skips.
+        """
+        num_hashes = len(self._a)
+        sizes = np.fromiter((len(shingle_set) for shingle_set in sets), dtype=np.int64, count=len(sets))
+        values = np.fromiter((shingle for shingle_set in sets for shingle in shingle_set),
+                             dtype=np.uint64, count=int(sizes.sum()))
+        result = np.full((len(sets), num_hashes), np.iinfo(np.uint64).max, dtype=np.uint64)
+        nonempty = np.flatnonzero(sizes)
+        if not len(nonempty):
+            return result
+        starts = (np.cumsum(sizes) - sizes)[nonempty]
+        # Bound the temporary (shingles x hash functions) matrix
+        chunk = max(1, min(num_hashes, 2 ** 24 // max(len(values), 1)))
+        with np.errstate(over="ignore"):
+            for first in range(0, num_hashes, chunk):
+                hashed = (values[:, None] * self._a[first:first + chunk] + self._b[first:first + chunk]) >> np.uint64(32)
+                result[nonempty, first:first + chunk] = np.minimum.reduceat(hashed, starts, axis=0)
+        return result
+
+    def _lsh_candidates(self, sets: List[FrozenSet[int]]) -> np.ndarray:
+        """Pairs of sets whose signatures agree on every row of at least one band, as pair codes"""
+        signatures = self.signatures(sets)
+        usable = np.flatnonzero(np.fromiter((len(shingle_set) > 0 for shingle_set in sets), dtype=bool,
+                                            count=len(sets)))
+        pairs = [np.empty(0, dtype=np.int64)]
+        with np.errstate(over="ignore"):
+            for band in range(self.bands):
+                keys = np.zeros(len(usable), dtype=np.uint64)
+                for column in range(band * self.rows, (band + 1) * self.rows):
+                    keys = keys * np.uint64(1000003) ^ signatures[usable, column]
+                pairs.append(self._block_pairs(usable, keys, len(sets)))
+        return np.concatenate(pairs)
+
+    def _block_pairs(self, members: np.ndarray, keys: np.ndarray, num_records: int) -> np.ndarray:
+        """
+        Pairs of members with equal keys, skipping blocks over max_block_size
+
+        Returns:
+            Pair codes first * num_records + second with first < second
+        """
+        order = np.lexsort((members, keys))
+        members, keys = members[order], keys[order]
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else \
+            np.empty(0, dtype=np.int64)
+        sizes = np.diff(np.append(starts, len(keys)))
+        pairs = [np.empty(0, dtype=np.int64)]
+        # Blocks of the same size at once, as rows of a (blocks x size) matrix
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= self.max_block_size)]).tolist():
+            block = members[starts[sizes == size][:, None] + np.arange(size)]
+            firsts, seconds = np.triu_indices(size, 1)
+            pairs.append((block[:, firsts] * num_records + block[:, seconds]).ravel())
+        return np.concatenate(pairs)
+
+def _distinct(values: np.ndarray) -> np.ndarray:
+    """Sorted distinct values of an integer array; sorting is faster than np.unique here"""
+    values = np.sort(values)
+    return values[np.concatenate([[True], values[1:] != values[:-1]])] if len(values) else values
+
+def _codes(values: List[Any]) -> np.ndarray:
+    """Integer code of every value, equal for equal values, -1 for None"""
+    codes: Dict[Any, int] = {}
+    return np.fromiter((-1 if value is None else codes.setdefault(value, len(codes)) for value in values),
+                       dtype=np.int64, count=len(values))
@@ -0,0 +1,221 @@
+"""
+Effective ownership of companies through chains of shareholdings
+
+A shareholder that holds a fraction of a company holds the same fraction of
+everything that company owns, so the effective stake of an owner in a company
+is the sum, over every ownership path between them, of the product of the
+stakes along the path. Stakes are resolved down to ultimate owners: users that
+have no recorded owners themselves.
+
+Each company's stakes depend only on those of its direct shareholders, so they
+are computed by dynamic programming with shareholders before the companies
+they own. Cross-holdings put companies in a cycle of mutual dependencies; the
+strongly connected components of the ownership graph are solved one at a time
+in that order, iterating within each component until the stakes converge.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.projection import GraphProjection
+
+# Stakes below this fraction are dropped while propagating, to keep the vectors small
+MIN_STAKE = 1e-9
+
+# Iteration limits for companies in ownership cycles
+CYCLE_TOLERANCE = 1e-10
+CYCLE_MAX_ITERATIONS = 1000
+
+# Direct stakes as {company ID: {owner ID: fraction}}
+Stakes = Dict[str, Dict[str, float]]
+
+def ownership_stakes(projection: GraphProjection) -> Stakes:
+    """
+    Direct stakes in each company, from the ownership relationships of a projection
+
+    SHAREHOLDER_OF relationships give the stake as a percentage; those without
+    one are ignored, and of several between the same pair the largest counts.
+    A company without shareholders that has a parent (PARENT_OF, or
+    SUBSIDIARY_OF in the other direction) is wholly owned by it. When the stakes
+    in a company add up to more than 100%, they are scaled down to 100%.
+    """
+    stakes: Stakes = {}
+    node_ids = projection.node_ids
+
+    shareholder = projection.type_mask(["SHAREHOLDER_OF"]) & np.isfinite(projection.percentages)
+    for owner, company, percentage in zip(projection.sources[shareholder].tolist(),
+                                          projection.out_targets[shareholder].tolist(),
+                                          projection.percentages[shareholder].tolist()):
+        if owner == company or percentage <= 0:
+            continue
+        owners = stakes.setdefault(node_ids[company], {})
+        owners[node_ids[owner]] = max(owners.get(node_ids[owner], 0.0), percentage / 100)
+
+    parent = projection.type_mask(["PARENT_OF"])
+    subsidiary = projection.type_mask(["SUBSIDIARY_OF"])
+    parents = zip(
+        np.concatenate([projection.sources[parent], projection.out_targets[subsidiary]]).tolist(),
+        np.concatenate([projection.out_targets[parent], projection.sources[subsidiary]]).tolist()
+    )
+    for owner, company in parents:
+        company_id = node_ids[company]
+        if owner != company and company_id not in stakes:
+            stakes[company_id] = {node_ids[owner]: 1.0}
+
+    for owners in stakes.values():
+        total = sum(owners.values())
+        if total > 1.0:
+            for owner_id in owners:
+                owners[owner_id] /= total
+    return stakes
+
+class OwnershipGraph:
+    """
+    Direct stakes between companies and their owners, with the effective stakes
+    computed from them so far
+
+    Effective stakes are memoized per company as {ultimate owner ID: fraction};
+    an ultimate owner's own entry is {its ID: 1.0}. Resolving a company computes
+    it together with every company up its ownership chains that is not
+    memoized yet.
+    """
+
+    def __init__(self, stakes: Stakes):
+        self.stakes = stakes
+        self._effective: Dict[str, Dict[str, float]] = {}
+        # Companies in ownership cycles whose stakes did not converge
+        self._unconverged: set = set()
+        self._lock = threading.Lock()
+
+    def effective_stakes(self, company_id: str) -> Tuple[Dict[str, float], bool]:
+        """
+        Effective stakes of the ultimate owners of a company
+
+        Returns:
+            ({owner ID: fraction}, converged); empty for a company without owners
+        """
+        with self._lock:
+            self._resolve([company_id])
+            stakes = self._effective[company_id]
+            converged = company_id not in self._unconverged
+        if company_id not in self.stakes:
+            return {}, True
+        return stakes, converged
+
+    def all_effective_stakes(self) -> Dict[str, Tuple[Dict[str, float], bool]]:
+        """Effective stakes of every company with owners, resolved in one pass"""
+        with self._lock:
+            self._resolve(sorted(self.stakes))
+            return {
+                company_id: (self._effective[company_id], company_id not in self._unconverged)
+                for company_id in sorted(self.stakes)
+            }
+
+    def _resolve(self, roots: Iterable[str]) -> None:
+        """
+        Compute the effective stakes of roots and everything up their ownership chains
+
+        Runs Tarjan's algorithm along owner links, iteratively. Tarjan emits each
+        strongly connected component after every component it can reach, here
+        the components that own it, which is the order the stakes are computed in.
+        """
+        order: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack = set()
+        for root in roots:
+            if root in self._effective or root in order:
+                continue
+            work = [(root, iter(self.stakes.get(root, ())))]
+            order[root] = low[root] = len(order)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                company_id, owners = work[-1]
+                for owner_id in owners:
+                    if owner_id in self._effective:
+                        continue
+                    if owner_id not in order:
+                        order[owner_id] = low[owner_id] = len(order)
+                        stack.append(owner_id)
+                        on_stack.add(owner_id)
+                        work.append((owner_id, iter(self.stakes.get(owner_id, ()))))
+                        break
+                    if owner_id in on_stack:
+                        low[company_id] = min(low[company_id], order[owner_id])
+                else:
+                    work.pop()
+                    if work:
+                        parent_id = work[-1][0]
+                        low[parent_id] = min(low[parent_id], low[company_id])
+                    if low[company_id] == order[company_id]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == company_id:
+                                break
+                        self._solve(component)
+
+    def _solve(self, component: List[str]) -> None:
+        """Compute the effective stakes of a strongly connected component whose owners are resolved"""
+        if len(component) == 1 and component[0] not in self.stakes.get(component[0], ()):
+            company_id = component[0]
+            self._effective[company_id] = self._combine(company_id, {}) if company_id in self.stakes else {company_id: 1.0}
+            return
+
+        # Gauss-Seidel iteration; converges whenever some of the ownership leaves the cycle
+        estimates: Dict[str, Dict[str, float]] = {company_id: {} for company_id in component}
+        converged = False
+        for _ in range(CYCLE_MAX_ITERATIONS):
+            change = 0.0
+            for company_id in component:
+                stakes = self._combine(company_id, estimates)
+                previous = estimates[company_id]
+                for owner_id in stakes.keys() | previous.keys():
+                    change = max(change, abs(stakes.get(owner_id, 0.0) - previous.get(owner_id, 0.0)))
+                estimates[company_id] = stakes
+            if change < CYCLE_TOLERANCE:
+                converged = True
+                break
+        for company_id, stakes in estimates.items():
+            self._effective[company_id] = {owner_id: min(stake, 1.0) for owner_id, stake in stakes.items()}
+            if not converged:
+                self._unconverged.add(company_id)
+
+    def _combine(self, company_id: str, estimates: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+        """Effective stakes of a company from those of its direct owners"""
+        stakes: Dict[str, float] = {}
+        for owner_id, fraction in self.stakes[company_id].items():
+            owner_stakes = estimates[owner_id] if owner_id in estimates else self._effective[owner_id]
+            for ultimate_id, stake in owner_stakes.items():
+                stakes[ultimate_id] = stakes.get(ultimate_id, 0.0) + fraction * stake
+        return {owner_id: stake for owner_id, stake in stakes.items() if stake >= MIN_STAKE}
+
+class OwnershipCache:
+    """
+    Ownership graph of the current projection, kept while ownership is unchanged
+
+    A new projection only replaces the graph, and with it the memoized
+    effective stakes, when its direct stakes differ from the cached ones, so
+    writes that do not touch ownership relationships keep the memo.
+    """
+
+    def __init__(self):
+        self._graph: Optional[OwnershipGraph] = None
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self, projection: GraphProjection) -> OwnershipGraph:
+        with self._lock:
+            if self._graph is None or self._version != projection.version:
+                stakes = ownership_stakes(projection)
+                if self._graph is None or self._graph.stakes != stakes:
+                    self._graph = OwnershipGraph(stakes)
+                self._version = projection.version
+            return self._graph
+
+# Create a singleton instance
+ownership_cache = OwnershipCache()
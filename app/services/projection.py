@@ -0,0 +1,288 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.database.connection import db
+from app.database.operations import IDENTIFIER_TYPES
+from app.services.cache import GraphVersion, graph_version
+
+# Node type codes
+USER = 0
+TRANSACTION = 1
+IDENTIFIER = 2
+
+# Identifier nodes (see IDENTIFIER_NODES) are projected as nodes of their own,
+# linked once to each owner, so a node with k owners costs k edges
+PROJECTION_NODES_QUERY = """
+MATCH (n)
+WHERE n:User OR n:Transaction OR n:Identifier
+RETURN n.id AS id,
+       n:Transaction AS is_transaction,
+       n:Identifier AS is_identifier,
+       n.entity_type = 'company' AS is_company,
+       n.amount AS amount,
+       n.timestamp.epochMillis AS timestamp
+"""
+
+PROJECTION_EDGES_QUERY = """
+MATCH (s)-[r]->(t)
+WHERE (s:User OR s:Transaction OR s:Identifier) AND (t:User OR t:Transaction OR t:Identifier)
+RETURN s.id AS source_id, t.id AS target_id, type(r) AS relationship_type,
+       r.strength AS strength, r.percentage AS percentage
+"""
+
+# Relationship types to identifier nodes standing for each pairwise type they replace
+IDENTIFIER_RELATIONSHIP_TYPES = {
+    pairwise_type: [relationship_type for *_, relationship_type, replaced in IDENTIFIER_TYPES if replaced == pairwise_type]
+    for *_, pairwise_type in IDENTIFIER_TYPES
+}
+
+def build_csr(sources: np.ndarray, targets: np.ndarray, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build CSR offsets for edges given as (sources, targets) arrays
+
+    Returns:
+        (offsets, order): the edges of node i are order[offsets[i]:offsets[i + 1]],
+        as indices into the input arrays, in their original relative order
+    """
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+    return offsets, order
+
+class GraphProjection:
+    """
+    Compact in-memory copy of the graph for in-process analytics
+
+    Nodes are numbered 0..num_nodes-1 and edges are stored as CSR adjacency in
+    NumPy arrays. Directed edges keep their original direction in
+    out_offsets/out_targets; the undirected view lists every edge from both
+    ends, with und_edges mapping each entry back to its directed edge so that
+    edge types and weights can be looked up. Per-node and per-edge attributes
+    use NaN where a value does not apply.
+
+    Owners sharing an identifier node are two hops apart, where the pairwise
+    relationship it replaces took one. Edge lengths are therefore counted in
+    half links: edge_lengths is 1 for the edges of identifier nodes and 2 for
+    the others, and link_lengths gives the same per undirected CSR entry.
+    """
+
+    def __init__(self, node_ids: List[str], node_types: np.ndarray, is_company: np.ndarray,
+                 amounts: np.ndarray, timestamps: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                 edge_types: np.ndarray, type_names: List[str], strengths: np.ndarray,
+                 percentages: np.ndarray, version: int):
+        self.node_ids = node_ids
+        self.index = {node_id: i for i, node_id in enumerate(node_ids)}
+        self.node_types = node_types
+        self.is_company = is_company
+        self.amounts = amounts
+        self.timestamps = timestamps
+        self.type_names = type_names
+        self.type_codes = {name: code for code, name in enumerate(type_names)}
+        self.version = version
+        # Data derived from this projection, such as landmark distances, dropped with it;
+        # the lock is reentrant so that a computation can build on other derived data
+        self._derived: Dict[Hashable, Any] = {}
+        self._derived_lock = threading.RLock()
+
+        # Directed CSR, edges sorted by source
+        offsets, order = build_csr(sources, targets, len(node_ids))
+        self.out_offsets = offsets
+        self.sources = sources[order]
+        self.out_targets = targets[order]
+        self.edge_types = edge_types[order]
+        self.strengths = strengths[order]
+        self.percentages = percentages[order]
+
+        # Undirected CSR over both directions of every edge
+        num_edges = len(self.sources)
+        edge_index = np.arange(num_edges, dtype=np.int64)
+        both_sources = np.concatenate([self.sources, self.out_targets])
+        both_targets = np.concatenate([self.out_targets, self.sources])
+        offsets, order = build_csr(both_sources, both_targets, len(node_ids))
+        self.offsets = offsets
+        self.targets = both_targets[order]
+        self.und_edges = np.concatenate([edge_index, edge_index])[order]
+
+        half = (node_types[self.sources] == IDENTIFIER) | (node_types[self.out_targets] == IDENTIFIER)
+        self.edge_lengths = np.where(half, 1, 2).astype(np.int8)
+        self.link_lengths = self.edge_lengths[self.und_edges]
+        self.identifier_count = int(np.count_nonzero(node_types == IDENTIFIER))
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.sources)
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """Undirected neighbors of a node, one entry per edge"""
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def out_neighbors(self, node: int) -> np.ndarray:
+        """Targets of the outgoing edges of a node"""
+        return self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def type_mask(self, relationship_types: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Boolean mask over directed edges of the given relationship types (all edges if None)
+
+        A pairwise type replaced by identifier nodes also selects the edges to
+        them: SHARED_EMAIL selects HAS_EMAIL edges, LINKED_TO USED_IP and USED_DEVICE.
+        """
+        if not relationship_types:
+            return np.ones(self.num_edges, dtype=bool)
+        names = [name for relationship_type in relationship_types
+                 for name in [relationship_type] + IDENTIFIER_RELATIONSHIP_TYPES.get(relationship_type, [])]
+        codes = [self.type_codes[name] for name in names if name in self.type_codes]
+        return np.isin(self.edge_types, codes)
+
+    def edge_weights(self, kind: str) -> np.ndarray:
+        """
+        Per directed edge weights of a kind, NaN for edges that do not carry one
+
+        Args:
+            kind: "strength" (COMPOSITE edges), "percentage" (SHAREHOLDER_OF edges)
+                  or "amount" (the amount of the transaction at either end)
+        """
+        if kind == "strength":
+            return self.strengths
+        if kind == "percentage":
+            return self.percentages
+        if kind == "amount":
+            return np.where(
+                self.node_types[self.sources] == TRANSACTION,
+                self.amounts[self.sources],
+                self.amounts[self.out_targets]
+            )
+        raise ValueError(f"Unknown weight kind: {kind}")
+
+    def derived(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return data derived from this projection, computing it on first use"""
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = compute()
+            return self._derived[key]
+
+    def memory_bytes(self) -> int:
+        """Approximate memory used by the arrays"""
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    @classmethod
+    def load(cls, version: int) -> "GraphProjection":
+        """Load the projection from the database"""
+        node_ids = []
+        node_types = []
+        is_company = []
+        amounts = []
+        timestamps = []
+        for record in db.stream_query(PROJECTION_NODES_QUERY):
+            node_ids.append(record["id"])
+            if record["is_transaction"]:
+                node_types.append(TRANSACTION)
+            else:
+                node_types.append(IDENTIFIER if record["is_identifier"] else USER)
+            is_company.append(bool(record["is_company"]))
+            amounts.append(record["amount"] if record["amount"] is not None else np.nan)
+            timestamps.append(record["timestamp"] / 1000 if record["timestamp"] is not None else np.nan)
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+
+        sources = []
+        targets = []
+        edge_types = []
+        strengths = []
+        percentages = []
+        type_codes: Dict[str, int] = {}
+        for record in db.stream_query(PROJECTION_EDGES_QUERY):
+            source = index.get(record["source_id"])
+            target = index.get(record["target_id"])
+            if source is None or target is None:
+                continue
+            sources.append(source)
+            targets.append(target)
+            edge_types.append(type_codes.setdefault(record["relationship_type"], len(type_codes)))
+            strengths.append(record["strength"] if record["strength"] is not None else np.nan)
+            percentages.append(record["percentage"] if record["percentage"] is not None else np.nan)
+
+        return cls(
+            node_ids,
+            np.array(node_types, dtype=np.int8),
+            np.array(is_company, dtype=bool),
+            np.array(amounts, dtype=np.float64),
+            np.array(timestamps, dtype=np.float64),
+            np.array(sources, dtype=np.int64),
+            np.array(targets, dtype=np.int64),
+            np.array(edge_types, dtype=np.int16),
+            list(type_codes),
+            np.array(strengths, dtype=np.float64),
+            np.array(percentages, dtype=np.float64),
+            version
+        )
+
+class ProjectionManager:
+    """
+    Holds the current graph projection and reloads it when the graph version changes
+
+    Loads are serialized, so concurrent callers that find the projection stale
+    wait for a single reload instead of each issuing their own.
+    """
+
+    def __init__(self, version: GraphVersion):
+        self.version = version
+        self._projection: Optional[GraphProjection] = None
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+
+    def get(self) -> GraphProjection:
+        """Return a projection of the current graph version, reloading it if needed"""
+        projection = self._projection
+        if projection is not None and projection.version == self.version.value:
+            return projection
+        with self._lock:
+            projection = self._projection
+            if projection is None or projection.version != self.version.value:
+                projection = self._load()
+            return projection
+
+    def refresh(self) -> GraphProjection:
+        """Reload the projection regardless of the graph version"""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> GraphProjection:
+        # Tag the projection with the version read before loading, so that a write
+        # landing during the load triggers another reload
+        version = self.version.value
+        start = time.perf_counter()
+        projection = GraphProjection.load(version)
+        self.load_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+        self._projection = projection
+        return projection
+
+    def stats(self) -> Dict[str, Any]:
+        """Return information about the loaded projection"""
+        projection = self._projection
+        if projection is None:
+            return {"loaded": False, "graph_version": self.version.value}
+        return {
+            "loaded": True,
+            "graph_version": self.version.value,
+            "projection_version": projection.version,
+            "stale": projection.version != self.version.value,
+            "num_nodes": projection.num_nodes,
+            "num_edges": projection.num_edges,
+            "num_identifier_nodes": projection.identifier_count,
+            "relationship_types": projection.type_names,
+            "memory_bytes": projection.memory_bytes(),
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds
+        }
+
+# Create a singleton instance
+projection_manager = ProjectionManager(graph_version)
@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.database.connection import db
+
+# Node counts per label and relationship counts per type come from the
+# database's count store, so they cost one lookup each rather than a scan.
+# The company count filters on a property, which the count store cannot
+# answer: it is a seek on the User.entity_type index and grows with the number
+# of companies, which is why it only runs in the full recount.
+NODE_COUNT_QUERY = """
+MATCH (n)
+RETURN count(n) AS count
+"""
+
+LABEL_COUNT_QUERY = """
+MATCH (n:{label})
+RETURN count(n) AS count
+"""
+
+COMPANY_COUNT_QUERY = """
+MATCH (c:User {entity_type: 'company'})
+RETURN count(c) AS count
+"""
+
+RELATIONSHIP_TYPES_QUERY = """
+CALL db.relationshipTypes() YIELD relationshipType
+RETURN relationshipType AS relationship_type
+"""
+
+RELATIONSHIP_COUNT_QUERY = """
+MATCH ()-[r:`{relationship_type}`]->()
+RETURN count(r) AS count
+"""
+
+TOP_DEGREES_QUERY = """
+MATCH (n)
+WITH n, COUNT { (n)--() } AS connection_count
+ORDER BY connection_count DESC
+LIMIT $limit
+RETURN n.id AS node_id, n.name AS node_name, labels(n) AS node_type, connection_count
+"""
+
+NODE_DEGREES_QUERY = """
+UNWIND $ids AS node_id
+CALL {
+    WITH node_id
+    MATCH (n:User {id: node_id})
+    RETURN n
+    UNION
+    WITH node_id
+    MATCH (n:Transaction {id: node_id})
+    RETURN n
+}
+RETURN n.id AS node_id, n.name AS node_name, labels(n) AS node_type, COUNT { (n)--() } AS connection_count
+"""
+
+# Number of node degrees refreshed per query
+DEGREE_BATCH_SIZE = 1000
+
+class GraphStatistics:
+    """
+    Graph metrics maintained as counters instead of computed per request
+
+    Write paths report the nodes and relationships they create. Writes whose
+    relationship counts are not known up front (relationship detection) only
+    mark the relationship counts as out of date, and a background worker then
+    re-reads them from the count store. The worker also refreshes the degrees
+    of the nodes touched by writes and keeps the top_k best connected nodes:
+    since degrees only grow through the API, a node can only enter the top k
+    when it is touched. A full recount, including the top-k degree scan, runs
+    on first use and then every reconcile_interval seconds while the graph
+    changes, which also picks up writes made by other processes.
+    """
+
+    def __init__(self, top_k: int = 5, reconcile_interval: float = 300.0):
+        self.top_k = top_k
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._total_nodes = 0
+        self._label_counts: Dict[str, int] = {}
+        self._relationship_counts: Dict[str, int] = {}
+        self._top_degrees: Dict[str, Dict[str, Any]] = {}
+        self._relationships_changed = False
+        self._pending_degrees: set = set()
+        self._changed_since_reconcile = False
+        self.reconciled_at: Optional[float] = None
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def record_write(self, node_ids: Iterable[str] = (), nodes: Optional[Dict[str, int]] = None,
+                     relationships: Optional[Dict[str, int]] = None, reset: bool = False) -> None:
+        """
+        Update the counters after a write
+
+        Args:
+            node_ids: Nodes whose degree may have changed
+            nodes: Number of nodes created per label ("company" counts company users)
+            relationships: Number of relationships created per type, or None if unknown
+            reset: Whether the write may have touched any part of the graph
+        """
+        with self._lock:
+            self._changed_since_reconcile = True
+            if not self._loaded:
+                return
+            for label, count in (nodes or {}).items():
+                self._label_counts[label] = self._label_counts.get(label, 0) + count
+                if label != "company":
+                    self._total_nodes += count
+            for relationship_type, count in (relationships or {}).items():
+                self._relationship_counts[relationship_type] = self._relationship_counts.get(relationship_type, 0) + count
+            if relationships is None or reset:
+                self._relationships_changed = True
+            if reset:
+                # Degrees of any node may have changed; leave it to the next recount
+                self.reconciled_at = None
+            else:
+                self._pending_degrees.update(node_ids)
+        self._start_worker()
+        self._wakeup.set()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return the current metrics, running a full recount first if none has run yet"""
+        if not self._loaded:
+            self.reconcile()
+        with self._lock:
+            most_connected = sorted(self._top_degrees.values(), key=lambda node: (-node["connection_count"], node["id"]))
+            return {
+                "total_nodes": self._total_nodes,
+                "user_count": self._label_counts.get("User", 0),
+                "transaction_count": self._label_counts.get("Transaction", 0),
+                "company_count": self._label_counts.get("company", 0),
+                "relationship_count": sum(self._relationship_counts.values()),
+                "relationship_type_counts": dict(sorted(
+                    self._relationship_counts.items(), key=lambda item: item[1], reverse=True
+                )),
+                "most_connected_nodes": most_connected,
+                "stale": self._relationships_changed or bool(self._pending_degrees),
+                "reconciled_at": self.reconciled_at
+            }
+
+    def reconcile(self) -> None:
+        """Recount everything from the database"""
+        total_nodes = db.execute_query(NODE_COUNT_QUERY)[0]["count"]
+        label_counts = {
+            label: db.execute_query(LABEL_COUNT_QUERY.format(label=label))[0]["count"]
+            for label in ("User", "Transaction")
+        }
+        label_counts["company"] = db.execute_query(COMPANY_COUNT_QUERY)[0]["count"]
+        relationship_counts = self._count_relationships()
+        top_degrees = {}
+        for record in db.execute_query(TOP_DEGREES_QUERY, {"limit": self.top_k}):
+            node = self._format_degree(record)
+            top_degrees[node["id"]] = node
+
+        with self._lock:
+            self._total_nodes = total_nodes
+            self._label_counts = label_counts
+            self._relationship_counts = relationship_counts
+            self._top_degrees = top_degrees
+            self._relationships_changed = False
+            self._pending_degrees.clear()
+            self._changed_since_reconcile = False
+            self._loaded = True
+            self.reconciled_at = time.time()
+
+    def _count_relationships(self) -> Dict[str, int]:
+        """Read the number of relationships of every type from the count store"""
+        counts = {}
+        for record in db.execute_query(RELATIONSHIP_TYPES_QUERY):
+            relationship_type = record["relationship_type"]
+            count = db.execute_query(RELATIONSHIP_COUNT_QUERY.format(relationship_type=relationship_type))[0]["count"]
+            if count:
+                counts[relationship_type] = count
+        return counts
+
+    def _refresh_degrees(self, node_ids: List[str]) -> None:
+        """Re-read the degrees of the given nodes and update the top k"""
+        for start in range(0, len(node_ids), DEGREE_BATCH_SIZE):
+            records = db.execute_query(NODE_DEGREES_QUERY, {"ids": node_ids[start:start + DEGREE_BATCH_SIZE]})
+            with self._lock:
+                for record in records:
+                    node = self._format_degree(record)
+                    if node["id"] in self._top_degrees or len(self._top_degrees) < self.top_k:
+                        self._top_degrees[node["id"]] = node
+                        continue
+                    # O(k): replace the weakest entry if the node now beats it
+                    weakest = min(self._top_degrees.values(), key=lambda entry: entry["connection_count"])
+                    if node["connection_count"] > weakest["connection_count"]:
+                        del self._top_degrees[weakest["id"]]
+                        self._top_degrees[node["id"]] = node
+
+    @staticmethod
+    def _format_degree(record) -> Dict[str, Any]:
+        return {
+            "id": record["node_id"],
+            "name": record["node_name"] if record["node_name"] is not None else record["node_id"],
+            "type": record["node_type"][0] if record["node_type"] else "Unknown",
+            "connection_count": record["connection_count"]
+        }
+
+    def _start_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="graph-statistics", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        """Apply pending updates in the background"""
+        while True:
+            self._wakeup.wait(timeout=self.reconcile_interval)
+            self._wakeup.clear()
+            try:
+                with self._lock:
+                    due = self._changed_since_reconcile and (
+                        self.reconciled_at is None or time.time() - self.reconciled_at >= self.reconcile_interval
+                    )
+                    relationships_changed = self._relationships_changed
+                    self._relationships_changed = False
+                    node_ids = list(self._pending_degrees)
+                    self._pending_degrees.clear()
+                if due:
+                    self.reconcile()
+                    continue
+                if relationships_changed:
+                    counts = self._count_relationships()
+                    with self._lock:
+                        self._relationship_counts = counts
+                if node_ids:
+                    self._refresh_degrees(node_ids)
+            except Exception as e:
+                print(f"Error updating graph statistics: {e}")
+                with self._lock:
+                    # Recount from scratch once the database is reachable again
+                    self._changed_since_reconcile = True
+                    self.reconciled_at = None
+
+# Create a singleton instance
+graph_statistics = GraphStatistics(
+    int(os.getenv("METRICS_TOP_K", "5")),
+    float(os.getenv("METRICS_RECONCILE_INTERVAL", "300"))
+)
@@ -0,0 +1,311 @@
+"""
+Time-ordered view of the transactions in a GraphProjection, for tracing money flows
+
+Transactions are indexed by sender and by receiver, each sorted by time, so the
+transactions of any user within a time range are found by binary search. To
+search the ranges of many users at once, entries are keyed by (user, time rank)
+packed into a single int64, where the time rank is the position of the
+timestamp among all distinct timestamps; this keeps comparisons exact.
+"""
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.algorithms import shared_arrays
+from app.services.projection import GraphProjection
+
+class TemporalIndex:
+    """
+    Transactions of every user sorted by time
+
+    Transaction and user numbers are projection node indices. Transactions
+    without a timestamp, sender or receiver are left out.
+    """
+
+    def __init__(self, projection: GraphProjection):
+        num_nodes = projection.num_nodes
+        senders = np.full(num_nodes, -1, dtype=np.int64)
+        receivers = np.full(num_nodes, -1, dtype=np.int64)
+        sent = projection.type_mask(["SENT"])
+        received = projection.type_mask(["RECEIVED_BY"])
+        senders[projection.out_targets[sent]] = projection.sources[sent]
+        receivers[projection.sources[received]] = projection.out_targets[received]
+
+        self.transactions = np.flatnonzero((senders >= 0) & (receivers >= 0) & np.isfinite(projection.timestamps))
+        self.senders = senders
+        self.receivers = receivers
+        self.times = projection.timestamps
+        self.amounts = projection.amounts
+        self.num_nodes = num_nodes
+
+        # Distinct timestamps; keys pack (user, rank of the timestamp)
+        self.distinct_times, ranks = np.unique(self.times[self.transactions], return_inverse=True)
+        ranks = ranks.ravel().astype(np.int64)
+        self._stride = len(self.distinct_times) + 1
+        self.by_sender, self._sender_keys = self._sorted(senders[self.transactions], ranks)
+        self.by_receiver, self._receiver_keys = self._sorted(receivers[self.transactions], ranks)
+
+    # Arrays that make up the index, for sharing it with worker processes
+    ARRAYS = ("transactions", "senders", "receivers", "times", "amounts", "distinct_times",
+              "by_sender", "_sender_keys", "by_receiver", "_receiver_keys")
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "TemporalIndex":
+        """Rebuild an index from the arrays of another one, without copying them"""
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index.num_nodes = len(index.senders)
+        index._stride = len(index.distinct_times) + 1
+        return index
+
+    def _sorted(self, users: np.ndarray, ranks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        keys = users * self._stride + ranks
+        order = np.argsort(keys, kind="stable")
+        return self.transactions[order], keys[order]
+
+    def _time_rank(self, times: np.ndarray, inclusive_end: bool) -> np.ndarray:
+        """Rank bound of times: entries at or after (or with inclusive_end, up to) a time"""
+        return np.searchsorted(self.distinct_times, times, side="right" if inclusive_end else "left")
+
+    def ranges(self, users: np.ndarray, start: np.ndarray, end: np.ndarray,
+               outgoing: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Transactions of each user with start <= timestamp <= end
+
+        Args:
+            users: User node indices
+            start, end: Time bounds, one per user
+            outgoing: Search the transactions users sent rather than received
+
+        Returns:
+            (transactions, origins): the matching transactions, in time order per
+            user, and the position in users of the user each one belongs to
+        """
+        keys = self._sender_keys if outgoing else self._receiver_keys
+        entries = self.by_sender if outgoing else self.by_receiver
+        lows = np.searchsorted(keys, users * self._stride + self._time_rank(start, False))
+        highs = np.searchsorted(keys, users * self._stride + self._time_rank(end, True))
+        counts = highs - lows
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        run_starts = np.cumsum(counts) - counts
+        positions = np.repeat(lows - run_starts, counts) + np.arange(total, dtype=np.int64)
+        return entries[positions], np.repeat(np.arange(len(users)), counts)
+
+def trace(index: TemporalIndex, roots: np.ndarray, forward: bool, max_hops: int, window: float,
+          min_ratio: float, max_ratio: Optional[float], limit: int) -> Tuple[Dict[int, Tuple[int, int]], bool]:
+    """
+    Follow funds from root transactions along time-respecting paths
+
+    Forward, a transaction leads to the transactions its receiver sent at or
+    after it and at most window seconds later; backward, to the transactions its
+    sender received at most window seconds before it. A hop is only followed
+    when the later transaction's amount is between min_ratio and max_ratio
+    times the earlier one's, so that unrelated payments of a very different
+    size are pruned. Levels are expanded with whole-array operations, and every
+    transaction is visited once, since what it leads to depends only on its own
+    timestamp and amount.
+
+    Args:
+        roots: Transactions at hop 0
+        max_hops: Number of hops to follow from the roots
+        limit: Maximum number of transactions reached, roots included
+
+    Returns:
+        (reached, truncated): {transaction: (hop, transaction it was first
+        reached from, or -1 for roots)} and whether limit cut the trace short
+    """
+    reached = {int(transaction): (0, -1) for transaction in roots[:limit]}
+    truncated = len(roots) > limit
+    visited = np.zeros(index.num_nodes, dtype=bool)
+    frontier = np.asarray(roots[:limit], dtype=np.int64)
+    visited[frontier] = True
+
+    for hop in range(1, max_hops + 1):
+        if len(frontier) == 0 or truncated:
+            break
+        times = index.times[frontier]
+        if forward:
+            candidates, origins = index.ranges(index.receivers[frontier], times, times + window, outgoing=True)
+        else:
+            candidates, origins = index.ranges(index.senders[frontier], times - window, times, outgoing=False)
+        earlier, later = (frontier[origins], candidates) if forward else (candidates, frontier[origins])
+        ratios = index.amounts[later] / index.amounts[earlier]
+        keep = ~visited[candidates] & (ratios >= min_ratio)
+        if max_ratio is not None:
+            keep &= ratios <= max_ratio
+        candidates, origins = candidates[keep], origins[keep]
+
+        # A transaction reached from several others keeps the first one
+        candidates, first = np.unique(candidates, return_index=True)
+        parents = frontier[origins[first]]
+        room = limit - len(reached)
+        if len(candidates) > room:
+            # Keep the transactions closest in time to the roots' side of the trace
+            order = np.argsort(index.times[candidates] if forward else -index.times[candidates], kind="stable")[:room]
+            candidates, parents = candidates[order], parents[order]
+            truncated = True
+        visited[candidates] = True
+        reached.update(zip(candidates.tolist(), ((hop, parent) for parent in parents.tolist())))
+        frontier = candidates
+    return reached, truncated
+
+def format_trace(projection: GraphProjection, index: TemporalIndex,
+                 reached: Dict[int, Tuple[int, int]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Transactions and accounts of a trace
+
+    Returns:
+        (transactions, accounts): the transactions in order of hop and time, and
+        every sender or receiver involved with the earliest hop it appears at and
+        the total amount it sent and received within the trace
+    """
+    transactions = []
+    accounts: Dict[int, Dict[str, Any]] = {}
+    for transaction, (hop, parent) in sorted(reached.items(), key=lambda item: (item[1][0], index.times[item[0]])):
+        sender, receiver = int(index.senders[transaction]), int(index.receivers[transaction])
+        amount = float(index.amounts[transaction])
+        transactions.append({
+            "id": projection.node_ids[transaction],
+            "hop": hop,
+            "sender_id": projection.node_ids[sender],
+            "receiver_id": projection.node_ids[receiver],
+            "amount": amount,
+            "timestamp": datetime.fromtimestamp(float(index.times[transaction]), timezone.utc),
+            "reached_from_id": projection.node_ids[parent] if parent >= 0 else None
+        })
+        for user, key in ((sender, "sent"), (receiver, "received")):
+            account = accounts.setdefault(user, {"id": projection.node_ids[user], "hop": hop, "sent": 0.0, "received": 0.0})
+            account[key] += amount
+    return transactions, sorted(accounts.values(), key=lambda account: (account["hop"], account["id"]))
+
+class _UserTransactions:
+    """
+    Transactions of single users in time order, for search loops in plain Python
+
+    Depth-first searches look up one user at a time, where bisect over
+    array.array copies of the index is much faster than NumPy calls and, unlike
+    lists, costs no more memory than the NumPy arrays themselves.
+    """
+
+    def __init__(self, index: TemporalIndex, outgoing: bool):
+        keys = index._sender_keys if outgoing else index._receiver_keys
+        entries = index.by_sender if outgoing else index.by_receiver
+        self.entries = array("q", entries.astype(np.int64).tobytes())
+        self.times = array("d", index.times[entries].astype(np.float64).tobytes())
+        self.offsets = array("q", np.searchsorted(keys, np.arange(index.num_nodes + 1) * index._stride)
+                             .astype(np.int64).tobytes())
+
+    def between(self, user: int, start: float, end: float) -> array:
+        """Transactions of user with start <= timestamp <= end"""
+        low, high = self.offsets[user], self.offsets[user + 1]
+        low = bisect_left(self.times, start, low, high)
+        return self.entries[low:bisect_right(self.times, end, low, high)]
+
+def _distances_to(received: _UserTransactions, senders: List[int], user: int, start: float, end: float,
+                  max_hops: int) -> Dict[int, int]:
+    """Fewest transactions within [start, end] needed to send money from each user to user, up to max_hops"""
+    distances = {user: 0}
+    frontier = [user]
+    for hop in range(1, max_hops + 1):
+        found = []
+        for current in frontier:
+            for transaction in received.between(current, start, end):
+                sender = senders[transaction]
+                if sender not in distances:
+                    distances[sender] = hop
+                    found.append(sender)
+        frontier = found
+    return distances
+
+def find_cycles(index: TemporalIndex, start_users: Iterable[int], max_length: int, max_span: float,
+                max_cycles: int) -> Tuple[List[List[int]], bool]:
+    """
+    Enumerate time-respecting cycles of transactions starting at the given users
+
+    A cycle is a chain of at most max_length transactions between distinct
+    users that returns to its first sender, where each transaction happens no
+    earlier than the one before it and the last one at most max_span seconds
+    after the first. Every cycle is reported once, from its earliest
+    transaction, and only by the sender of that transaction, so start users can
+    be split freely between workers. When the last transaction is later than the
+    first, no other rotation of the cycle is in time order; when all of them
+    happen at the same time, the rotation starting at the lowest transaction
+    number is reported.
+
+    The search is a depth-first enumeration of simple paths, like Johnson's
+    algorithm but bounded by length and time: before searching from a
+    transaction, a backward search finds how many transactions each user needs to get money
+    back to it within the time range, and paths that cannot close within the
+    remaining length are cut. The backward search runs per first transaction,
+    within the time range of its cycles, and stops one level short of
+    max_length - 1, the level that would only prune the first hop, since that
+    last level is by far the largest.
+
+    Returns:
+        (cycles, truncated): cycles as lists of transactions in time order, and
+        whether max_cycles was reached
+    """
+    times = index.times.tolist()
+    senders = index.senders.tolist()
+    receivers = index.receivers.tolist()
+    sent = _UserTransactions(index, outgoing=True)
+    received = _UserTransactions(index, outgoing=False)
+    cycles: List[List[int]] = []
+
+    for user in start_users:
+        for first in sent.between(user, -math.inf, math.inf):
+            first_time = times[first]
+            end = first_time + max_span
+            receiver = receivers[first]
+            if receiver == user:
+                continue
+            candidates = sent.between(receiver, first_time, end)
+            if not candidates:
+                continue
+            distances = _distances_to(received, senders, user, first_time, end, max_length - 2)
+            # Depth-first search; each frame is (user, transactions it can send next, next one to try)
+            path = [first]
+            on_path = {user, receiver}
+            stack = [(receiver, candidates, 0)]
+            while stack:
+                current, candidates, position = stack[-1]
+                if position == len(candidates):
+                    stack.pop()
+                    on_path.discard(current)
+                    path.pop()
+                    continue
+                stack[-1] = (current, candidates, position + 1)
+                transaction = candidates[position]
+                following = receivers[transaction]
+                if following == user:
+                    # Only the rotation starting at first is in time order, unless every
+                    # transaction ties with it; then report the one starting at the lowest
+                    if times[transaction] == first_time and first > min(path[1:] + [transaction], default=first):
+                        continue
+                    cycles.append(path + [transaction])
+                    if len(cycles) >= max_cycles:
+                        return cycles, True
+                    continue
+                length = len(path) + 1
+                if following in on_path or distances.get(following, max_length) > max_length - length:
+                    continue
+                path.append(transaction)
+                on_path.add(following)
+                stack.append((following, sent.between(following, times[transaction], end), 0))
+    return cycles, False
+
+def cycles_chunk(arguments: Tuple[List[int], int, float, int]) -> Tuple[List[List[int]], bool]:
+    """map_shared entry point: find_cycles over the index arrays shared with the worker"""
+    start_users, max_length, max_span, max_cycles = arguments
+    return find_cycles(TemporalIndex.from_arrays(shared_arrays), start_users, max_length, max_span, max_cycles)
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+class _Window:
+    """
+    Sliding-window counters of one account in one direction
+
+    The window is a ring of num_buckets time buckets holding the number of
+    transactions, their total amount and the counterparties seen in each.
+    Running totals over the ring are kept up to date as buckets are filled and
+    evicted, so reading them never scans the ring.
+    """
+
+    __slots__ = ("latest", "counts", "amounts", "parties", "count", "amount", "distinct")
+
+    def __init__(self, num_buckets: int, bucket: int):
+        self.latest = bucket
+        self.counts = array("l", bytes(8 * num_buckets))
+        self.amounts = array("d", bytes(8 * num_buckets))
+        # Counterparties per bucket, and the number of transactions with each over the window
+        self.parties: List[Optional[List[str]]] = [None] * num_buckets
+        self.count = 0
+        self.amount = 0.0
+        self.distinct: Dict[str, int] = {}
+
+    def advance(self, bucket: int) -> None:
+        """Slide the window forward so that it ends at bucket, evicting the buckets that fall out"""
+        if bucket <= self.latest:
+            return
+        num_buckets = len(self.counts)
+        for expired in range(self.latest + 1, min(bucket, self.latest + num_buckets) + 1):
+            slot = expired % num_buckets
+            self.count -= self.counts[slot]
+            self.amount -= self.amounts[slot]
+            self.counts[slot] = 0
+            self.amounts[slot] = 0.0
+            for party in self.parties[slot] or ():
+                remaining = self.distinct[party] - 1
+                if remaining:
+                    self.distinct[party] = remaining
+                else:
+                    del self.distinct[party]
+            self.parties[slot] = None
+        if not self.count:
+            # Avoid drift from floating-point subtraction once the window is empty
+            self.amount = 0.0
+        self.latest = bucket
+
+    def add(self, bucket: int, amount: float, party: str) -> None:
+        """Count a transaction in bucket, which must lie within the window"""
+        slot = bucket % len(self.counts)
+        self.counts[slot] += 1
+        self.amounts[slot] += amount
+        if self.parties[slot] is None:
+            self.parties[slot] = []
+        self.parties[slot].append(party)
+        self.count += 1
+        self.amount += amount
+        self.distinct[party] = self.distinct.get(party, 0) + 1
+
+class VelocityTracker:
+    """
+    Per-account transaction velocity over a sliding time window
+
+    The write paths report every transaction they create, and each account
+    keeps time-bucketed ring buffers (see _Window) of what it sent and what it
+    received. Reading an account's stats only slides its windows up to the
+    current bucket, which touches at most num_buckets buckets however busy the
+    account is. Accounts whose count, amount or number of distinct
+    counterparties in either direction exceeds a threshold are flagged until
+    they fall back under it.
+
+    Windows follow the wall clock: transactions are placed by their timestamp,
+    those that are already out of the window are not counted, and timestamps
+    in the future count as now. Like the graph version, the tracker only sees
+    the writes served by its own process and starts empty.
+    """
+
+    def __init__(self, window: float = 3600.0, bucket_seconds: float = 60.0, max_count: int = 20,
+                 max_amount: float = 10000.0, max_counterparties: int = 10,
+                 clock: Callable[[], float] = time.time):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = max(1, int(round(window / bucket_seconds)))
+        self.max_count = max_count
+        self.max_amount = max_amount
+        self.max_counterparties = max_counterparties
+        self.clock = clock
+        self._windows: Dict[str, Tuple[_Window, _Window]] = {}
+        self._flagged: Dict[str, float] = {}
+        self._records_since_sweep = 0
+        self._lock = threading.Lock()
+
+    def record(self, transactions: Iterable[Tuple[str, str, float, float]]) -> None:
+        """
+        Count transactions given as (sender_id, receiver_id, amount, timestamp) tuples,
+        with timestamps in seconds since the epoch
+        """
+        with self._lock:
+            current = self._bucket(self.clock())
+            for sender_id, receiver_id, amount, timestamp in transactions:
+                bucket = min(self._bucket(timestamp), current)
+                if bucket <= current - self.num_buckets:
+                    continue
+                self._add(sender_id, 0, bucket, current, amount, receiver_id)
+                self._add(receiver_id, 1, bucket, current, amount, sender_id)
+                self._records_since_sweep += 1
+            if self._records_since_sweep >= max(1024, len(self._windows)):
+                self._sweep(current)
+
+    def get_stats(self, user_id: str) -> Dict[str, Any]:
+        """Return the current window stats of an account, with zeros if it has no recent transactions"""
+        with self._lock:
+            stats = self._stats(user_id, self._bucket(self.clock()))
+        stats["user_id"] = user_id
+        return stats
+
+    def get_flagged(self) -> List[Dict[str, Any]]:
+        """Return the stats of the accounts currently over a threshold, most recently flagged first"""
+        with self._lock:
+            current = self._bucket(self.clock())
+            flagged = []
+            for user_id, flagged_at in list(self._flagged.items()):
+                stats = self._stats(user_id, current)
+                if stats["flagged"]:
+                    stats["user_id"] = user_id
+                    flagged.append(stats)
+        flagged.sort(key=lambda stats: (-stats["flagged_at"], stats["user_id"]))
+        return flagged
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def _add(self, user_id: str, direction: int, bucket: int, current: int, amount: float, party: str) -> None:
+        windows = self._windows.get(user_id)
+        if windows is None:
+            windows = self._windows[user_id] = (_Window(self.num_buckets, current), _Window(self.num_buckets, current))
+        window = windows[direction]
+        window.advance(current)
+        window.add(bucket, amount, party)
+        if user_id not in self._flagged and (window.count > self.max_count or window.amount > self.max_amount
+                                             or len(window.distinct) > self.max_counterparties):
+            self._flagged[user_id] = self.clock()
+
+    def _exceeded(self, window: _Window) -> List[str]:
+        """Names of the thresholds a window is over"""
+        exceeded = []
+        if window.count > self.max_count:
+            exceeded.append("count")
+        if window.amount > self.max_amount:
+            exceeded.append("amount")
+        if len(window.distinct) > self.max_counterparties:
+            exceeded.append("counterparties")
+        return exceeded
+
+    def _stats(self, user_id: str, current: int) -> Dict[str, Any]:
+        windows = self._windows.get(user_id)
+        stats: Dict[str, Any] = {"window_seconds": self.num_buckets * self.bucket_seconds}
+        exceeded = []
+        for direction, name in enumerate(("sent", "received")):
+            if windows is None:
+                stats[name] = {"count": 0, "amount": 0.0, "counterparties": 0}
+                continue
+            window = windows[direction]
+            window.advance(current)
+            stats[name] = {"count": window.count, "amount": window.amount, "counterparties": len(window.distinct)}
+            exceeded.extend(f"{name}_{threshold}" for threshold in self._exceeded(window))
+        if not exceeded:
+            self._flagged.pop(user_id, None)
+        stats["flagged"] = bool(exceeded)
+        stats["exceeded"] = exceeded
+        stats["flagged_at"] = self._flagged.get(user_id)
+        return stats
+
+    def _sweep(self, current: int) -> None:
+        """Drop the windows of accounts without transactions in the window"""
+        self._records_since_sweep = 0
+        idle = [user_id for user_id, windows in self._windows.items()
+                if all(window.latest <= current - self.num_buckets or not window.count for window in windows)]
+        for user_id in idle:
+            del self._windows[user_id]
+            self._flagged.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the configuration and the number of tracked and flagged accounts"""
+        with self._lock:
+            return {
+                "window_seconds": self.num_buckets * self.bucket_seconds,
+                "bucket_seconds": self.bucket_seconds,
+                "thresholds": {
+                    "count": self.max_count,
+                    "amount": self.max_amount,
+                    "counterparties": self.max_counterparties
+                },
+                "tracked_accounts": len(self._windows),
+                "flagged_accounts": len(self._flagged)
+            }
+
+# Create a singleton instance
+velocity_tracker = VelocityTracker(
+    float(os.getenv("VELOCITY_WINDOW", "3600")),
+    float(os.getenv("VELOCITY_BUCKET_SECONDS", "60")),
+    int(os.getenv("VELOCITY_MAX_COUNT", "20")),
+    float(os.getenv("VELOCITY_MAX_AMOUNT", "10000")),
+    int(os.getenv("VELOCITY_MAX_COUNTERPARTIES", "10"))
+)
@@ -50,6 +50,100 @@ def generate_random_payment_method():
     method_id = random.randint(1000, 9999)
     return f"{method_type}_{method_id}"
 
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William",
+               "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah",
+               "Charles", "Karen", "Daniel", "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Margaret",
+               "Steven", "Sandra", "Paul", "Ashley", "Andrew", "Emily", "Joshua", "Donna", "Kenneth", "Michelle"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+              "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore",
+              "Jackson", "Martin", "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez",
+              "Lewis", "Robinson", "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen"]
+
+# Full words of the abbreviations used by generate_random_address
+ADDRESS_WORDS = {"St": "Street", "Ave": "Avenue", "Rd": "Road", "Ln": "Lane", "Blvd": "Boulevard",
+                 "NY": "New York", "CA": "California", "IL": "Illinois", "TX": "Texas", "AZ": "Arizona"}
+
+def generate_random_name():
+    """Generate a random person name"""
+    return f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
+
+def vary_name(name):
+    """Write a name differently: change case, add a middle initial or make a typo"""
+    variation = random.choice(["case", "initial", "typo"])
+    if variation == "case":
+        return name.upper() if random.random() < 0.5 else name.lower()
+    if variation == "initial":
+        first, last = name.split(" ", 1)
+        return f"{first} {random.choice(string.ascii_uppercase)}. {last}"
+    position = random.randrange(1, len(name) - 1)
+    if name[position] == " " or name[position + 1] == " ":
+        return name[:position] + name[position + 1:]
+    # Swap two adjacent letters
+    return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+
+def vary_phone(phone):
+    """Format a +1 phone number differently"""
+    digits = phone[2:]
+    formats = [
+        f"+1-{digits[:3]}-{digits[3:6]}-{digits[6:]}",
+        f"({digits[:3]}) {digits[3:6]}-{digits[6:]}",
+        f"1.{digits[:3]}.{digits[3:6]}.{digits[6:]}",
+        f"{digits[:3]} {digits[3:6]} {digits[6:]}"
+    ]
+    return random.choice(formats)
+
+def vary_email(email):
+    """Write an email differently: change case or add a +tag"""
+    local, domain = email.split("@")
+    if random.random() < 0.5:
+        return f"{local.capitalize()}@{domain.upper()}"
+    return f"{local}+{generate_random_string(4)}@{domain}"
+
+def vary_address(address):
+    """Write an address differently: spell out abbreviations, change case or punctuation"""
+    words = address.replace(",", "").split()
+    if random.random() < 0.7:
+        words = [ADDRESS_WORDS.get(word, word) for word in words]
+    varied = " ".join(words)
+    return varied.upper() if random.random() < 0.3 else varied
+
+def generate_users_with_duplicates(num_users=100, duplicate_rate=0.2):
+    """
+    Generate individuals of whom some are registered twice, for evaluating entity resolution
+
+    A duplicate has a varied name and, independently, a reformatted or different
+    email and phone and a reformatted or different address, so that it often
+    shares no identical identifier with the original.
+
+    Returns:
+        (users, duplicate_pairs): duplicate_pairs holds (original ID, duplicate ID) tuples
+    """
+    users = []
+    duplicate_pairs = []
+    for i in range(num_users):
+        user = User(
+            id=f"user_{i+1}",
+            name=generate_random_name(),
+            email=generate_random_email(),
+            phone=generate_random_phone(),
+            address=generate_random_address(),
+            entity_type="individual"
+        )
+        users.append(user)
+        if random.random() >= duplicate_rate:
+            continue
+        duplicate = User(
+            id=f"user_{i+1}_dup",
+            name=vary_name(user.name),
+            email=vary_email(user.email) if random.random() < 0.6 else generate_random_email(),
+            phone=vary_phone(user.phone) if random.random() < 0.6 else None,
+            address=vary_address(user.address) if random.random() < 0.8 else generate_random_address(),
+            entity_type="individual"
+        )
+        users.append(duplicate)
+        duplicate_pairs.append((user.id, duplicate.id))
+    return users, duplicate_pairs
+
 def generate_users(num_users=10):
     """Generate random users"""
     users = []
@@ -243,6 +337,9 @@ def create_constraints():
     # Create constraint on Transaction.id
     db.execute_query("CREATE CONSTRAINT transaction_id IF NOT EXISTS FOR (t:Transaction) REQUIRE t.id IS UNIQUE")
     
+    # Create constraint on Identifier.id, which identifier nodes are merged on
+    db.execute_query("CREATE CONSTRAINT identifier_id IF NOT EXISTS FOR (i:Identifier) REQUIRE i.id IS UNIQUE")
+    
     # Create index on User.email
     db.execute_query("CREATE INDEX user_email IF NOT EXISTS FOR (u:User) ON (u.email)")
     
@@ -254,6 +351,19 @@ def create_constraints():
     
     # Create index on Transaction.device_id
     db.execute_query("CREATE INDEX transaction_device IF NOT EXISTS FOR (t:Transaction) ON (t.device_id)")
+    
+    # Create index on User.address
+    db.execute_query("CREATE INDEX user_address IF NOT EXISTS FOR (u:User) ON (u.address)")
+    
+    # Create index on User.parent_entity_id
+    db.execute_query("CREATE INDEX user_parent_entity IF NOT EXISTS FOR (u:User) ON (u.parent_entity_id)")
+    
+    # Create keyword full-text indexes for exact lookups of single values in User.payment_methods and User.directors
+    db.execute_query("CREATE FULLTEXT INDEX user_payment_methods IF NOT EXISTS FOR (u:User) ON EACH [u.payment_methods] OPTIONS {indexConfig: {`fulltext.analyzer`: 'keyword'}}")
+    db.execute_query("CREATE FULLTEXT INDEX user_directors IF NOT EXISTS FOR (u:User) ON EACH [u.directors] OPTIONS {indexConfig: {`fulltext.analyzer`: 'keyword'}}")
+    
+    # Create text index on User.shareholders for CONTAINS lookups of shareholder IDs
+    db.execute_query("CREATE TEXT INDEX user_shareholders IF NOT EXISTS FOR (u:User) ON (u.shareholders)")
 
 def generate_and_save_data(num_users=10, num_companies=5, num_transactions=20, detect_relationships=True):
     """Generate and save data to the database"""
@@ -264,21 +374,18 @@ def generate_and_save_data(num_users=10, num_companies=5, num_transactions=20, d
     
     # Generate users
     users = generate_users(num_users)
-    for user in users:
-        GraphOperations.create_user(user)
-        print(f"Created user: {user.name} (ID: {user.id})")
+    result = GraphOperations.create_users(users, detect_relationships=False)
+    print(f"Created {len(result['created'])} users ({len(result['failed'])} failed)")
     
     # Generate companies
     companies = generate_companies(num_companies, users)
-    for company in companies:
-        GraphOperations.create_user(company)
-        print(f"Created company: {company.name} (ID: {company.id})")
+    result = GraphOperations.create_users(companies, detect_relationships=False)
+    print(f"Created {len(result['created'])} companies ({len(result['failed'])} failed)")
     
     # Generate transactions
     transactions = generate_transactions(num_transactions, users, companies)
-    for transaction in transactions:
-        GraphOperations.create_transaction(transaction)
-        print(f"Created transaction: {transaction.id} (Amount: {transaction.amount} {transaction.currency})")
+    result = GraphOperations.create_transactions(transactions, detect_relationships=False)
+    print(f"Created {len(result['created'])} transactions ({len(result['failed'])} failed)")
     
     # Generate business relationships
     relationships = generate_business_relationships(users, companies)
@@ -42,6 +42,9 @@ def create_constraints():
     # Create constraint on Transaction.id
     db.execute_query("CREATE CONSTRAINT transaction_id IF NOT EXISTS FOR (t:Transaction) REQUIRE t.id IS UNIQUE")
 
+    # Create constraint on Identifier.id, which identifier nodes are merged on
+    db.execute_query("CREATE CONSTRAINT identifier_id IF NOT EXISTS FOR (i:Identifier) REQUIRE i.id IS UNIQUE")
+
     # Create index on User.email
     db.execute_query("CREATE INDEX user_email IF NOT EXISTS FOR (u:User) ON (u.email)")
 
@@ -54,6 +57,22 @@ def create_constraints():
     # Create index on Transaction.device_id
     db.execute_query("CREATE INDEX transaction_device IF NOT EXISTS FOR (t:Transaction) ON (t.device_id)")
 
+    # Create index on User.address
+    db.execute_query("CREATE INDEX user_address IF NOT EXISTS FOR (u:User) ON (u.address)")
+
+    # Create index on User.parent_entity_id
+    db.execute_query("CREATE INDEX user_parent_entity IF NOT EXISTS FOR (u:User) ON (u.parent_entity_id)")
+
+    # Create keyword full-text indexes for exact lookups of single values in User.payment_methods and User.directors
+    db.execute_query("CREATE FULLTEXT INDEX user_payment_methods IF NOT EXISTS FOR (u:User) ON EACH [u.payment_methods] OPTIONS {indexConfig: {`fulltext.analyzer`: 'keyword'}}")
+    db.execute_query("CREATE FULLTEXT INDEX user_directors IF NOT EXISTS FOR (u:User) ON EACH [u.directors] OPTIONS {indexConfig: {`fulltext.analyzer`: 'keyword'}}")
+
+    # Create text index on User.shareholders for CONTAINS lookups of shareholder IDs
+    db.execute_query("CREATE TEXT INDEX user_shareholders IF NOT EXISTS FOR (u:User) ON (u.shareholders)")
+
+    # Create index on User.entity_type
+    db.execute_query("CREATE INDEX user_entity_type IF NOT EXISTS FOR (u:User) ON (u.entity_type)")
+
 def create_test_users():
     """Create test users (individuals)"""
     users = [
@@ -104,10 +123,10 @@ def create_test_users():
         )
     ]
 
-    created_users = []
-    for user in users:
-        GraphOperations.create_user(user)
-        created_users.append(user)
+    result = GraphOperations.create_users(users, detect_relationships=False)
+    created_ids = set(result["created"])
+    created_users = [user for user in users if user.id in created_ids]
+    for user in created_users:
         print(f"Created user: {user.name} (ID: {user.id})")
 
     return created_users
@@ -175,10 +194,10 @@ def create_test_business_entities():
         )
     ]
 
-    created_entities = []
-    for entity in business_entities:
-        GraphOperations.create_user(entity)
-        created_entities.append(entity)
+    result = GraphOperations.create_users(business_entities, detect_relationships=False)
+    created_ids = set(result["created"])
+    created_entities = [entity for entity in business_entities if entity.id in created_ids]
+    for entity in created_entities:
         print(f"Created business entity: {entity.name} (ID: {entity.id})")
 
     return created_entities
@@ -286,10 +305,10 @@ def create_test_transactions(_):
         )
     ]
 
-    created_transactions = []
-    for transaction in transactions:
-        GraphOperations.create_transaction(transaction)
-        created_transactions.append(transaction)
+    result = GraphOperations.create_transactions(transactions, detect_relationships=False)
+    created_ids = set(result["created"])
+    created_transactions = [transaction for transaction in transactions if transaction.id in created_ids]
+    for transaction in created_transactions:
         print(f"Created transaction: {transaction.id} (Amount: {transaction.amount} {transaction.currency})")
 
     return created_transactions
@@ -52,3 +52,23 @@ def serialize_neo4j_object(obj: Any) -> Any:
     else:
         # Return other types as is
         return obj
+
+def convert_neo4j_types(obj: Any) -> Any:
+    """
+    Recursively convert Neo4j and Python date/time values to JSON-friendly strings
+    """
+    if isinstance(obj, DateTime):
+        # Convert Neo4j DateTime to string
+        return f"{obj.year}-{obj.month:02d}-{obj.day:02d}T{obj.hour:02d}:{obj.minute:02d}:{obj.second:02d}"
+    elif isinstance(obj, datetime):
+        # Convert Python datetime to string
+        return obj.isoformat()
+    elif isinstance(obj, dict):
+        # Recursively convert dictionary values
+        return {key: convert_neo4j_types(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        # Recursively convert list items
+        return [convert_neo4j_types(item) for item in obj]
+    else:
+        # Return other types as is
+        return obj
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import zipfile
+from datetime import date, datetime
+from typing import Any, AsyncIterable, Iterable, Iterator, AsyncIterator, List, Tuple
+
+def json_default(obj: Any) -> Any:
+    """
+    Fallback for json.dumps that converts date/time values to ISO strings
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "iso_format"):
+        # Neo4j temporal types
+        return obj.iso_format()
+    return str(obj)
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize an object to a compact JSON string
+    """
+    return json.dumps(obj, default=json_default, separators=(",", ":"))
+
+def iter_json_array(items: Iterable[Any]) -> Iterator[str]:
+    """
+    Encode items as a JSON array one element at a time
+    """
+    yield "["
+    separator = ""
+    for item in items:
+        yield separator + dumps(item)
+        separator = ","
+    yield "]"
+
+async def aiter_json_array(items: AsyncIterable[Any]) -> AsyncIterator[str]:
+    """
+    Encode items from an async iterable as a JSON array one element at a time
+    """
+    yield "["
+    separator = ""
+    async for item in items:
+        yield separator + dumps(item)
+        separator = ","
+    yield "]"
+
+async def aiter_ndjson(items: AsyncIterable[Any]) -> AsyncIterator[str]:
+    """
+    Encode items from an async iterable as newline-delimited JSON
+    """
+    async for item in items:
+        yield dumps(item) + "\n"
+
+def csv_value(value: Any) -> Any:
+    """
+    Convert a property value into a single CSV cell
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return dumps(value)
+    if isinstance(value, (datetime, date)) or hasattr(value, "iso_format"):
+        return json_default(value)
+    return value
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Unseekable write-only file that collects written bytes until drained
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def iter_csv_zip(files: Iterable[Tuple[str, List[str], Iterable[List[Any]]]],
+                 flush_rows: int = 1000) -> Iterator[bytes]:
+    """
+    Stream a ZIP archive of CSV files without buffering the archive in memory
+
+    Args:
+        files: (file name, header row, rows) for each CSV file in the archive
+        flush_rows: Number of rows written between yields of compressed bytes
+
+    Yields:
+        Chunks of the ZIP archive
+    """
+    sink = _ChunkSink()
+    # An unseekable sink makes zipfile write data descriptors after each entry
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, header, rows in files:
+            with archive.open(name, "w", force_zip64=True) as entry:
+                text = io.TextIOWrapper(entry, encoding="utf-8", newline="")
+                writer = csv.writer(text)
+                writer.writerow(header)
+                for count, row in enumerate(rows, start=1):
+                    writer.writerow(row)
+                    if count % flush_rows == 0:
+                        text.flush()
+                        yield sink.drain()
+                text.flush()
+                text.detach()
+            yield sink.drain()
+    yield sink.drain()
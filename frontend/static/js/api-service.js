@@ -94,6 +94,36 @@ class ApiService {
         }
     }
 
+    /**
+     * Fetch the subgraph around a user or transaction
+     * @param {string} nodeId - The ID of the node at the center
+     * @param {number} depth - Maximum number of hops from the center
+     * @param {number} limit - Maximum number of nodes, including the center
+     * @param {Array<string>} relationshipTypes - Optional array of relationship types to follow
+     * @returns {Promise<Object>} Cytoscape nodes and edges, and whether the result was truncated
+     */
+    async getNeighborhood(nodeId, depth = 2, limit = 200, relationshipTypes = null) {
+        try {
+            let url = `${this.config.BASE_URL}${this.config.NEIGHBORHOOD}${encodeURIComponent(nodeId)}?depth=${depth}&limit=${limit}`;
+
+            // Add relationship types if provided
+            if (relationshipTypes && relationshipTypes.length > 0) {
+                relationshipTypes.forEach(type => {
+                    url += `&types=${encodeURIComponent(type)}`;
+                });
+            }
+
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`HTTP error! Status: ${response.status}`);
+            }
+            return await response.json();
+        } catch (error) {
+            console.error('Error fetching neighborhood:', error);
+            throw error;
+        }
+    }
+
     /**
      * Trigger relationship detection on the server
      * @returns {Promise<Object>} Response from the server
@@ -11,6 +11,7 @@ const CONFIG = {
         TRANSACTION_RELATIONSHIPS: '/relationships/transaction/',
         BUSINESS_RELATIONSHIPS: '/business-relationships/user/',
         DETECT_RELATIONSHIPS: '/detect-relationships',
+        NEIGHBORHOOD: '/graph-data/neighborhood/',
 
         // Analytics endpoints
         SHORTEST_PATH: '/analytics/shortest-path',
@@ -26,9 +27,13 @@ const CONFIG = {
     NODE_TYPES: {
         USER: 'user',
         COMPANY: 'company',
-        TRANSACTION: 'transaction'
+        TRANSACTION: 'transaction',
+        IDENTIFIER: 'identifier'
     },
 
+    // ID prefixes of identifier nodes (shared email, phone, payment method, IP and device)
+    IDENTIFIER_ID_PREFIXES: ['email:', 'phone:', 'paymentmethod:', 'ip:', 'device:'],
+
     // Relationship types
     RELATIONSHIP_TYPES: {
         // Business relationships
@@ -45,6 +50,13 @@ const CONFIG = {
         SHARED_ADDRESS: 'SHARED_ADDRESS',
         SHARED_PAYMENT_METHOD: 'SHARED_PAYMENT_METHOD',
 
+        // Links to identifier nodes
+        HAS_EMAIL: 'HAS_EMAIL',
+        HAS_PHONE: 'HAS_PHONE',
+        HAS_PAYMENT_METHOD: 'HAS_PAYMENT_METHOD',
+        USED_IP: 'USED_IP',
+        USED_DEVICE: 'USED_DEVICE',
+
         // Transaction relationships
         SENT: 'SENT',
         RECEIVED_BY: 'RECEIVED_BY',
@@ -58,8 +70,9 @@ const CONFIG = {
         SHAREHOLDER: ['SHAREHOLDER_OF'],
         LEGAL_ENTITY: ['LEGAL_ENTITY_OF'],
         COMPOSITE: ['COMPOSITE'],
-        SHARED_ATTRIBUTES: ['SHARED_EMAIL', 'SHARED_PHONE', 'SHARED_ADDRESS', 'SHARED_PAYMENT_METHOD'],
-        TRANSACTION: ['SENT', 'RECEIVED_BY', 'LINKED_TO']
+        SHARED_ATTRIBUTES: ['SHARED_EMAIL', 'SHARED_PHONE', 'SHARED_ADDRESS', 'SHARED_PAYMENT_METHOD',
+                            'HAS_EMAIL', 'HAS_PHONE', 'HAS_PAYMENT_METHOD'],
+        TRANSACTION: ['SENT', 'RECEIVED_BY', 'LINKED_TO', 'USED_IP', 'USED_DEVICE']
     },
 
     // Graph layout options
@@ -72,6 +72,17 @@ const GRAPH_STYLES = [
         }
     },
 
+    // Identifier Node Style
+    {
+        selector: 'node[type="identifier"]',
+        style: {
+            'background-color': '#9e9e9e',
+            'text-outline-color': '#9e9e9e',
+            'shape': 'hexagon',
+            'font-size': '10px'
+        }
+    },
+
     // Highlighted Node Style
     {
         selector: 'node.highlighted',
@@ -180,6 +191,17 @@ const GRAPH_STYLES = [
         }
     },
 
+    // Identifier Relationship Styles
+    {
+        selector: 'edge[type="HAS_EMAIL"], edge[type="HAS_PHONE"], edge[type="HAS_PAYMENT_METHOD"], edge[type="USED_IP"], edge[type="USED_DEVICE"]',
+        style: {
+            'line-color': '#9e9e9e',
+            'target-arrow-color': '#9e9e9e',
+            'line-style': 'dotted',
+            'width': 2
+        }
+    },
+
     // Transaction Relationship Styles
     {
         selector: 'edge[type="SENT"]',
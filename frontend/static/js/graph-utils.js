@@ -5,7 +5,7 @@ class GraphUtils {
     /**
      * Determine the node type based on entity properties
      * @param {Object} entity - The entity object
-     * @returns {string} The node type (user, company, transaction)
+     * @returns {string} The node type (user, company, transaction, identifier)
      */
     static getNodeType(entity) {
         // First, check for explicit type if it exists
@@ -13,6 +13,12 @@ class GraphUtils {
             return entity.type;
         }
 
+        // Identifier nodes hold a value and have an ID prefixed with their kind
+        if (entity.id && entity.value !== undefined &&
+            CONFIG.IDENTIFIER_ID_PREFIXES.some(prefix => entity.id.startsWith(prefix))) {
+            return CONFIG.NODE_TYPES.IDENTIFIER;
+        }
+
         // Check for transaction-specific properties
         if (entity.amount !== undefined && (entity.sender_id !== undefined || entity.receiver_id !== undefined)) {
             return CONFIG.NODE_TYPES.TRANSACTION;
@@ -65,6 +71,8 @@ class GraphUtils {
             }
         } else if (this.getNodeType(entity) === CONFIG.NODE_TYPES.COMPANY) {
             return entity.company_name || entity.name;
+        } else if (this.getNodeType(entity) === CONFIG.NODE_TYPES.IDENTIFIER) {
+            return String(entity.value);
         } else {
             return entity.name;
         }
@@ -84,6 +92,8 @@ class GraphUtils {
             return Math.min(Math.max(30 + Math.log10(amount) * 10, 30), 80);
         } else if (type === CONFIG.NODE_TYPES.COMPANY) {
             return 60;
+        } else if (type === CONFIG.NODE_TYPES.IDENTIFIER) {
+            return 25;
         } else {
             return 40;
         }
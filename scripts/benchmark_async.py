@@ -0,0 +1,94 @@
+"""
+Benchmark lookup latency while heavy analytics queries run concurrently.
+
+Sends a steady stream of /api/relationships/user/{id} lookups while a number of
+clients keep /api/analytics/transaction-clusters busy, then reports the lookup
+latency percentiles. Run it against a running backend, for example:
+
+    python scripts/benchmark_async.py --user-id=user1 --heavy-clients=4
+"""
+import argparse
+import asyncio
+import time
+import httpx
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_heavy_load(client, stop_event, max_distance):
+    """Keep issuing transaction clustering requests until stopped"""
+    completed = 0
+    while not stop_event.is_set():
+        await client.get("/api/analytics/transaction-clusters", params={"max_distance": max_distance})
+        completed += 1
+    return completed
+
+async def run_lookups(client, user_id, num_requests, interval):
+    """Issue user relationship lookups and record their latencies in milliseconds"""
+    latencies = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        response = await client.get(f"/api/relationships/user/{user_id}")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+async def benchmark(base_url, user_id, num_requests, heavy_clients, max_distance, interval):
+    """Run the lookups with and without concurrent heavy load"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        baseline = await run_lookups(client, user_id, num_requests, interval)
+
+        stop_event = asyncio.Event()
+        heavy_tasks = [
+            asyncio.create_task(run_heavy_load(client, stop_event, max_distance))
+            for _ in range(heavy_clients)
+        ]
+        # Give the heavy queries a head start so they are in flight
+        await asyncio.sleep(0.5)
+        under_load = await run_lookups(client, user_id, num_requests, interval)
+        stop_event.set()
+        heavy_completed = sum(await asyncio.gather(*heavy_tasks))
+
+    return baseline, under_load, heavy_completed
+
+def report(label, latencies):
+    """Print latency percentiles"""
+    print(f"{label}: n={len(latencies)} "
+          f"p50={percentile(latencies, 50):.1f}ms "
+          f"p95={percentile(latencies, 95):.1f}ms "
+          f"p99={percentile(latencies, 99):.1f}ms "
+          f"max={max(latencies) if latencies else 0:.1f}ms")
+
+def main():
+    """Main function to run the benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmark lookup latency under concurrent analytics load')
+    parser.add_argument('--base-url', default='http://localhost:8000', help='Backend base URL')
+    parser.add_argument('--user-id', default='user1', help='User ID to look up (default: user1)')
+    parser.add_argument('--requests', type=int, default=200, help='Number of lookups per phase (default: 200)')
+    parser.add_argument('--heavy-clients', type=int, default=4, help='Concurrent clustering clients (default: 4)')
+    parser.add_argument('--max-distance', type=int, default=3, help='max_distance for clustering (default: 3)')
+    parser.add_argument('--interval', type=float, default=0.01, help='Pause between lookups in seconds')
+
+    args = parser.parse_args()
+
+    baseline, under_load, heavy_completed = asyncio.run(benchmark(
+        args.base_url,
+        args.user_id,
+        args.requests,
+        args.heavy_clients,
+        args.max_distance,
+        args.interval
+    ))
+
+    report("Lookups (idle)", baseline)
+    report("Lookups (under clustering load)", under_load)
+    print(f"Clustering requests completed during load phase: {heavy_completed}")
+
+if __name__ == "__main__":
+    main()
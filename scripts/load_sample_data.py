@@ -46,6 +46,12 @@ def load_sample_data():
         db.close()
         print("Database connection closed.")
 
+def print_bulk_result(kind, result):
+    """Print the created and failed counts of a bulk write and each failure"""
+    print(f"{len(result['created'])} {kind} created, {len(result['failed'])} failed")
+    for failure in result["failed"]:
+        print(f"  Failed to create {failure['id']}: {failure['error']}")
+
 def create_individuals():
     """Create sample individual users"""
     print("Creating individual users...")
@@ -143,11 +149,14 @@ def create_individuals():
         )
     ]
     
-    for user in individuals:
-        GraphOperations.create_user(user)
+    result = GraphOperations.create_users(individuals, detect_relationships=False)
+    created_ids = set(result["created"])
+    created_individuals = [user for user in individuals if user.id in created_ids]
+    for user in created_individuals:
         print(f"Created individual: {user.name} (ID: {user.id})")
+    print_bulk_result("individuals", result)
     
-    return individuals
+    return created_individuals
 
 def create_companies():
     """Create sample company entities"""
@@ -255,11 +264,14 @@ def create_companies():
         )
     ]
     
-    for company in companies:
-        GraphOperations.create_user(company)
+    result = GraphOperations.create_users(companies, detect_relationships=False)
+    created_ids = set(result["created"])
+    created_companies = [company for company in companies if company.id in created_ids]
+    for company in created_companies:
         print(f"Created company: {company.name} (ID: {company.id})")
+    print_bulk_result("companies", result)
     
-    return companies
+    return created_companies
 
 def create_transactions(individuals, companies):
     """Create sample transactions between users and companies"""
@@ -423,11 +435,14 @@ def create_transactions(individuals, companies):
         )
     ]
     
-    for transaction in transactions:
-        GraphOperations.create_transaction(transaction)
+    result = GraphOperations.create_transactions(transactions, detect_relationships=False)
+    created_ids = set(result["created"])
+    created_transactions = [transaction for transaction in transactions if transaction.id in created_ids]
+    for transaction in created_transactions:
         print(f"Created transaction: {transaction.id} (Amount: {transaction.amount} {transaction.currency})")
+    print_bulk_result("transactions", result)
     
-    return transactions
+    return created_transactions
 
 def create_business_relationships(individuals, companies):
     """Create explicit business relationships"""
@@ -507,14 +522,16 @@ def create_business_relationships(individuals, companies):
         )
     ]
     
+    created_relationships = []
     for relationship in business_relationships:
         try:
             GraphOperations.create_business_relationship(relationship)
+            created_relationships.append(relationship)
             print(f"Created business relationship: {relationship.source_id} -{relationship.relationship_type}-> {relationship.target_id}")
         except Exception as e:
             print(f"Error creating relationship: {e}")
     
-    return business_relationships
+    return created_relationships
 
 if __name__ == "__main__":
     load_sample_data()
@@ -0,0 +1,65 @@
+"""
+Convert an existing graph to identifier nodes.
+
+Links every user and transaction to :Email, :Phone, :PaymentMethod, :IP and
+:Device nodes, then deletes the SHARED_EMAIL, SHARED_PHONE,
+SHARED_PAYMENT_METHOD and LINKED_TO relationships between every pair of
+owners that they replace, and reports the relationship counts before and
+after. Restart the backend with IDENTIFIER_NODES=true afterwards, for example:
+
+    python -m scripts.migrate_identifier_nodes --batch-size=10000
+"""
+import argparse
+import time
+
+from app.database.connection import db
+from app.database.operations import GraphOperations
+from app.utils.init_db import create_constraints
+
+RELATIONSHIP_COUNT_QUERY = "MATCH ()-[r]->() RETURN count(r) AS count"
+
+def count_relationships():
+    """Return the total number of relationships in the database"""
+    result = db.execute_query(RELATIONSHIP_COUNT_QUERY)
+    return result[0]["count"] if result else 0
+
+def migrate(batch_size):
+    """Create the identifier nodes and delete the pairwise relationships they replace"""
+    print("Connecting to Neo4j database...")
+    db.connect()
+
+    try:
+        # Identifier nodes are merged on their id, which needs the uniqueness constraint
+        create_constraints()
+        before = count_relationships()
+        print(f"Relationships before: {before}")
+
+        start = time.perf_counter()
+        result = GraphOperations.migrate_to_identifier_nodes(batch_size)
+        seconds = time.perf_counter() - start
+
+        for relationship_type, count in result["created"].items():
+            print(f"Linked {count} {relationship_type.upper()} relationships")
+        for relationship_type, count in result["deleted"].items():
+            print(f"Deleted {count} {relationship_type} relationships")
+        after = count_relationships()
+        print(f"Relationships after: {after} ({before - after} fewer), migrated in {seconds:.1f}s")
+        print("Set IDENTIFIER_NODES=true before restarting the backend.")
+    except Exception as e:
+        print(f"Error migrating to identifier nodes: {e}")
+    finally:
+        db.close()
+        print("Database connection closed.")
+
+def main():
+    """Main function to run the migration"""
+    parser = argparse.ArgumentParser(description='Convert pairwise shared-identifier relationships to identifier nodes')
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help='Relationships deleted per transaction (default: 10000)')
+
+    args = parser.parse_args()
+
+    migrate(args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ let allNodes = []; // All nodes from the API
 let allEdges = []; // All edges from the API
 let relationshipTypes = new Set(); // Set of all relationship types
 let currentLayout = 'cose-bilkent'; // Default layout
+let graphVersion = null; // Graph version token of the loaded data
+const SYNC_INTERVAL_MS = 30000; // How often to poll for graph changes
 
 // Initialize the application when the DOM is fully loaded
 document.addEventListener('DOMContentLoaded', function() {
@@ -47,8 +49,8 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize Cytoscape
     initCytoscape();
 
-    // Load data from API
-    loadGraphData();
+    // Load data from API, then keep it up to date with the change feed
+    loadGraphData().then(() => setInterval(syncGraphChanges, SYNC_INTERVAL_MS));
 
     // Set up event listeners
     setupEventListeners();
@@ -176,6 +178,7 @@ async function loadGraphData() {
         console.log('Fetching graph data...');
         const response = await fetch('/api/graph-data');
         const data = await response.json();
+        graphVersion = response.headers.get('X-Graph-Version');
         console.log('Graph data received:', data);
 
         // Store data globally
@@ -226,6 +229,71 @@ async function loadGraphData() {
     }
 }
 
+// Apply the changes made to the graph since the loaded version
+async function syncGraphChanges() {
+    if (graphVersion === null) {
+        return;
+    }
+    try {
+        const response = await fetch(`/api/graph-data/changes?since=${graphVersion}`);
+        if (!response.ok) {
+            return;
+        }
+        const changes = await response.json();
+        graphVersion = changes.version;
+
+        if (changes.full) {
+            cy.elements().remove();
+            allNodes = changes.nodes || [];
+            allEdges = changes.edges || [];
+            cy.add(allNodes);
+            cy.add(allEdges);
+        } else if (changes.nodes.length || changes.edges.length || changes.removed.nodes.length) {
+            // The feed lists every current edge of a changed node, so replace those edges
+            const changedIds = new Set(changes.nodes.map(node => node.data.id).concat(changes.removed.nodes));
+            const edgeIds = new Set(changes.edges.map(edge => edge.data.id));
+            cy.edges().filter(edge => (changedIds.has(edge.data('source')) || changedIds.has(edge.data('target')))
+                && !edgeIds.has(edge.id())).remove();
+            changes.removed.nodes.forEach(id => cy.getElementById(id).remove());
+
+            changes.nodes.forEach(node => {
+                const existing = cy.getElementById(node.data.id);
+                if (existing.nonempty()) {
+                    existing.data(node.data);
+                } else {
+                    cy.add(node);
+                }
+            });
+            changes.edges.forEach(edge => {
+                const existing = cy.getElementById(edge.data.id);
+                if (existing.nonempty()) {
+                    existing.data(edge.data);
+                } else {
+                    cy.add(edge);
+                }
+            });
+
+            allNodes = cy.nodes().map(node => ({ data: node.data() }));
+            allEdges = cy.edges().map(edge => ({ data: edge.data() }));
+        } else {
+            return;
+        }
+
+        // Only rebuild the filters when a new relationship type shows up, to keep the user's selection
+        const knownTypes = relationshipTypes.size;
+        allEdges.forEach(edge => relationshipTypes.add(edge.data.relationship));
+        if (relationshipTypes.size !== knownTypes) {
+            populateRelationshipFilters();
+        }
+        populateUsersList();
+        populateTransactionsList();
+        addEdgeStyles();
+        filterGraph();
+    } catch (error) {
+        console.error('Error syncing graph changes:', error);
+    }
+}
+
 // Add edge styles based on relationship types
 function addEdgeStyles() {
     relationshipTypes.forEach(type => {
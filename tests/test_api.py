@@ -1,7 +1,14 @@
+import csv
+import io
+import json
+import zipfile
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database.connection import db
+from app.database import operations
+from app.database import connection
+from app.database.connection import async_db, db
+from app.services.cache import graph_version
 from app.utils.init_db import init_database
 
 client = TestClient(app)
@@ -34,6 +41,21 @@ def test_get_all_transactions():
     assert response.status_code == 200
     assert len(response.json()) == 5  # We created 5 test transactions
 
+def test_list_endpoints_stream_across_fetch_batches(monkeypatch):
+    """Test that user and transaction lists stay valid JSON when fetched in several batches"""
+    stream_query = async_db.stream_query
+    monkeypatch.setattr(async_db, "stream_query", lambda query, parameters=None, fetch_size=None: stream_query(query, parameters, fetch_size=2))
+
+    for path, label in (("/api/users", "User"), ("/api/transactions", "Transaction")):
+        expected = db.execute_query(f"MATCH (n:{label}) RETURN collect(n.id) AS ids")[0]["ids"]
+        assert len(expected) > 2
+
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/json")
+        rows = json.loads(response.content)
+        assert sorted(row["id"] for row in rows) == sorted(expected)
+
 def test_get_user_relationships():
     """Test getting user relationships"""
     response = client.get("/api/relationships/user/user1")
@@ -52,6 +74,48 @@ def test_get_transaction_relationships():
     assert "relationships" in data
     assert data["transaction"]["id"] == "tx1"
 
+def test_async_driver_lifecycle(monkeypatch):
+    """Test that async reads reuse the lifespan's driver and close every driver they open"""
+    created, closed = [], []
+    open_driver = connection.AsyncGraphDatabase.driver
+
+    def driver(*args, **kwargs):
+        instance = open_driver(*args, **kwargs)
+        close = instance.close
+
+        async def close_driver():
+            closed.append(instance)
+            await close()
+
+        instance.close = close_driver
+        created.append(instance)
+        return instance
+
+    monkeypatch.setattr(connection.AsyncGraphDatabase, "driver", driver)
+
+    # Without the lifespan each call opens a driver on the client's loop and closes it
+    assert async_db.driver is None
+    for _ in range(2):
+        response = client.get("/api/relationships/user/user1")
+        assert response.status_code == 200
+    assert len(created) == 2
+    assert closed == created
+    assert async_db.driver is None
+
+    # The lifespan replaces and closes the sync driver; restore the module's one afterwards
+    monkeypatch.setattr(db, "driver", db.driver)
+    created.clear()
+    closed.clear()
+    with TestClient(app) as lifespan_client:
+        for _ in range(2):
+            response = lifespan_client.get("/api/relationships/user/user1")
+            assert response.status_code == 200
+        assert len(created) == 1
+        assert async_db.driver is created[0]
+        assert closed == []
+    assert closed == created
+    assert async_db.driver is None
+
 def test_create_user():
     """Test creating a new user"""
     new_user = {
@@ -84,3 +148,482 @@ def test_create_transaction():
     assert "message" in data
     assert "transaction_id" in data
     assert data["message"] == "Transaction created successfully"
+
+def test_create_user_detects_shared_phone():
+    """Test that a new user is linked to existing users sharing its phone"""
+    new_user = {
+        "name": "Phone Twin",
+        "email": "phone.twin@example.com",
+        "phone": "+1234567890",  # Same phone as John Doe
+        "address": "1 Twin St, City, Country"
+    }
+    response = client.post("/api/users", json=new_user)
+    assert response.status_code == 200
+    user_id = response.json()["user_id"]
+
+    response = client.get(f"/api/relationships/user/{user_id}")
+    assert response.status_code == 200
+    outgoing_types = {rel["type"] for rel in response.json()["relationships"]["outgoing"]}
+    assert "SHARED_PHONE" in outgoing_types
+
+def test_detect_relationships_for_new_users():
+    """Test that new users are matched to companies that list exactly their ID"""
+    client.post("/api/users", json={
+        "id": "sh_company", "name": "Holding Co", "entity_type": "company", "payment_methods": ["sh_card"],
+        "directors": ["sh_user10"], "shareholders": [{"id": "sh_user10", "percentage": 40.0}]
+    })
+    for user_id in ("sh_user1", "sh_user10"):
+        client.post("/api/users", json={"id": user_id, "name": user_id, "payment_methods": ["sh_card"]})
+
+    def outgoing_types(user_id):
+        response = client.get(f"/api/relationships/user/{user_id}")
+        return {rel["type"] for rel in response.json()["relationships"]["outgoing"]}
+
+    assert {"SHAREHOLDER_OF", "DIRECTOR_OF", "SHARED_PAYMENT_METHOD"} <= outgoing_types("sh_user10")
+    # sh_user1 is a substring of sh_user10 but is not listed by the company
+    assert not {"SHAREHOLDER_OF", "DIRECTOR_OF"} & outgoing_types("sh_user1")
+    assert "SHARED_PAYMENT_METHOD" in outgoing_types("sh_user1")
+
+def test_create_transactions_bulk():
+    """Test creating transactions in bulk with per-record failures"""
+    transactions = [
+        {"id": "bulk_tx1", "sender_id": "user1", "receiver_id": "user2", "amount": 10.0},
+        {"id": "bulk_tx2", "sender_id": "user2", "receiver_id": "user3", "amount": 20.0},
+        {"id": "bulk_tx3", "sender_id": "user1", "receiver_id": "no_such_user", "amount": 30.0},
+        {"id": "bulk_tx4", "sender_id": "user1", "receiver_id": "user2"}  # Missing amount
+    ]
+    response = client.post("/api/transactions/bulk?batch_size=2", json=transactions)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created_count"] == 2
+    assert data["failed_count"] == 2
+    assert {failure["id"] for failure in data["failures"]} == {"bulk_tx3", "bulk_tx4"}
+
+def test_graph_data_conditional_get():
+    """Test that graph data is revalidated with ETags until the graph changes"""
+    response = client.get("/api/graph-data")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/api/graph-data", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post("/api/users", json={"name": "Cache Buster"})
+    response = client.get("/api/graph-data", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+    # An ETag from before a restart carries another epoch and must not match
+    stale = response.headers["etag"].replace(graph_version.epoch, "0" * 12)
+    response = client.get("/api/graph-data", headers={"If-None-Match": stale})
+    assert response.status_code == 200
+
+def test_graph_changes_since_version():
+    """Test that the change feed returns only the nodes touched since a version"""
+    response = client.get("/api/graph-data")
+    version = response.headers["x-graph-version"]
+
+    client.post("/api/users", json={"id": "delta_user", "name": "Delta User", "phone": "+1555555555"})
+    response = client.get(f"/api/graph-data/changes?since={version}")
+    assert response.status_code == 200
+    changes = response.json()
+    assert changes["full"] is False
+    assert [node["data"]["id"] for node in changes["nodes"]] == ["delta_user"]
+    assert any(edge["data"]["relationship"] == "SHARED_PHONE" for edge in changes["edges"])
+
+    response = client.get(f"/api/graph-data/changes?since={changes['version']}")
+    assert response.json()["nodes"] == []
+
+    # A token from before a restart has another epoch, even if its counter is lower
+    stale = changes["version"].replace(graph_version.epoch, "0" * 12)
+    response = client.get(f"/api/graph-data/changes?since={stale}")
+    assert response.json()["full"] is True
+
+def _sorted_elements(elements):
+    """Order Cytoscape elements independently of the database's return order"""
+    return sorted(elements, key=lambda element: json.dumps(element, sort_keys=True))
+
+def test_graph_data_streaming():
+    """Test that the streamed graph matches the regular /graph-data payload"""
+    expected = client.get("/api/graph-data").json()
+    assert expected["nodes"] and expected["edges"]
+
+    response = client.get("/api/graph-data?stream=ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    for group in ("nodes", "edges"):
+        elements = [{key: value for key, value in line.items() if key != "group"} for line in lines if line["group"] == group]
+        assert _sorted_elements(elements) == _sorted_elements(expected[group])
+
+    response = client.get("/api/graph-data?stream=json")
+    assert response.status_code == 200
+    data = json.loads(response.content)
+    assert set(data) == {"nodes", "edges"}
+    for group in ("nodes", "edges"):
+        assert _sorted_elements(data[group]) == _sorted_elements(expected[group])
+
+def test_export_json_streaming():
+    """Test that the streamed JSON export matches the regular export"""
+    expected = client.get("/api/export/json").json()
+    assert expected["metadata"]["format"] == "json"
+
+    response = client.get("/api/export/json?stream=ndjson")
+    assert response.status_code == 200
+    assert "graph_export.ndjson" in response.headers["content-disposition"]
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert lines[0]["metadata"]["format"] == "ndjson"
+    for group in ("nodes", "edges"):
+        elements = [{key: value for key, value in line.items() if key != "group"} for line in lines[1:] if line["group"] == group]
+        assert _sorted_elements(elements) == _sorted_elements(expected[group])
+
+    response = client.get("/api/export/json?stream=json")
+    assert response.status_code == 200
+    data = json.loads(response.content)
+    assert data["metadata"]["format"] == "json"
+    for group in ("nodes", "edges"):
+        assert _sorted_elements(data[group]) == _sorted_elements(expected[group])
+
+def test_export_csv():
+    """Test that the CSV export is a valid zip with one row per node and edge"""
+    expected = client.get("/api/graph-data").json()
+
+    response = client.get("/api/export/csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    assert sorted(archive.namelist()) == ["edges.csv", "nodes.csv"]
+
+    with archive.open("nodes.csv") as file:
+        nodes = list(csv.reader(io.TextIOWrapper(file, encoding="utf-8", newline="")))
+    assert nodes[0][:3] == ["id", "type", "label"]
+    assert len(set(nodes[0])) == len(nodes[0])
+    assert sorted(row[0] for row in nodes[1:]) == sorted(node["data"]["id"] for node in expected["nodes"])
+
+    with archive.open("edges.csv") as file:
+        edges = list(csv.reader(io.TextIOWrapper(file, encoding="utf-8", newline="")))
+    assert edges[0][:4] == ["id", "source", "target", "relationship"]
+    assert len(edges) - 1 == len(expected["edges"])
+    assert all(len(row) == len(edges[0]) for row in edges[1:])
+
+def test_get_neighborhood():
+    """Test getting the subgraph around a user"""
+    response = client.get("/api/graph-data/neighborhood/user1?depth=1&limit=3")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["nodes"][0]["data"]["id"] == "user1"
+    assert len(data["nodes"]) <= 3
+
+    # An ETag for one node must not validate the neighborhood of another
+    etag = response.headers["etag"]
+    response = client.get("/api/graph-data/neighborhood/user2?depth=1&limit=3", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["nodes"][0]["data"]["id"] == "user2"
+
+    response = client.get("/api/graph-data/neighborhood/nonexistent")
+    assert response.status_code == 404
+
+def test_refresh_projection():
+    """Test loading the in-memory graph projection"""
+    response = client.post("/api/analytics/projection/refresh")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["loaded"] is True
+    assert stats["stale"] is False
+    assert stats["num_nodes"] > 0
+
+def test_cluster_transactions():
+    """Test that transaction clusters are disjoint and carry aggregates"""
+    response = client.get("/api/analytics/transaction-clusters?min_cluster_size=2&max_distance=2")
+    assert response.status_code == 200
+    clusters = response.json()
+    seen = set()
+    for cluster in clusters:
+        ids = {transaction["id"] for transaction in cluster["transactions"]}
+        assert len(ids) == cluster["size"] >= 2
+        assert not ids & seen
+        assert cluster["cluster_id"] == min(ids)
+        assert cluster["distinct_senders"] >= 1
+        seen |= ids
+
+def test_find_shortest_paths_batch():
+    """Test finding shortest paths for several pairs in one request"""
+    response = client.post("/api/analytics/shortest-paths", json={
+        "pairs": [
+            {"source_id": "user1", "target_id": "user3"},
+            {"source_id": "user1", "target_id": "nonexistent"}
+        ],
+        "max_hops": 4
+    })
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["source_id"] for result in results] == ["user1", "user1"]
+    assert results[0]["found"] is True
+    assert results[0]["nodes"][0]["id"] == "user1"
+    assert results[0]["nodes"][-1]["id"] == "user3"
+    assert results[1]["found"] is False
+
+def test_find_weighted_shortest_path():
+    """Test strongest paths by each weight, with A* over landmarks matching plain Dijkstra"""
+    for weight, source_id, target_id in [("amount", "user1", "user3"), ("strength", "user1", "company2"),
+                                         ("percentage", "user3", "company1")]:
+        url = f"/api/analytics/shortest-path?source_id={source_id}&target_id={target_id}&weight={weight}"
+        response = client.get(url)
+        assert response.status_code == 200
+        plain = response.json()
+        assert plain["found"] is True
+        assert plain["nodes"][0]["id"] == source_id
+        assert plain["nodes"][-1]["id"] == target_id
+        assert plain["total_cost"] > 0
+
+        landmark = client.get(f"{url}&landmarks=true").json()
+        assert [node["id"] for node in landmark["nodes"]] == [node["id"] for node in plain["nodes"]]
+        assert landmark["total_cost"] == pytest.approx(plain["total_cost"])
+
+    response = client.get("/api/analytics/shortest-path?source_id=user1&target_id=user3&weight=amount&max_hops=2")
+    assert response.status_code == 400
+
+def test_graph_metrics_track_writes():
+    """Test that graph metrics counters follow writes without a recount"""
+    before = client.get("/api/analytics/graph-metrics?reconcile=true").json()
+    client.post("/api/users", json={"id": "metrics_user", "name": "Metrics User"})
+    after = client.get("/api/analytics/graph-metrics").json()
+    assert after["user_count"] == before["user_count"] + 1
+    assert after["total_nodes"] == before["total_nodes"] + 1
+
+    response = client.get("/api/analytics/graph-metrics?reconcile=true")
+    assert response.json()["user_count"] == after["user_count"]
+
+    response = client.get("/api/analytics/graph-metrics", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+def test_get_centrality():
+    """Test that PageRank scores are ranked and sum to at most one"""
+    response = client.get("/api/analytics/centrality?algo=pagerank&top=5&node_type=User")
+    assert response.status_code == 200
+    result = response.json()
+    assert result["converged"] is True
+    scores = [node["score"] for node in result["nodes"]]
+    assert scores == sorted(scores, reverse=True)
+    assert all(node["type"] == "User" for node in result["nodes"])
+    assert sum(scores) <= 1.0
+
+    response = client.get("/api/analytics/centrality?algo=closeness")
+    assert response.status_code == 422
+
+def test_get_betweenness():
+    """Test that exact betweenness reports no error and normalized scores"""
+    response = client.get("/api/analytics/betweenness?samples=100000&top=5")
+    assert response.status_code == 200
+    result = response.json()
+    assert result["exact"] is True
+    assert result["error_bound"] == 0.0
+    assert all(0.0 <= node["score"] <= 1.0 for node in result["nodes"])
+
+def test_detect_communities():
+    """Test that communities are disjoint and identified by their smallest member"""
+    for algo in ("louvain", "label_propagation"):
+        response = client.get(f"/api/analytics/communities?algo={algo}&min_size=2")
+        assert response.status_code == 200
+        result = response.json()
+        seen = set()
+        for community in result["communities"]:
+            members = set(community["member_ids"])
+            assert len(members) == community["size"] >= 2
+            assert community["community_id"] == min(members)
+            assert not members & seen
+            seen |= members
+
+def test_trace_funds_forward():
+    """Test that a trace follows funds to later transactions of the receiver"""
+    for transaction in (
+        {"id": "trace_tx1", "sender_id": "user1", "receiver_id": "user2", "amount": 100.0,
+         "timestamp": "2030-01-01T10:00:00"},
+        {"id": "trace_tx2", "sender_id": "user2", "receiver_id": "user3", "amount": 95.0,
+         "timestamp": "2030-01-01T11:00:00"},
+        {"id": "trace_tx3", "sender_id": "user2", "receiver_id": "user3", "amount": 95.0,
+         "timestamp": "2029-12-31T11:00:00"}
+    ):
+        client.post("/api/transactions", json=transaction)
+
+    response = client.get("/api/analytics/trace?from=trace_tx1&direction=forward&max_hops=2&window=86400")
+    assert response.status_code == 200
+    hops = {transaction["id"]: transaction["hop"] for transaction in response.json()["transactions"]}
+    assert hops["trace_tx1"] == 0
+    assert hops["trace_tx2"] == 1
+    assert "trace_tx3" not in hops
+
+    response = client.get("/api/analytics/trace?from=missing_node")
+    assert response.status_code == 404
+
+def test_find_cycles():
+    """Test that money returning to its sender through successive transactions is found"""
+    for transaction in (
+        {"id": "cycle_tx1", "sender_id": "user1", "receiver_id": "user2", "amount": 500.0,
+         "timestamp": "2031-01-01T10:00:00"},
+        {"id": "cycle_tx2", "sender_id": "user2", "receiver_id": "user3", "amount": 480.0,
+         "timestamp": "2031-01-01T12:00:00"},
+        {"id": "cycle_tx3", "sender_id": "user3", "receiver_id": "user1", "amount": 460.0,
+         "timestamp": "2031-01-01T14:00:00"}
+    ):
+        client.post("/api/transactions", json=transaction)
+
+    response = client.get("/api/analytics/cycles?max_length=3&max_span=86400&limit=10000")
+    assert response.status_code == 200
+    cycles = {tuple(cycle["transaction_ids"]): cycle for cycle in response.json()["cycles"]}
+    assert ("cycle_tx1", "cycle_tx2", "cycle_tx3") in cycles
+    assert cycles[("cycle_tx1", "cycle_tx2", "cycle_tx3")]["cycled_amount"] == 460.0
+
+def test_find_cycles_with_tied_timestamps():
+    """Test that cycles whose earliest transactions share a timestamp are found exactly once"""
+    for transaction in (
+        # user3 -> user2 -> user1 at the same time, then user1 -> user3 later
+        {"id": "tie_tx0", "sender_id": "user1", "receiver_id": "user3", "amount": 70.0,
+         "timestamp": "2032-01-01T07:00:00"},
+        {"id": "tie_tx1", "sender_id": "user2", "receiver_id": "user1", "amount": 50.0,
+         "timestamp": "2032-01-01T05:00:00"},
+        {"id": "tie_tx2", "sender_id": "user3", "receiver_id": "user2", "amount": 50.0,
+         "timestamp": "2032-01-01T05:00:00"},
+        # Three transactions all at the same time, in every rotation time-ordered
+        {"id": "same_tx0", "sender_id": "user1", "receiver_id": "user2", "amount": 30.0,
+         "timestamp": "2033-01-01T05:00:00"},
+        {"id": "same_tx1", "sender_id": "user2", "receiver_id": "user3", "amount": 30.0,
+         "timestamp": "2033-01-01T05:00:00"},
+        {"id": "same_tx2", "sender_id": "user3", "receiver_id": "user1", "amount": 30.0,
+         "timestamp": "2033-01-01T05:00:00"}
+    ):
+        client.post("/api/transactions", json=transaction)
+
+    response = client.get("/api/analytics/cycles?max_length=3&max_span=86400&limit=10000")
+    assert response.status_code == 200
+    cycles = [cycle["transaction_ids"] for cycle in response.json()["cycles"]]
+    assert ["tie_tx2", "tie_tx1", "tie_tx0"] in cycles
+    assert sum(set(cycle) == {"same_tx0", "same_tx1", "same_tx2"} for cycle in cycles) == 1
+
+def test_get_risk_scores():
+    """Test that risk spreads from a seed to the entities connected to it"""
+    response = client.post("/api/analytics/risk-scores", json={"seed_ids": ["user1", "missing_user"], "top": 5})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["missing_seed_ids"] == ["missing_user"]
+    assert result["nodes"]
+    assert not any(node["is_seed"] for node in result["nodes"])
+    assert result["nodes"][0]["score"] > 0
+
+    response = client.post("/api/analytics/risk-scores", json={"seed_ids": ["user1", "user2"], "top": 5})
+    assert response.json()["warm_start"] is True
+
+    response = client.post("/api/analytics/risk-scores", json={"seed_ids": ["missing_user"]})
+    assert response.status_code == 404
+
+def test_get_beneficial_owners():
+    """Test that ownership is followed through intermediate companies"""
+    response = client.get("/api/analytics/beneficial-owners/company2?threshold=5")
+    assert response.status_code == 200
+    owners = {owner["owner_id"]: owner for owner in response.json()["owners"]}
+    # user1 holds 30% directly; company1 holds 40% and is owned 25% by user3 and 15% by user4
+    assert owners["user1"]["effective_percentage"] == pytest.approx(30.0)
+    assert owners["user3"]["effective_percentage"] == pytest.approx(10.0)
+    assert owners["user4"]["effective_percentage"] == pytest.approx(6.0)
+    assert "company1" not in owners
+
+    response = client.get("/api/analytics/beneficial-owners/missing_company")
+    assert response.status_code == 404
+
+def test_get_user_velocity():
+    """Test that new transactions show up in the velocity window of both accounts"""
+    before = client.get("/api/analytics/velocity/user4").json()
+    for i in range(3):
+        client.post("/api/transactions", json={
+            "id": f"velocity_tx{i}", "sender_id": "user4", "receiver_id": "user5", "amount": 10.0
+        })
+
+    response = client.get("/api/analytics/velocity/user4")
+    assert response.status_code == 200
+    assert response.json()["sent"]["count"] == before["sent"]["count"] + 3
+    assert response.json()["sent"]["amount"] == pytest.approx(before["sent"]["amount"] + 30.0)
+
+    received = client.get("/api/analytics/velocity/user5").json()["received"]
+    assert received["count"] >= 3
+    assert received["counterparties"] >= 1
+
+def test_resolve_entities():
+    """Test that differently formatted records of the same person are matched and linked"""
+    client.post("/api/users", json={"id": "er_user1", "name": "Jonathan Smith", "phone": "+1-555-867-5309",
+                                    "address": "42 Maple Street, Springfield"})
+    client.post("/api/users", json={"id": "er_user2", "name": "Jonathon Smith", "phone": "(555) 867 5309",
+                                    "address": "42 Maple St Springfield"})
+
+    response = client.post("/api/analytics/entity-resolution?write=true&limit=10000")
+    assert response.status_code == 200
+    data = response.json()
+    match = next(match for match in data["matches"]
+                 if {match["source_id"], match["target_id"]} == {"er_user1", "er_user2"})
+    assert "phone" in match["shared_identifiers"]
+    assert data["written_count"] >= 1
+
+    response = client.get("/api/relationships/user/er_user1")
+    relationship_types = {rel["type"] for rel in response.json()["relationships"]["outgoing"]}
+    assert "POSSIBLE_SAME_ENTITY" in relationship_types
+
+def test_identifier_nodes(monkeypatch):
+    """Test that transactions sharing a device are linked through one device node"""
+    monkeypatch.setattr(operations, "IDENTIFIER_NODES", True)
+    version = client.get("/api/graph-data").headers["x-graph-version"]
+    for i in range(3):
+        client.post("/api/transactions", json={
+            "id": f"hub_tx{i}", "sender_id": "user1", "receiver_id": "user2", "amount": 5.0,
+            "device_id": "hub_device"
+        })
+
+    response = client.get("/api/relationships/transaction/hub_tx0")
+    assert response.status_code == 200
+    linked = {rel["node"]["id"] for rel in response.json()["relationships"]["linked_transactions"] if rel["node"]}
+    assert {"hub_tx1", "hub_tx2"} <= linked
+
+    changes = client.get(f"/api/graph-data/changes?since={version}").json()
+    devices = [node for node in changes["nodes"] if node["data"]["id"] == "device:hub_device"]
+    assert devices and devices[0]["data"]["type"] == "Device"
+    assert sum(edge["data"]["target"] == "device:hub_device" for edge in changes["edges"]) == 3
+
+    # The analytics traverse the device node, counting the hop through it as one link
+    stats = client.post("/api/analytics/projection/refresh").json()
+    assert stats["num_identifier_nodes"] >= 1
+    response = client.get("/api/analytics/shortest-path?source_id=hub_tx0&target_id=hub_tx2"
+                          "&relationship_types=LINKED_TO&max_hops=1")
+    path = response.json()
+    assert path["found"] is True
+    assert path["path_length"] == 1
+    assert [node["id"] for node in path["nodes"]] == ["hub_tx0", "device:hub_device", "hub_tx2"]
+
+    clusters = client.get("/api/analytics/transaction-clusters?min_cluster_size=3&max_distance=1").json()
+    assert any({"hub_tx0", "hub_tx1", "hub_tx2"} <= {t["id"] for t in cluster["transactions"]} for cluster in clusters)
+
+    result = client.get("/api/analytics/centrality?algo=pagerank&top=1000").json()
+    assert "device:hub_device" not in {node["id"] for node in result["nodes"]}
+
+def test_composite_through_identifier_nodes(monkeypatch):
+    """Test that users sharing several identifier nodes get a COMPOSITE without a direct relationship"""
+    monkeypatch.setattr(operations, "IDENTIFIER_NODES", True)
+
+    def composites(user_id):
+        outgoing = client.get(f"/api/relationships/user/{user_id}").json()["relationships"]["outgoing"]
+        return {rel["node"]["id"] for rel in outgoing if rel["node"] and rel["type"] == "COMPOSITE"}
+
+    identifiers = {"email": "hub.user@example.com", "phone": "+1777777777"}
+    for i in range(2):
+        client.post("/api/users", json={"id": f"hub_user{i}", "name": f"Hub User {i}", **identifiers})
+    assert composites("hub_user0") == {"hub_user1"}
+    assert composites("hub_user1") == {"hub_user0"}
+
+    # Identifier nodes over the limit are not listed and are reported instead
+    monkeypatch.setattr(operations, "COMPOSITE_IDENTIFIER_LIMIT", 2)
+    client.post("/api/users", json={"id": "hub_user2", "name": "Hub User 2", **identifiers})
+    assert composites("hub_user2") == set()
+
+    response = client.post("/api/detect-relationships")
+    assert response.status_code == 200
+    skipped = response.json()["skipped_identifiers"]
+    assert skipped["email:hub.user@example.com"] == 3
+    assert skipped["phone:+1777777777"] == 3